@@ -0,0 +1,26 @@
+"""Add catalog version counter
+
+Revision ID: 2026101905
+Revises: 2026101904
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026101905'
+down_revision = '2026101904'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('catalog_version',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    )
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, 1)")
+
+def downgrade() -> None:
+    op.drop_table('catalog_version')
@@ -0,0 +1,22 @@
+"""Remember the catalog datasets each assistant message was generated with
+
+Revision ID: 2026101912
+Revises: 2026101911
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '2026101912'
+down_revision = '2026101911'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('chat_messages', sa.Column('dataset_ids', postgresql.ARRAY(postgresql.UUID(as_uuid=True)), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('chat_messages', 'dataset_ids')
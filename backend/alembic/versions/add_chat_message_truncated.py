@@ -0,0 +1,21 @@
+"""Flag chat messages cut short by a client disconnect
+
+Revision ID: 2026101911
+Revises: 2026101910
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026101911'
+down_revision = '2026101910'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('chat_messages', sa.Column('truncated', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+def downgrade() -> None:
+    op.drop_column('chat_messages', 'truncated')
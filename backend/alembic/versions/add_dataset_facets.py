@@ -0,0 +1,51 @@
+"""Add dataset facets summary table
+
+Revision ID: 2026101904
+Revises: 2026101903
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026101904'
+down_revision = '2026101903'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('dataset_facets',
+        sa.Column('facet', sa.String(), primary_key=True),
+        sa.Column('value', sa.String(), primary_key=True),
+        sa.Column('dataset_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    )
+
+    # Supporting indexes for facet filters on GET /dataset
+    op.create_index(
+        'ix_dataset_catalog_original_source',
+        'dataset_catalog',
+        ['original_source', sa.text('source_at DESC'), sa.text('id DESC')]
+    )
+    op.create_index(
+        'ix_dataset_catalog_direct_source',
+        'dataset_catalog',
+        ['direct_source', sa.text('source_at DESC'), sa.text('id DESC')]
+    )
+
+    # Initial facet counts; afterwards ingestion refreshes them incrementally
+    op.execute("""
+        INSERT INTO dataset_facets (facet, value, dataset_count)
+        SELECT 'original_source', original_source, count(*) FROM dataset_catalog GROUP BY original_source
+        UNION ALL
+        SELECT 'direct_source', direct_source, count(*) FROM dataset_catalog GROUP BY direct_source
+        UNION ALL
+        SELECT 'year', to_char(timezone('UTC', source_at), 'YYYY'), count(*) FROM dataset_catalog
+        GROUP BY to_char(timezone('UTC', source_at), 'YYYY')
+    """)
+
+def downgrade() -> None:
+    op.drop_index('ix_dataset_catalog_direct_source', table_name='dataset_catalog')
+    op.drop_index('ix_dataset_catalog_original_source', table_name='dataset_catalog')
+    op.drop_table('dataset_facets')
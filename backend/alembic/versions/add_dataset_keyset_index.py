@@ -0,0 +1,26 @@
+"""Add keyset pagination index to dataset catalog
+
+Revision ID: 2026101902
+Revises: 2026101901
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026101902'
+down_revision = '2026101901'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Composite index matching ORDER BY source_at DESC, id DESC of GET /dataset
+    op.create_index(
+        'ix_dataset_catalog_source_at_id',
+        'dataset_catalog',
+        [sa.text('source_at DESC'), sa.text('id DESC')]
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_dataset_catalog_source_at_id', table_name='dataset_catalog')
@@ -0,0 +1,32 @@
+"""Add prompt card to dataset catalog
+
+Revision ID: 2026101901
+Revises: 2024032502
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.prompt_card import build_prompt_card
+
+# revision identifiers, used by Alembic.
+revision = '2026101901'
+down_revision = '2024032502'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('dataset_catalog', sa.Column('prompt_card', sa.Text(), nullable=True))
+
+    # Backfill prompt cards for existing records
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("SELECT id, description FROM dataset_catalog")).fetchall()
+    for row_id, description in rows:
+        conn.execute(
+            sa.text("UPDATE dataset_catalog SET prompt_card = :card WHERE id = :id"),
+            {"card": build_prompt_card(description), "id": row_id}
+        )
+
+def downgrade() -> None:
+    op.drop_column('dataset_catalog', 'prompt_card')
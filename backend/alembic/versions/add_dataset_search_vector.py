@@ -0,0 +1,35 @@
+"""Add full-text search vector to dataset catalog
+
+Revision ID: 2026101903
+Revises: 2026101902
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2026101903'
+down_revision = '2026101902'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Generated tsvector column so ingestion never has to maintain it
+    op.execute("""
+        ALTER TABLE dataset_catalog
+        ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('indonesian', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('indonesian', coalesce(description, '')), 'B')
+        ) STORED
+    """)
+
+    op.create_index(
+        'ix_dataset_catalog_search_vector',
+        'dataset_catalog',
+        ['search_vector'],
+        postgresql_using='gin'
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_dataset_catalog_search_vector', table_name='dataset_catalog')
+    op.drop_column('dataset_catalog', 'search_vector')
@@ -0,0 +1,44 @@
+"""Add embedding content hash to dataset catalog and reference queries
+
+Revision ID: 2026101907
+Revises: 2026101906
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.embedding import embedding_content_hash
+
+# revision identifiers, used by Alembic.
+revision = '2026101907'
+down_revision = '2026101906'
+branch_labels = None
+depends_on = None
+
+# Text each table embeds, as built by the ingestion and seed scripts
+EMBEDDED_TEXT = {
+    'dataset_catalog': "title || ' ' || description",
+    'reference_queries': "title || ' ' || description || ' ' || sql_query",
+}
+
+def upgrade() -> None:
+    op.add_column('dataset_catalog', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.add_column('reference_queries', sa.Column('content_hash', sa.String(64), nullable=True))
+
+    # Backfill hashes for rows that already have an embedding (assumed to come from the
+    # current embedding model), so the next sync does not re-embed the whole catalog
+    conn = op.get_bind()
+    for table, embedded_text in EMBEDDED_TEXT.items():
+        rows = conn.execute(
+            sa.text(f"SELECT id, {embedded_text} FROM {table} WHERE embedding IS NOT NULL")
+        ).fetchall()
+        for row_id, text in rows:
+            conn.execute(
+                sa.text(f"UPDATE {table} SET content_hash = :hash WHERE id = :id"),
+                {"hash": embedding_content_hash(text), "id": row_id}
+            )
+
+def downgrade() -> None:
+    op.drop_column('reference_queries', 'content_hash')
+    op.drop_column('dataset_catalog', 'content_hash')
@@ -0,0 +1,44 @@
+"""Add embedding model registry and a second embedding slot
+
+Revision ID: 2026101909
+Revises: 2026101908
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+# revision identifiers, used by Alembic.
+revision = '2026101909'
+down_revision = '2026101908'
+branch_labels = None
+depends_on = None
+
+EMBEDDED_TABLES = ('dataset_catalog', 'reference_queries')
+
+def upgrade() -> None:
+    op.create_table('embedding_models',
+        sa.Column('name', sa.String(), primary_key=True),
+        sa.Column('dimensions', sa.Integer(), nullable=False),
+        sa.Column('slot', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('activated_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    # The model existing embeddings were made with
+    op.execute(
+        "INSERT INTO embedding_models (name, dimensions, slot, status, activated_at) "
+        "VALUES ('models/embedding-001', 768, 'embedding', 'active', now())"
+    )
+
+    # Empty second slot; scripts/reembed.py recreates it with the new model's dimensions
+    for table in EMBEDDED_TABLES:
+        op.add_column(table, sa.Column('embedding_alt', Vector(), nullable=True))
+        op.add_column(table, sa.Column('content_hash_alt', sa.String(64), nullable=True))
+
+def downgrade() -> None:
+    for table in EMBEDDED_TABLES:
+        op.drop_column(table, 'content_hash_alt')
+        op.drop_column(table, 'embedding_alt')
+    op.drop_table('embedding_models')
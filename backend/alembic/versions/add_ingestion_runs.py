@@ -0,0 +1,43 @@
+"""Add ingestion runs with resumable checkpoints
+
+Revision ID: 2026101908
+Revises: 2026101907
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '2026101908'
+down_revision = '2026101907'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('ingestion_runs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('full', sa.Boolean(), nullable=False),
+        sa.Column('watermark', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('next_page', sa.Integer(), nullable=False),
+        sa.Column('max_mdate', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('counts', postgresql.JSONB(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('duration_seconds', sa.Float(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    )
+    op.create_index(
+        'ix_ingestion_runs_source_started_at',
+        'ingestion_runs',
+        ['source', sa.text('started_at DESC')]
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_ingestion_runs_source_started_at', table_name='ingestion_runs')
+    op.drop_table('ingestion_runs')
@@ -0,0 +1,43 @@
+"""Add normalized SQL hash to reference queries
+
+Revision ID: 2026101910
+Revises: 2026101909
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.sql_hash import sql_hash
+
+# revision identifiers, used by Alembic.
+revision = '2026101910'
+down_revision = '2026101909'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('reference_queries', sa.Column('sql_hash', sa.String(64), nullable=True))
+
+    # Hash existing queries and drop duplicates (keeping the oldest) before the unique index
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.text("SELECT id, sql_query FROM reference_queries ORDER BY created_at, id")
+    ).fetchall()
+    seen = set()
+    for row_id, sql_query in rows:
+        hash_value = sql_hash(sql_query)
+        if hash_value in seen:
+            conn.execute(sa.text("DELETE FROM reference_queries WHERE id = :id"), {"id": row_id})
+            continue
+        seen.add(hash_value)
+        conn.execute(
+            sa.text("UPDATE reference_queries SET sql_hash = :hash WHERE id = :id"),
+            {"hash": hash_value, "id": row_id}
+        )
+
+    op.create_index('ix_reference_queries_sql_hash', 'reference_queries', ['sql_hash'], unique=True)
+
+def downgrade() -> None:
+    op.drop_index('ix_reference_queries_sql_hash', table_name='reference_queries')
+    op.drop_column('reference_queries', 'sql_hash')
@@ -0,0 +1,25 @@
+"""Add source watermarks for incremental ingestion
+
+Revision ID: 2026101906
+Revises: 2026101905
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2026101906'
+down_revision = '2026101905'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('source_watermarks',
+        sa.Column('source', sa.String(), primary_key=True),
+        sa.Column('watermark', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    )
+
+def downgrade() -> None:
+    op.drop_table('source_watermarks')
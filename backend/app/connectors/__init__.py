@@ -0,0 +1,34 @@
+from typing import Dict, List, Optional, Type
+from app.connectors.base import Connector
+from app.connectors.jabar import JabarConnector
+from app.connectors.bandung import BandungConnector
+from app.connectors.bps import BpsConnector
+from app.connectors.badan_pangan import BadanPanganConnector
+
+# Connectors available to the ingestion runner, by name
+CONNECTORS: Dict[str, Type[Connector]] = {
+    connector.name: connector
+    for connector in (JabarConnector, BandungConnector, BpsConnector, BadanPanganConnector)
+}
+
+
+def get_connectors(names: Optional[List[str]] = None) -> List[Connector]:
+    """
+    Instantiate the named connectors (by default, those with `default` set)
+    """
+    names = names or [name for name, connector in CONNECTORS.items() if connector.default]
+    unknown = [name for name in names if name not in CONNECTORS]
+    if unknown:
+        raise ValueError(f"Unknown connectors: {', '.join(unknown)}")
+    return [CONNECTORS[name]() for name in names]
+
+
+__all__ = [
+    "Connector",
+    "JabarConnector",
+    "BandungConnector",
+    "BpsConnector",
+    "BadanPanganConnector",
+    "CONNECTORS",
+    "get_connectors",
+]
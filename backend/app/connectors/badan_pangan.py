@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import httpx
+from app.connectors.base import Connector, parse_datetime, strip_html
+
+UPDATE_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%d"]
+
+
+class BadanPanganConnector(Connector):
+    """
+    Satu Data Badan Pangan Nasional dataset publications
+    """
+    name = "badan_pangan"
+    source = "satudata.badanpangan.go.id"
+    base_url = "https://satudata.badanpangan.go.id"
+    # Publications are listed by id, every page is read on each sync
+    newest_first = False
+    max_concurrency = 2
+
+    async def list_page(self, client: httpx.AsyncClient, page: int) -> List[Dict[str, Any]]:
+        response = await client.get(
+            f"{self.base_url}/api/datasetpublications",
+            params={"page": page + 1, "per_page": self.page_size}
+        )
+        response.raise_for_status()
+        return response.json().get("data", [])
+
+    def csv_url(self, record: Dict[str, Any]) -> Optional[str]:
+        file_name = record.get("file") or ""
+        if not record.get("dataset_id") or not file_name.endswith(".csv"):
+            return None
+        return f"{self.base_url}/download/document/dataset/{record['dataset_id']}/{file_name}/csv"
+
+    def record_mdate(self, record: Dict[str, Any]) -> Optional[datetime]:
+        return parse_datetime(record.get("updated_at"), UPDATE_FORMATS)
+
+    def normalize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "title": record["title"],
+            "description": strip_html(record.get("description")),
+            "url": self.csv_url(record),
+            "slug": f"badanpangan_{record['id']}",
+            "info_url": f"{self.base_url}/datasetpublications/{record['id']}/{record['slug']}",
+            "direct_source": self.source,
+            "original_source": self.source,
+            "source_at": self.record_mdate(record) or datetime.now(timezone.utc),
+        }
@@ -0,0 +1,14 @@
+from app.connectors.jabar import JabarConnector
+
+
+class BandungConnector(JabarConnector):
+    """
+    Open Data Kota Bandung, which runs the same portal software as Open Data Jabar
+    """
+    name = "bandung"
+    source = "opendata.bandung.go.id"
+    base_url = "https://opendata.bandung.go.id/api"
+    info_base_url = "https://opendata.bandung.go.id"
+    info_path = "/dataset/"
+    slug_prefix = "bandung_"
+    where = None
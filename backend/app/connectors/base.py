@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+import httpx
+
+
+class Connector(ABC):
+    """
+    A data portal the catalog is synced from.
+
+    Connectors only know how to talk to their portal: list a page of raw records,
+    build the CSV URL of a record and normalize it into catalog fields. Embedding,
+    writing, checkpoints and watermarks are handled by the shared ingestion pipeline.
+    """
+    # Short name used on the command line
+    name: str
+    # Domain stored as direct/original source, also the key of ingestion runs and watermarks
+    source: str
+    # API root of the portal, overridable (e.g. to point at a stub server in tests)
+    base_url: str
+    # Records per page returned by `list_page`, a shorter page is the last one
+    page_size: int = 100
+    # Whether pages come most recently modified first, so a sync can stop at the watermark
+    newest_first: bool = True
+    # Per-host limits: requests in flight and requests per second (None = unlimited)
+    max_concurrency: int = 4
+    requests_per_second: Optional[float] = None
+    # Whether a sync without named connectors includes it
+    default: bool = True
+
+    def __init__(self, base_url: Optional[str] = None):
+        if base_url:
+            self.base_url = base_url.rstrip("/")
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.base_url).netloc
+
+    def is_configured(self) -> bool:
+        """Whether the connector has what it needs to run (e.g. an API key)"""
+        return True
+
+    @abstractmethod
+    async def list_page(self, client: httpx.AsyncClient, page: int) -> List[Dict[str, Any]]:
+        """Raw records of the zero-based `page`"""
+
+    @abstractmethod
+    def csv_url(self, record: Dict[str, Any]) -> Optional[str]:
+        """Download URL of the record's CSV, None when the portal has no CSV for it"""
+
+    @abstractmethod
+    def record_mdate(self, record: Dict[str, Any]) -> Optional[datetime]:
+        """Last modification time of a raw record"""
+
+    @abstractmethod
+    def normalize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Catalog fields of a raw record: title, description, url, info_url, slug,
+        original_source, direct_source and source_at
+        """
+
+
+def parse_datetime(value: Optional[str], formats: List[str]) -> Optional[datetime]:
+    """
+    Parse a portal timestamp (assumed UTC) with the first matching format
+    """
+    if not value:
+        return None
+    for fmt in formats:
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except (ValueError, TypeError):
+            continue
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def strip_html(text: Optional[str]) -> str:
+    """
+    Turn the paragraph markup portals put in descriptions into plain text
+    """
+    return (text or "").replace("<p>", "").replace("</p>", "\n").replace("<br>", "\n").strip()
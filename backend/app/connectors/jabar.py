@@ -0,0 +1,54 @@
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import httpx
+from app.connectors.base import Connector, parse_datetime, strip_html
+
+MDATE_FORMATS = ["%Y-%m-%d %H:%M:%S"]
+
+
+class JabarConnector(Connector):
+    """
+    Open Data Provinsi Jawa Barat (only datasets published by the province itself)
+    """
+    name = "jabar"
+    source = "opendata.jabarprov.go.id"
+    base_url = "https://data.jabarprov.go.id/api-backend"
+    info_base_url = "https://opendata.jabarprov.go.id"
+    info_path = "/id/dataset/"
+    slug_prefix = "jabarprov_"
+    # Regional filter applied to the dataset listing (1 = pemprov)
+    where = {"regional_id": 1}
+
+    async def list_page(self, client: httpx.AsyncClient, page: int) -> List[Dict[str, Any]]:
+        params = {
+            "limit": self.page_size,
+            "skip": page * self.page_size,
+            "sort": "mdate:desc",
+        }
+        if self.where:
+            params["where"] = json.dumps(self.where)
+
+        response = await client.get(f"{self.base_url}/dataset", params=params)
+        response.raise_for_status()
+        return response.json().get("data", [])
+
+    def csv_url(self, record: Dict[str, Any]) -> Optional[str]:
+        if not record.get("bigdata_url"):
+            return None
+        return f"{self.base_url}{record['bigdata_url']}?download=csv"
+
+    def record_mdate(self, record: Dict[str, Any]) -> Optional[datetime]:
+        return parse_datetime(record.get("mdate"), MDATE_FORMATS)
+
+    def normalize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "title": record["name"],
+            "description": strip_html(record.get("description")),
+            "url": self.csv_url(record),
+            "slug": self.slug_prefix + record["title"],
+            "info_url": f"{self.info_base_url}{self.info_path}{record['title']}",
+            "direct_source": self.source,
+            "original_source": self.source,
+            "source_at": self.record_mdate(record) or datetime.now(timezone.utc),
+        }
@@ -1,11 +1,13 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, func, Boolean
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import event, Column, String, Text, DateTime, ForeignKey, func, Boolean, Index, Computed, Integer, BigInteger, Float
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR, JSONB, ARRAY
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, relationship,  declarative_base
+from sqlalchemy.orm import Session, sessionmaker, relationship,  declarative_base, deferred
 import os
+import time
 from dotenv import load_dotenv
 import uuid
 from pgvector.sqlalchemy import Vector
+from app.utils.metrics import DB_POOL_WAIT_SECONDS
 
 # Load environment variables
 load_dotenv()
@@ -34,6 +36,23 @@ engine = create_async_engine(DATABASE_URL,
 )
 AsyncSessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+# Time from a session's first statement to the start of its transaction, i.e. the wait
+# for a pooled connection (including opening a new one), in db_pool_wait_seconds
+@event.listens_for(Session, "do_orm_execute")
+def _mark_connection_wait(orm_execute_state):
+    session = orm_execute_state.session
+    if not session.in_transaction():
+        session.info["connection_requested_at"] = time.perf_counter()
+
+@event.listens_for(Session, "after_begin")
+def _record_connection_wait(session, transaction, connection):
+    requested_at = session.info.pop("connection_requested_at", None)
+    if requested_at is not None:
+        DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - requested_at)
+
+# Text search configuration used for catalog keyword search
+SEARCH_CONFIG = "indonesian"
+
 Base = declarative_base()
 
 # Database models
@@ -49,9 +68,97 @@ class DatasetCatalog(Base):
     direct_source = Column(String, nullable=False)
     original_source = Column(String, nullable=False)
     source_at = Column(DateTime(timezone=True), nullable=False)
-    embedding = Column(Vector(768))  # Gemini embedding dimension
+    # Both embedding slots are deferred: loading an entity never selects a vector column,
+    # so recreating a slot with new dimensions cannot invalidate statements asyncpg has
+    # prepared on pooled connections ("cached plan must not change result type")
+    embedding = deferred(Column(Vector()))  # dimensions follow the embedding model of the slot (768 for Gemini embedding-001)
+    content_hash = Column(String(64), nullable=True)  # embedding_content_hash of the embedded text
+    # Second embedding slot, filled with a new embedding model before retrieval switches to it
+    embedding_alt = deferred(Column(Vector()))
+    content_hash_alt = Column(String(64), nullable=True)
     is_cors_allowed = Column(Boolean, nullable=False, default=False)
     slug = Column(String, nullable=False, unique=True)
+    prompt_card = Column(Text, nullable=True)  # Compact description used in LLM prompts
+    # Full-text search document, maintained by Postgres (title weighted above description)
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')",
+            persisted=True
+        )
+    ))
+
+    __table_args__ = (
+        # Keyset pagination index for GET /dataset (ORDER BY source_at DESC, id DESC)
+        Index("ix_dataset_catalog_source_at_id", source_at.desc(), id.desc()),
+        # Keyword search index for GET /dataset?search=
+        Index("ix_dataset_catalog_search_vector", search_vector, postgresql_using="gin"),
+        # Facet filters for GET /dataset, keeping the keyset order within a source
+        Index("ix_dataset_catalog_original_source", original_source, source_at.desc(), id.desc()),
+        Index("ix_dataset_catalog_direct_source", direct_source, source_at.desc(), id.desc()),
+    )
+
+# Precomputed dataset counts per facet value, refreshed after ingestion
+class DatasetFacet(Base):
+    __tablename__ = "dataset_facets"
+
+    facet = Column(String, primary_key=True)  # "original_source", "direct_source" or "year"
+    value = Column(String, primary_key=True)
+    dataset_count = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Monotonic counter bumped by ingestion whenever the catalog changes (single row, id = 1)
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Newest source modification time already synced, per ingestion source
+class SourceWatermark(Base):
+    __tablename__ = "source_watermarks"
+
+    source = Column(String, primary_key=True)
+    watermark = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# One row per ingestion run of a source: progress, checkpoint, counters and outcome.
+# An interrupted run can be resumed from `next_page` (every earlier page is committed).
+class IngestionRun(Base):
+    __tablename__ = "ingestion_runs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    source = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="running")  # "running", "completed" or "failed"
+    full = Column(Boolean, nullable=False, default=False)
+    watermark = Column(DateTime(timezone=True), nullable=True)  # watermark the run syncs from
+    next_page = Column(Integer, nullable=False, default=0)
+    max_mdate = Column(DateTime(timezone=True), nullable=True)  # newest modification time committed
+    counts = Column(JSONB, nullable=False, default=dict)
+    attempts = Column(Integer, nullable=False, default=1)
+    duration_seconds = Column(Float, nullable=False, default=0.0)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_ingestion_runs_source_started_at", "source", started_at.desc()),
+    )
+
+# Embedding models and the column slot ("embedding" or "embedding_alt") each is stored in.
+# Retrieval uses the "active" model; a new model is backfilled into the other slot first.
+class EmbeddingModel(Base):
+    __tablename__ = "embedding_models"
+
+    name = Column(String, primary_key=True)
+    dimensions = Column(Integer, nullable=False)
+    slot = Column(String, nullable=False)
+    status = Column(String, nullable=False)  # "backfilling", "ready", "active" or "retired"
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    activated_at = Column(DateTime(timezone=True), nullable=True)
 
 class ReferenceQuery(Base):
     __tablename__ = "reference_queries"
@@ -60,7 +167,15 @@ class ReferenceQuery(Base):
     title = Column(String, nullable=False)
     description = Column(Text, nullable=False)
     sql_query = Column(Text, nullable=False)
-    embedding = Column(Vector(768))  # Gemini embedding dimension
+    sql_hash = Column(String(64), nullable=True, unique=True)  # sql_hash of sql_query, dedupes examples
+    # Both embedding slots are deferred: loading an entity never selects a vector column,
+    # so recreating a slot with new dimensions cannot invalidate statements asyncpg has
+    # prepared on pooled connections ("cached plan must not change result type")
+    embedding = deferred(Column(Vector()))  # dimensions follow the embedding model of the slot (768 for Gemini embedding-001)
+    content_hash = Column(String(64), nullable=True)  # embedding_content_hash of the embedded text
+    # Second embedding slot, filled with a new embedding model before retrieval switches to it
+    embedding_alt = deferred(Column(Vector()))
+    content_hash_alt = Column(String(64), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -81,6 +196,10 @@ class ChatMessage(Base):
     session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
     role = Column(String, nullable=False)  # "user" or "assistant"
     content = Column(Text, nullable=False)
+    # Assistant response cut short because the client disconnected mid-stream
+    truncated = Column(Boolean, nullable=False, default=False, server_default="false")
+    # Catalog datasets the assistant response was generated with, reused by follow-up questions
+    dataset_ids = Column(ARRAY(UUID(as_uuid=True)), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship to session
@@ -8,6 +8,9 @@ class GenerateSQLRequest(BaseModel):
     session_id: uuid.UUID
     question: str
 
+class GenerateSQLBatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+
 class StartSessionRequest(BaseModel):
     title: Optional[str] = None
 
@@ -20,6 +23,8 @@ class MessageModel(BaseModel):
     id: uuid.UUID
     role: str
     content: str
+    truncated: bool = False
+    dataset_ids: Optional[List[uuid.UUID]] = None  # Datasets an assistant message was generated with
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
@@ -48,6 +53,7 @@ class DatasetReference(BaseModel):
     source_at: datetime
     is_cors_allowed: bool
     slug: str
+    prompt_card: Optional[str] = Field(default=None, exclude=True)  # Prompt-only, not part of API responses
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -66,15 +72,39 @@ class GenerateSQLResponse(BaseModel):
     explanation: str
     messages: List[MessageModel]
 
+class GenerateSQLBatchResult(BaseModel):
+    """One line of the /generate-sql/batch NDJSON response"""
+    index: int  # Position of the question in the request
+    question: str
+    explanation: Optional[str] = None
+    sql: Optional[str] = None
+    datasets_used: List[DatasetReference] = []
+    reference_queries_used: List[QueryReference] = []
+    error: Optional[str] = None
+
+class DatasetListItem(DatasetReference):
+    snippet: Optional[str] = None  # Highlighted description fragment (escaped HTML, matches in <mark>), only set for keyword search
+
 class DatasetListMetadata(BaseModel):
     limit: Optional[int] = 10
-    after: Optional[uuid.UUID] = None  # Cursor for the next page
+    after: Optional[str] = None  # Opaque cursor for the next page
     search: Optional[str] = None
+    original_source: Optional[str] = None
+    direct_source: Optional[str] = None
+    year: Optional[int] = None
 
 class DatasetListResponse(BaseModel):
     message: str
     metadata: DatasetListMetadata
-    data: List[DatasetReference]
+    data: List[DatasetListItem]
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class DatasetFacetsResponse(BaseModel):
+    message: str
+    data: Dict[str, List[FacetCount]]  # facet name -> counts per value
 
 # Error models
 class ErrorResponse(BaseModel):
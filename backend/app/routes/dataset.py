@@ -1,119 +1,217 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse, RedirectResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, RedirectResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
+from sqlalchemy import select, tuple_
 import httpx
+import time
 import uuid
 from typing import List, Optional
 
 from app.models.db import get_db, DatasetCatalog
-from app.models.schema import DatasetListResponse, DatasetListMetadata, DatasetReference
+from app.models.schema import DatasetListResponse, DatasetListMetadata, DatasetListItem, DatasetFacetsResponse
+from app.services.catalog_facets import get_catalog_facets, year_range
+from app.services.catalog_search import build_prefix_tsquery, search_query, search_rank, search_snippet
+from app.services.catalog_cache import get_catalog_version, dataset_list_cache, dataset_slug_cache
+from app.utils.cursor import encode_cursor, decode_cursor, InvalidCursorError
+from app.utils.http_cache import make_etag, is_not_modified, cache_headers
+from app.utils.metrics import PROXY_BYTES, PROXY_BYTES_PER_SECOND
 
 router = APIRouter()
 
 
 @router.get("/dataset", response_model=DatasetListResponse)
 async def list_datasets(
+    request: Request,
     limit: Optional[int] = Query(None, ge=1, le=100, description="Number of items to display per page. Defaults to 10 if not provided."),
-    after: Optional[uuid.UUID] = Query(None, description="Cursor for pagination; the ID of the last item from the previous page."),
-    search: Optional[str] = Query(None, description="Keyword to filter datasets by title or description."),
+    after: Optional[str] = Query(None, description="Opaque cursor for pagination, taken from `metadata.after` of the previous page."),
+    search: Optional[str] = Query(None, description="Keywords to search in dataset title and description (prefix match)."),
+    original_source: Optional[str] = Query(None, description="Only datasets from this original source (see GET /dataset/facets)."),
+    direct_source: Optional[str] = Query(None, description="Only datasets from this direct source (see GET /dataset/facets)."),
+    year: Optional[int] = Query(None, ge=1900, le=2100, description="Only datasets whose 'source_at' falls in this year (UTC)."),
     db: AsyncSession = Depends(get_db)
 ):
     """
     List and search datasets from the catalog.
     Supports pagination using a cursor (`after`) and keyword search.
     Results are sorted by 'source_at' (descending) and then 'id' (descending).
+    The cursor encodes the (source_at, id) of the last item, so each page is a single
+    range scan on the composite (source_at DESC, id DESC) index.
+    Keyword search uses the GIN-indexed full-text document; its results are sorted by
+    relevance first and come with a highlighted snippet of the description: HTML in
+    which the description is escaped and the matched terms are wrapped in <mark>.
+    Facet filters (`original_source`, `direct_source`, `year`) can be combined with both.
+    Responses are cached per catalog version and carry an ETag for conditional requests.
     """
     effective_limit = limit if limit is not None else 10
-    stmt = select(DatasetCatalog)
-
-    # Apply search filter
-    if search:
-        search_term_like = f"%{search}%"
-        # Assuming DatasetCatalog has 'title' and 'description' fields for searching.
-        # These fields are present in the DatasetReference model.
-        stmt = stmt.where(
-            or_(
-                DatasetCatalog.title.ilike(search_term_like),
-                DatasetCatalog.description.ilike(search_term_like)
-            )
+    search = search.strip() if search and search.strip() else None
+
+    version = await get_catalog_version(db)
+    cache_key = (effective_limit, after, search, original_source, direct_source, year)
+    cached = dataset_list_cache.get(cache_key, version)
+    if cached is None:
+        page = await query_dataset_page(db, effective_limit, after, search, original_source, direct_source, year)
+        body = page.model_dump_json().encode()
+        cached = dataset_list_cache.set(cache_key, version, (body, make_etag(version, body)))
+
+    body, etag = cached
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return Response(content=body, media_type="application/json", headers=cache_headers(etag))
+
+async def query_dataset_page(
+    db: AsyncSession,
+    effective_limit: int,
+    after: Optional[str] = None,
+    search: Optional[str] = None,
+    original_source: Optional[str] = None,
+    direct_source: Optional[str] = None,
+    year: Optional[int] = None
+) -> DatasetListResponse:
+    """
+    Run the catalog page query behind GET /dataset (uncached)
+    """
+    tsquery_text = build_prefix_tsquery(search) if search else None
+
+    if tsquery_text:
+        query = search_query(tsquery_text)
+        rank = search_rank(query)
+        stmt = (
+            select(DatasetCatalog, rank, search_snippet(query))
+            .where(DatasetCatalog.search_vector.op("@@")(query))
         )
+        sort_key = [rank, DatasetCatalog.source_at, DatasetCatalog.id]
+    else:
+        stmt = select(DatasetCatalog)
+        sort_key = [DatasetCatalog.source_at, DatasetCatalog.id]
+
+    # Apply facet filters
+    if original_source:
+        stmt = stmt.where(DatasetCatalog.original_source == original_source)
+    if direct_source:
+        stmt = stmt.where(DatasetCatalog.direct_source == direct_source)
+    if year:
+        year_start, year_end = year_range(year)
+        stmt = stmt.where(DatasetCatalog.source_at >= year_start, DatasetCatalog.source_at < year_end)
 
     # Apply cursor-based pagination
     if after:
-        # Fetch the 'source_at' and 'id' of the item specified by the 'after' cursor
-        cursor_stmt = select(DatasetCatalog.source_at, DatasetCatalog.id).where(DatasetCatalog.id == after)
-        cursor_result = await db.execute(cursor_stmt)
-        cursor_item = cursor_result.one_or_none()
+        try:
+            cursor_source_at, cursor_id_val, cursor_rank = decode_cursor(after)
+        except InvalidCursorError:
+            raise HTTPException(status_code=400, detail="Invalid 'after' cursor.")
 
-        if not cursor_item:
-            raise HTTPException(status_code=404, detail="Cursor dataset not found. Invalid 'after' parameter.")
-        
-        cursor_source_at, cursor_id_val = cursor_item
-        # Filter for items "after" the cursor item, based on sorting order (source_at DESC, id DESC)
-        stmt = stmt.where(
-            (DatasetCatalog.source_at < cursor_source_at) |
-            ((DatasetCatalog.source_at == cursor_source_at) & (DatasetCatalog.id < cursor_id_val))
-        )
+        # A ranked cursor only makes sense for a search, and vice versa
+        if (cursor_rank is None) == bool(tsquery_text):
+            raise HTTPException(status_code=400, detail="Invalid 'after' cursor for this search.")
 
-    # Apply sorting (newest first, with ID as tie-breaker for stable pagination)
-    stmt = stmt.order_by(DatasetCatalog.source_at.desc(), DatasetCatalog.id.desc())
+        cursor_values = [cursor_source_at, cursor_id_val]
+        if tsquery_text:
+            cursor_values.insert(0, cursor_rank)
+
+        # Filter for items "after" the cursor position, based on the sorting order (all DESC).
+        # The row comparison lets Postgres turn this into a single index range condition.
+        stmt = stmt.where(tuple_(*sort_key) < tuple_(*cursor_values))
+
+    # Apply sorting (most relevant / newest first, with ID as tie-breaker for stable pagination)
+    stmt = stmt.order_by(*[column.desc() for column in sort_key])
 
     # Apply limit
     stmt = stmt.limit(effective_limit)
 
     # Execute query
     result = await db.execute(stmt)
-    datasets_db = result.scalars().all()
 
     # Prepare data for response
-    response_data = [DatasetReference.from_orm(ds) for ds in datasets_db]
+    last_rank = None
+    if tsquery_text:
+        response_data = []
+        for ds, last_rank, snippet in result.all():
+            item = DatasetListItem.model_validate(ds)
+            item.snippet = snippet
+            response_data.append(item)
+    else:
+        response_data = [DatasetListItem.model_validate(ds) for ds in result.scalars().all()]
 
     # Determine the cursor for the next page
     next_page_cursor = None
     if len(response_data) == effective_limit:
-        # If 'effective_limit' items were fetched, the last item's ID is the cursor for the next page
-        next_page_cursor = response_data[-1].id
+        # If 'effective_limit' items were fetched, the last item's position is the cursor for the next page
+        next_page_cursor = encode_cursor(response_data[-1].source_at, response_data[-1].id, last_rank)
 
     return DatasetListResponse(
         message="success",
-        metadata=DatasetListMetadata(limit=effective_limit, after=next_page_cursor, search=search),
+        metadata=DatasetListMetadata(
+            limit=effective_limit,
+            after=next_page_cursor,
+            search=search,
+            original_source=original_source,
+            direct_source=direct_source,
+            year=year
+        ),
         data=response_data
     )
 
+@router.get("/dataset/facets", response_model=DatasetFacetsResponse)
+async def list_dataset_facets(db: AsyncSession = Depends(get_db)):
+    """
+    Dataset counts per original source, direct source and year of 'source_at'.
+    Served from the precomputed dataset_facets table, which ingestion refreshes.
+    """
+    facets = await get_catalog_facets(db)
+    return DatasetFacetsResponse(message="success", data=facets)
+
 @router.get("/dataset/{slug}")
 async def get_dataset_data(
     slug: str,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get dataset data by slug. If CORS is allowed, redirect to URL.
     Otherwise, proxy the content stream.
+    The slug lookup is cached per catalog version.
     """
-    # Get dataset info
-    result = await db.execute(
-        select(DatasetCatalog).where(DatasetCatalog.slug == slug)
-    )
-    dataset = result.scalar_one_or_none()
-    
+    # Get dataset info (cached, including misses, until the catalog version changes)
+    version = await get_catalog_version(db)
+    dataset = dataset_slug_cache.get(slug, version)
+    if dataset is None:
+        result = await db.execute(
+            select(DatasetCatalog.slug, DatasetCatalog.url, DatasetCatalog.is_cors_allowed)
+            .where(DatasetCatalog.slug == slug)
+        )
+        row = result.one_or_none()
+        dataset = dataset_slug_cache.set(slug, version, dict(row._mapping) if row else {})
+
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
         
     # If CORS is allowed, redirect to the URL
-    if dataset.is_cors_allowed:
-        return RedirectResponse(url=dataset.url)
+    if dataset["is_cors_allowed"]:
+        etag = make_etag(version, dataset["slug"], dataset["url"])
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers=cache_headers(etag))
+        return RedirectResponse(url=dataset["url"], headers=cache_headers(etag))
     
     # Otherwise, proxy the content
     async def stream_content():
-        async with httpx.AsyncClient() as client:
-            async with client.stream('GET', dataset.url) as response:
-                async for chunk in response.aiter_bytes():
-                    yield chunk
+        start = time.perf_counter()
+        total_bytes = 0
+        try:
+            async with httpx.AsyncClient() as client:
+                async with client.stream('GET', dataset["url"]) as response:
+                    async for chunk in response.aiter_bytes():
+                        total_bytes += len(chunk)
+                        PROXY_BYTES.inc(len(chunk))
+                        yield chunk
+        finally:
+            elapsed = time.perf_counter() - start
+            if total_bytes and elapsed > 0:
+                PROXY_BYTES_PER_SECOND.observe(total_bytes / elapsed)
     
     return StreamingResponse(
         stream_content(),
         media_type='text/csv',
         headers={
-            'Content-Disposition': f'attachment; filename="{dataset.slug}.csv"'
+            'Content-Disposition': f'attachment; filename="{dataset["slug"]}.csv"'
         }
     )
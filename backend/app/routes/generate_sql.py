@@ -1,16 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from contextlib import aclosing
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.db import get_db
-from app.models.schema import GenerateSQLRequest, GenerateSQLResponse, ErrorResponse
-from app.services.rag_dataset import get_relevant_datasets
-from app.services.rag_sql import get_relevant_queries
+from app.models.schema import GenerateSQLRequest, GenerateSQLResponse, GenerateSQLBatchRequest, ErrorResponse, DatasetReference, QueryReference, MessageModel
+from app.services.rag_session import get_session_context
 from app.services.llm import generate_sql_from_nl, generate_sql_stream
 from app.services.memory import save_message, get_session_history, get_session
+from app.utils.metrics import StageTimer, start_stage_timer, GENERATIONS_CANCELLED
+from app.utils.sse import EventStreamResponse, coalesce_text, format_event
+from app.services.sql_validation import AnswerSplitter
+from app.services.admission import llm_admission, Admission, AdmissionError
+from app.services.generations import Generation, generations, parse_event_id
+from app.services.idempotency import idempotent_requests, IdempotencyError
+from app.services.batch_generation import retrieve_batch, generate_batch, GENERATE_BATCH_MAX_QUESTIONS
 from uuid import UUID
 
 router = APIRouter()
 
+T = TypeVar("T")
+
 @router.post(
     "/generate-sql",
     response_model=GenerateSQLResponse,
@@ -18,136 +29,375 @@ router = APIRouter()
 )
 async def generate_sql(
     request: GenerateSQLRequest,
-    db: AsyncSession = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Generate SQL from natural language question, using RAG and chat history.
+    The time spent in each stage is returned in the Server-Timing header.
+
+    With an `Idempotency-Key` header, requests repeating the key (and the question)
+    get the response of the first one instead of a new generation, flagged with an
+    `Idempotent-Replayed: true` header.
+    """
+    timer = start_stage_timer("generate_sql")
+
+    async def generate() -> GenerateSQLResponse:
+        admission = await _admit(request.session_id, timer)
+        try:
+            with timer.stage("total"):
+                return await _generate_sql(request, db, timer)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to generate SQL: {str(e)}")
+        finally:
+            admission.release()
+
+    result, replayed = await _run_idempotent("generate_sql", request, idempotency_key, generate)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    else:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return result
+
+async def _run_idempotent(
+    endpoint: str,
+    request: GenerateSQLRequest,
+    idempotency_key: Optional[str],
+    operation: Callable[[], Awaitable[T]]
+) -> Tuple[T, bool]:
+    """
+    Run `operation` once per Idempotency-Key of the session; returns its result and
+    whether it was replayed from an earlier request
     """
     try:
-        # First verify session exists
+        return await idempotent_requests.run(
+            endpoint, request.session_id, idempotency_key, request.question, operation
+        )
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+async def _admit(session_id: UUID, timer: StageTimer) -> Admission:
+    """
+    Take a generation slot, or fail fast with 429 (session busy) / 503 (overloaded)
+    and a Retry-After header
+    """
+    try:
+        with timer.stage("queue"):
+            return await llm_admission.admit(session_id)
+    except AdmissionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+async def _generate_sql(request: GenerateSQLRequest, db: AsyncSession, timer: StageTimer) -> GenerateSQLResponse:
+    # First verify session exists
+    with timer.stage("session"):
         session = await get_session(db, request.session_id)
-        if not session:
-            raise HTTPException(status_code=404, detail="Chat session not found")
-            
-        # Get chat history for context
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+
+    # Get chat history for context
+    with timer.stage("history"):
         chat_history = await get_session_history(db, request.session_id)
-            
-        # Get relevant datasets and example queries using RAG
-        relevant_datasets = await get_relevant_datasets(db, request.question)
-        relevant_queries = await get_relevant_queries(db, request.question)
-        
-        if not relevant_datasets:
-            raise HTTPException(
-                status_code=400, 
-                detail="No relevant datasets found for your question"
-            )
-        
-        # Save user message to chat history
+
+    # Get relevant datasets and example queries using RAG, reusing the conversation's
+    # datasets for follow-ups (embedding and vector_search stages are timed inside)
+    relevant_datasets, relevant_queries = await get_session_context(db, request.question, chat_history)
+
+    if not relevant_datasets:
+        raise HTTPException(
+            status_code=400, 
+            detail="No relevant datasets found for your question"
+        )
+
+    # Save user message to chat history
+    with timer.stage("save_message"):
         await save_message(
             db, 
             session_id=request.session_id, 
             role="user", 
             content=request.question
         )
-        
-        # Generate SQL using LLM with context
+
+    # Generate SQL using LLM with context
+    with timer.stage("llm"):
         sql_result = await generate_sql_from_nl(
             question=request.question,
             chat_history=chat_history,
             datasets=relevant_datasets,
             reference_queries=relevant_queries
         )
-        
-        # Save assistant response to chat history
+
+    # Save assistant response to chat history
+    with timer.stage("save_message"):
         assistant_msg = await save_message(
             db, 
             session_id=request.session_id, 
             role="assistant", 
-            content=sql_result["sql"]
+            content=sql_result["sql"],
+            dataset_ids=[dataset.id for dataset in relevant_datasets]
         )
-        
-        # Get updated chat history
+
+    # Get updated chat history
+    with timer.stage("history"):
         updated_chat_history = await get_session_history(db, request.session_id)
-        
-        return GenerateSQLResponse(
-            sql=sql_result["sql"],
-            datasets_used=relevant_datasets,
-            reference_queries_used=relevant_queries,
-            explanation=sql_result["explanation"],
-            messages=updated_chat_history
+
+    return GenerateSQLResponse(
+        sql=sql_result["sql"],
+        datasets_used=relevant_datasets,
+        reference_queries_used=relevant_queries,
+        explanation=sql_result["explanation"],
+        messages=updated_chat_history
+    )
+
+@router.post(
+    "/generate-sql/batch",
+    responses={400: {"model": ErrorResponse}}
+)
+async def generate_sql_batch(
+    request: GenerateSQLBatchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Generate SQL for many questions at once (evaluation sets, prefetching answers),
+    without a chat session and without chat history. All questions are embedded and
+    matched against the catalog up front in batched calls; the LLM then answers them,
+    GENERATE_BATCH_CONCURRENCY at a time, and each result is sent as one line of NDJSON
+    (see GenerateSQLBatchResult) as soon as it is ready, so lines come out of order.
+    Nothing is saved to chat history.
+
+    Every LLM call is admitted like a single generation: the batch is rejected with 503
+    and a Retry-After header when the generation queue is already full, and a question
+    not admitted later on gets the admission error in its line.
+
+    Retrieval runs before the response starts, so its timings go in the Server-Timing
+    header; the LLM calls are only recorded in the metrics.
+    """
+    if len(request.questions) > GENERATE_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {GENERATE_BATCH_MAX_QUESTIONS} questions can be sent in one batch"
         )
-        
-    except HTTPException:
-        raise
+    try:
+        llm_admission.check()
+    except AdmissionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+    timer = start_stage_timer("generate_sql_batch")
+    try:
+        datasets, reference_queries = await retrieve_batch(db, request.questions)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate SQL: {str(e)}")
 
+    async def lines():
+        with timer.stage("llm"):
+            async with aclosing(generate_batch(request.questions, datasets, reference_queries)) as results:
+                async for result in results:
+                    yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(
+        lines(), media_type="application/x-ndjson", headers={"Server-Timing": timer.server_timing()}
+    )
+
 @router.post("/generate-sql-stream")
 async def generate_sql_stream_endpoint(
     request: GenerateSQLRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    last_event_id: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
-    Stream SQL generation results using server-sent events
+    Stream SQL generation results using server-sent events with JSON payloads:
+    `meta` (generation id, datasets and reference queries used), then `explanation` and
+    `sql` text deltas (the answer is split on the separator line server-side), then
+    `done` with the saved message id and the whole explanation and SQL, or `error` with
+    a `detail`. Text is coalesced into fewer, larger events and idle periods get
+    heartbeat comments.
+
+    The generation runs on when the connection drops: sending the same request again
+    with a `Last-Event-ID` header (the id of the last event received) replays the missed
+    events and follows the generation to its end, without generating anew. Likewise,
+    requests repeating the `Idempotency-Key` header of an earlier one follow its
+    generation from the start, flagged with an `Idempotent-Replayed: true` header.
+
+    Session lookup, history and retrieval run before the stream starts, so their
+    timings go in the Server-Timing header; the LLM and the final save are only
+    recorded in the metrics.
     """
-    async def event_generator():
-        try:
-            # Verify session exists
+    if last_event_id:
+        return _resume_stream(request, last_event_id)
+
+    timer = start_stage_timer("generate_sql_stream")
+    try:
+        generation, replayed = await _run_idempotent(
+            "generate_sql_stream", request, idempotency_key,
+            lambda: _start_generation(request, db, timer, idempotency_key)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        detail = str(e)
+
+        async def error_event():
+            yield format_event("error", {"detail": detail})
+        return EventStreamResponse(error_event(), headers={"Server-Timing": timer.server_timing()})
+
+    headers = {"X-Generation-Id": generation.id}
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    else:
+        headers["Server-Timing"] = timer.server_timing()
+    return EventStreamResponse(generation.follow(), headers=headers)
+
+async def _start_generation(
+    request: GenerateSQLRequest,
+    db: AsyncSession,
+    timer: StageTimer,
+    idempotency_key: Optional[str]
+) -> Generation:
+    """
+    Admit the request, run the steps before the LLM and start the generation;
+    problems found on the way are raised for the error event
+    """
+    admission = await _admit(request.session_id, timer)
+    try:
+        # Verify session exists
+        with timer.stage("session"):
             session = await get_session(db, request.session_id)
-            if not session:
-                yield "data: " + '{"error": "Chat session not found"}\n\n'
-                return
-                
-            # Get chat history for context
+        if not session:
+            raise LookupError("Chat session not found")
+
+        # Get chat history for context
+        with timer.stage("history"):
             chat_history = await get_session_history(db, request.session_id)
-                
-            # Get relevant datasets and example queries using RAG
-            relevant_datasets = await get_relevant_datasets(db, request.question)
-            relevant_queries = await get_relevant_queries(db, request.question)
-            
-            if not relevant_datasets:
-                yield "data: " + '{"error": "No relevant datasets found for your question"}\n\n'
-                return
-            
-            # Save user message to chat history
+
+        # Get relevant datasets and example queries using RAG, reusing the conversation's
+        # datasets for follow-ups
+        relevant_datasets, relevant_queries = await get_session_context(db, request.question, chat_history)
+
+        if not relevant_datasets:
+            raise LookupError("No relevant datasets found for your question")
+
+        # Save user message to chat history
+        with timer.stage("save_message"):
             await save_message(
                 db, 
                 session_id=request.session_id, 
                 role="user", 
                 content=request.question
             )
-            
-            # Stream SQL generation
-            full_response = ""
-            async for chunk in generate_sql_stream(
-                question=request.question,
-                chat_history=chat_history,
-                datasets=relevant_datasets,
-                reference_queries=relevant_queries
-            ):
-                full_response += chunk
-                yield f"data: {chunk}\n\n"
-            
-            # Save complete response to chat history
-            await save_message(
+
+        # The generation slot is held until the generation ends, however it ends. The
+        # generation outlives the request, so it gets a session of its own: get_db closes
+        # the request's once the response is over, possibly while the generation saves.
+        generation = generations.add(Generation(request.session_id))
+        generation_db = AsyncSession(db.bind, expire_on_commit=False)
+        return generation.start(_produce_stream(
+            generation, request, generation_db, timer, admission, idempotency_key,
+            chat_history, relevant_datasets, relevant_queries
+        ))
+    except BaseException:
+        admission.release()
+        raise
+
+def _resume_stream(request: GenerateSQLRequest, last_event_id: str) -> EventStreamResponse:
+    """
+    Follow a generation of this session again, from the event after `last_event_id`
+    """
+    parsed = parse_event_id(last_event_id)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail="Malformed Last-Event-ID header")
+    generation = generations.get(parsed[0])
+    if generation is None or generation.session_id != request.session_id:
+        raise HTTPException(status_code=404, detail="Generation not found or expired, ask again")
+    return EventStreamResponse(generation.follow(parsed[1]), headers={"X-Generation-Id": generation.id})
+
+async def _produce_stream(
+    generation: Generation,
+    request: GenerateSQLRequest,
+    db: AsyncSession,
+    timer: StageTimer,
+    admission: Admission,
+    idempotency_key: Optional[str],
+    chat_history: List[MessageModel],
+    datasets: List[DatasetReference],
+    reference_queries: List[QueryReference]
+):
+    """
+    Run a streamed generation, publishing its events to `generation`. It runs as its own
+    task so clients can reconnect to it, and is cancelled once nobody follows it anymore.
+    """
+    full_response = ""
+    completed = False
+    stream = generate_sql_stream(
+        question=request.question,
+        chat_history=chat_history,
+        datasets=datasets,
+        reference_queries=reference_queries
+    )
+    splitter = AnswerSplitter()
+
+    async def deltas():
+        nonlocal full_response
+        async for chunk in stream:
+            full_response += chunk
+            for delta in splitter.feed(chunk):
+                yield delta
+        for delta in splitter.finish():
+            yield delta
+
+    try:
+        generation.publish("meta", {
+            "generation_id": generation.id,
+            "datasets_used": [dataset.model_dump(mode="json") for dataset in datasets],
+            "reference_queries_used": [query.model_dump(mode="json") for query in reference_queries],
+        })
+
+        # Stream SQL generation (heartbeats are up to each connection)
+        with timer.stage("llm"):
+            async with aclosing(coalesce_text(deltas(), heartbeat_interval=None)) as events:
+                async for kind, text in events:
+                    generation.publish(kind, {"text": text})
+        completed = True
+
+        # Save complete response to chat history
+        with timer.stage("save_message"):
+            assistant_msg = await save_message(
                 db, 
                 session_id=request.session_id, 
                 role="assistant", 
-                content=full_response
+                content=full_response,
+                dataset_ids=[dataset.id for dataset in datasets]
             )
-            
-            # Signal end of stream
-            yield "data: [DONE]\n\n"
-            
-        except Exception as e:
-            yield f"data: " + '{"error": "' + str(e) + '"}\n\n'
-    
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Content-Type": "text/event-stream"
-        }
-    )
+
+        # Signal end of stream
+        generation.publish("done", {
+            "message_id": str(assistant_msg.id),
+            "explanation": splitter.explanation.strip(),
+            "sql": splitter.sql.strip(),
+        })
+
+    except asyncio.CancelledError:
+        # The client left and did not come back: stop the upstream LLM stream and keep
+        # what was generated so far. A retry with the same Idempotency-Key asks anew.
+        idempotent_requests.forget("generate_sql_stream", request.session_id, idempotency_key)
+        if not completed:
+            await stream.aclose()
+            GENERATIONS_CANCELLED.labels("generate_sql_stream").inc()
+            if full_response:
+                await save_message(
+                    db,
+                    session_id=request.session_id,
+                    role="assistant",
+                    content=full_response,
+                    truncated=True,
+                    dataset_ids=[dataset.id for dataset in datasets]
+                )
+        raise
+    except Exception as e:
+        idempotent_requests.forget("generate_sql_stream", request.session_id, idempotency_key)
+        generation.publish("error", {"detail": f"Error generating SQL: {str(e)}"})
+    finally:
+        generation.finish()
+        admission.release()
+        await db.close()
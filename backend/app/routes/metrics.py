@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics: SQL generation stage histograms, LLM time to first token and
+    tokens per second, database pool wait and dataset proxy throughput
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,172 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Hashable, Optional, Set
+from dotenv import load_dotenv
+from app.utils.metrics import LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT_SECONDS, ADMISSION_REJECTED
+
+# Load environment variables
+load_dotenv()
+
+# Generations running at once, across all sessions (per worker)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# Generations allowed to wait for a slot, more are rejected right away
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", 32))
+# How long (seconds) a queued generation waits for a slot before giving up
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 10))
+
+
+class AdmissionError(Exception):
+    """Raised when a generation is not admitted; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Admission:
+    """
+    A granted generation slot. Release it (or leave the `async with` block) when the
+    generation is over; releasing twice is harmless.
+    """
+
+    def __init__(self, controller: "AdmissionController", session_id: Hashable):
+        self._controller = controller
+        self._session_id = session_id
+        self._started_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self._session_id, time.monotonic() - self._started_at)
+
+    async def __aenter__(self) -> "Admission":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """
+    Admission control for LLM generations: at most `max_concurrency` run at once, up to
+    `max_queue` more wait (first come, first served) for at most `queue_timeout` seconds,
+    and a chat session only ever has one generation in flight. Anything beyond that is
+    rejected immediately, so a spike gets fast 429/503 responses with a Retry-After hint
+    instead of piling onto the LLM provider and the connection pool.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_QUEUE_SIZE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._sessions: Set[Hashable] = set()
+        # Moving average of generation durations, for Retry-After
+        self._average_seconds = 5.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _retry_after(self, ahead: int) -> int:
+        """Seconds until roughly `ahead` running generations have finished"""
+        return max(1, math.ceil(self._average_seconds * max(1, ahead) / self.max_concurrency))
+
+    def _reject(self, status_code: int, reason: str, detail: str, retry_after: int):
+        ADMISSION_REJECTED.labels(reason).inc()
+        raise AdmissionError(status_code, detail, retry_after)
+
+    def check(self) -> None:
+        """
+        Raise the AdmissionError (503) a generation would get right now because the queue
+        is full, without taking a slot; for requests admitting their generations later
+        """
+        if (self.in_flight >= self.max_concurrency or self._waiters) and len(self._waiters) >= self.max_queue:
+            self._reject(
+                503, "queue_full", "Too many generations in progress, try again shortly",
+                self._retry_after(len(self._waiters) + 1)
+            )
+
+    async def admit(self, session_id: Optional[Hashable] = None) -> Admission:
+        """
+        Wait for a generation slot for `session_id`. Raises AdmissionError (429 when the
+        session already has a generation running, 503 when the queue is full or the wait
+        times out).
+        """
+        if session_id is not None and session_id in self._sessions:
+            self._reject(
+                429, "session_busy", "A generation is already running for this session",
+                max(1, math.ceil(self._average_seconds))
+            )
+
+        self.check()
+        if self.in_flight >= self.max_concurrency or self._waiters:
+            self._sessions.add(session_id)
+            try:
+                await self._wait_for_slot()
+            except BaseException:
+                self._sessions.discard(session_id)
+                raise
+        else:
+            self._sessions.add(session_id)
+            self.in_flight += 1
+
+        LLM_IN_FLIGHT.set(self.in_flight)
+        return Admission(self, session_id)
+
+    async def _wait_for_slot(self) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        LLM_QUEUE_DEPTH.set(len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up, pass it on
+                self._release_slot()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            LLM_QUEUE_DEPTH.set(len(self._waiters))
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject(
+                503, "queue_timeout", "Timed out waiting for a free generation slot",
+                self._retry_after(len(self._waiters) + 1)
+            )
+        finally:
+            LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+    def _release(self, session_id: Hashable, seconds: float) -> None:
+        self._sessions.discard(session_id)
+        self._average_seconds = 0.8 * self._average_seconds + 0.2 * seconds
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        # Hand the slot straight to the oldest waiter that is still waiting
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+        else:
+            self.in_flight -= 1
+        LLM_QUEUE_DEPTH.set(len(self._waiters))
+        LLM_IN_FLIGHT.set(self.in_flight)
+
+
+# Shared by the generation endpoints
+llm_admission = AdmissionController()
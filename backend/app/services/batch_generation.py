@@ -0,0 +1,89 @@
+import asyncio
+import os
+from typing import AsyncIterator, List, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.schema import DatasetReference, QueryReference, GenerateSQLBatchResult
+from app.services.admission import llm_admission, AdmissionError
+from app.services.embedding_models import get_active_embedding
+from app.services.llm import generate_answer
+from app.services.rag_dataset import get_relevant_datasets_batch
+from app.services.rag_sql import get_relevant_queries_batch
+from app.services.sql_validation import split_response
+from app.utils.embedding import get_embeddings
+from app.utils.metrics import timed_stage
+
+# Load environment variables
+load_dotenv()
+
+# Questions of one batch answered by the LLM at once
+GENERATE_BATCH_CONCURRENCY = int(os.getenv("GENERATE_BATCH_CONCURRENCY", 4))
+# Most questions accepted in one batch
+GENERATE_BATCH_MAX_QUESTIONS = int(os.getenv("GENERATE_BATCH_MAX_QUESTIONS", 500))
+
+
+async def retrieve_batch(
+    db: AsyncSession,
+    questions: List[str]
+) -> Tuple[List[List[DatasetReference]], List[List[QueryReference]]]:
+    """
+    Relevant datasets and reference queries of every question, aligned with `questions`:
+    the questions are embedded in batched calls and each kind is retrieved in one query
+    """
+    slot = await get_active_embedding(db)
+    with timed_stage("embedding"):
+        embeddings = await get_embeddings(questions, model=slot.model)
+    datasets = await get_relevant_datasets_batch(db, slot, embeddings)
+    reference_queries = await get_relevant_queries_batch(db, slot, embeddings)
+    return datasets, reference_queries
+
+
+async def generate_batch(
+    questions: List[str],
+    datasets: List[List[DatasetReference]],
+    reference_queries: List[List[QueryReference]],
+    concurrency: int = GENERATE_BATCH_CONCURRENCY
+) -> AsyncIterator[GenerateSQLBatchResult]:
+    """
+    Answer every question without chat history, at most `concurrency` at once, yielding
+    the results as they complete. Each LLM call takes a generation slot like any other
+    generation; a question not admitted gets the admission error as its result. Closing
+    the iterator cancels the questions not answered yet.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(index: int) -> GenerateSQLBatchResult:
+        result = GenerateSQLBatchResult(
+            index=index,
+            question=questions[index],
+            datasets_used=datasets[index],
+            reference_queries_used=reference_queries[index]
+        )
+        if not datasets[index]:
+            result.error = "No relevant datasets found for your question"
+            return result
+        async with semaphore:
+            try:
+                admission = await llm_admission.admit()
+            except AdmissionError as e:
+                result.error = e.detail
+                return result
+            async with admission:
+                try:
+                    generated_text = await generate_answer(
+                        questions[index], [], datasets[index], reference_queries[index]
+                    )
+                except Exception as e:
+                    result.error = f"Error generating SQL: {str(e)}"
+                    return result
+        # An answer without the separator line is taken as bare SQL
+        result.explanation, result.sql = split_response(generated_text) or ("", generated_text.strip())
+        return result
+
+    tasks = [asyncio.ensure_future(answer(index)) for index in range(len(questions))]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.db import CatalogVersion
+
+# Load environment variables
+load_dotenv()
+
+# How long (seconds) a worker trusts its last read of the catalog version
+CATALOG_VERSION_TTL = float(os.getenv("CATALOG_VERSION_TTL", 5))
+
+# Maximum number of cached catalog responses per worker, per cache
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 256))
+# Maximum total size (bytes, keys and values, approximately) of one cache per worker
+CATALOG_CACHE_MAX_BYTES = int(os.getenv("CATALOG_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+
+CATALOG_VERSION_ID = 1
+
+_version_cache = {"version": None, "expires_at": 0.0}
+
+
+def approximate_size(value: Any) -> int:
+    """
+    Rough size in bytes of a cached key or value: the payload of strings and bytes, plus
+    the containers around them
+    """
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approximate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ResponseCache:
+    """
+    Small in-process LRU cache whose entries are only valid for the catalog version
+    they were computed for, so bumping the version invalidates everything at once.
+    It is bounded by entry count and by the approximate total size of keys and values;
+    a value larger than the whole budget is returned but not cached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CATALOG_CACHE_MAX_ENTRIES,
+        max_bytes: int = CATALOG_CACHE_MAX_BYTES,
+        sizeof: Callable[[Any], int] = approximate_size
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.size = 0
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, version: int, value: Any) -> Any:
+        self._discard(key)
+        size = self.sizeof(key) + self.sizeof(value)
+        if size > self.max_bytes:
+            return value
+        self._entries[key] = (version, value, size)
+        self.size += size
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self.size -= self._entries.popitem(last=False)[1][2]
+        return value
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+# Shared caches for the read-only catalog endpoints
+dataset_list_cache = ResponseCache()
+dataset_slug_cache = ResponseCache()
+
+
+async def get_catalog_version(db: AsyncSession) -> int:
+    """
+    Current catalog version, re-read from the database at most every CATALOG_VERSION_TTL seconds
+    """
+    now = time.monotonic()
+    if _version_cache["version"] is not None and now < _version_cache["expires_at"]:
+        return _version_cache["version"]
+
+    result = await db.execute(select(CatalogVersion.version).where(CatalogVersion.id == CATALOG_VERSION_ID))
+    version = result.scalar_one_or_none() or 0
+
+    _version_cache["version"] = version
+    _version_cache["expires_at"] = now + CATALOG_VERSION_TTL
+    return version
+
+
+async def bump_catalog_version(db: AsyncSession) -> int:
+    """
+    Mark the catalog as changed; API workers drop their cached responses within CATALOG_VERSION_TTL
+    """
+    stmt = insert(CatalogVersion).values(id=CATALOG_VERSION_ID, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CatalogVersion.id],
+        set_={"version": CatalogVersion.version + 1, "updated_at": func.now()}
+    ).returning(CatalogVersion.version)
+
+    result = await db.execute(stmt)
+    version = result.scalar_one()
+    await db.commit()
+    return version
+
+
+def reset_catalog_cache() -> None:
+    """
+    Forget the cached catalog version and all cached responses
+    """
+    _version_cache["version"] = None
+    _version_cache["expires_at"] = 0.0
+    dataset_list_cache.clear()
+    dataset_slug_cache.clear()
@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select, delete, func, and_, or_, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.db import DatasetCatalog, DatasetFacet
+from app.models.schema import FacetCount
+
+# Facets exposed by GET /dataset/facets
+FACETS = ("original_source", "direct_source", "year")
+
+
+def year_range(year: int) -> Tuple[datetime, datetime]:
+    """
+    [start, end) UTC range of a `year` facet value, usable with the source_at index
+    """
+    return (
+        datetime(year, 1, 1, tzinfo=timezone.utc),
+        datetime(year + 1, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def _facet_column(facet: str):
+    """
+    Catalog expression a facet groups by
+    """
+    if facet == "year":
+        return func.to_char(func.timezone("UTC", DatasetCatalog.source_at), "YYYY")
+    return getattr(DatasetCatalog, facet)
+
+
+def _facet_filter(facet: str, values: Set[str]):
+    """
+    Index-friendly filter selecting the catalog rows that belong to the given facet values
+    """
+    if facet == "year":
+        ranges = [year_range(int(value)) for value in values]
+        return or_(*[
+            and_(DatasetCatalog.source_at >= start, DatasetCatalog.source_at < end)
+            for start, end in ranges
+        ])
+    return getattr(DatasetCatalog, facet).in_(values)
+
+
+def collect_facet_values(datasets: Iterable[Dict]) -> Dict[str, Set[str]]:
+    """
+    Facet values touched by a batch of ingested datasets, to pass to `refresh_catalog_facets`.
+    Include the stored rows the datasets replaced (`get_stored_facet_rows`), so values
+    that updated rows left are recounted too.
+    """
+    touched = {facet: set() for facet in FACETS}
+    for data in datasets:
+        touched["original_source"].add(data["original_source"])
+        touched["direct_source"].add(data["direct_source"])
+        touched["year"].add(str(data["source_at"].astimezone(timezone.utc).year))
+    return touched
+
+
+async def get_stored_facet_rows(db: AsyncSession, slugs: List[str]) -> List[Dict]:
+    """
+    Facet columns of the catalog rows with these slugs as stored now, read before they
+    are overwritten
+    """
+    if not slugs:
+        return []
+    result = await db.execute(
+        select(DatasetCatalog.slug, DatasetCatalog.original_source, DatasetCatalog.direct_source, DatasetCatalog.source_at)
+        .where(DatasetCatalog.slug.in_(slugs))
+    )
+    return [dict(row._mapping) for row in result.all()]
+
+
+async def refresh_catalog_facets(
+    db: AsyncSession,
+    touched: Optional[Dict[str, Iterable[str]]] = None
+) -> None:
+    """
+    Recompute facet counts. With `touched`, only the listed facet values are recounted
+    (an incremental refresh after ingestion, exact as long as `touched` holds the old
+    values of updated rows as well as the new ones); without it every facet is rebuilt.
+    """
+    for facet in FACETS:
+        column = _facet_column(facet)
+        values = None if touched is None else set(touched.get(facet, ()))
+        if values is not None and not values:
+            continue
+
+        delete_stmt = delete(DatasetFacet).where(DatasetFacet.facet == facet)
+        count_stmt = select(literal(facet), column, func.count()).group_by(column)
+        if values is not None:
+            delete_stmt = delete_stmt.where(DatasetFacet.value.in_(values))
+            count_stmt = count_stmt.where(_facet_filter(facet, values))
+
+        # Values that dropped to zero datasets disappear with the delete
+        await db.execute(delete_stmt)
+
+        upsert_stmt = insert(DatasetFacet).from_select(["facet", "value", "dataset_count"], count_stmt)
+        upsert_stmt = upsert_stmt.on_conflict_do_update(
+            index_elements=[DatasetFacet.facet, DatasetFacet.value],
+            set_={"dataset_count": upsert_stmt.excluded.dataset_count, "updated_at": func.now()}
+        )
+        await db.execute(upsert_stmt)
+
+    await db.commit()
+
+
+async def get_catalog_facets(db: AsyncSession) -> Dict[str, List[FacetCount]]:
+    """
+    Read facet counts from the summary table (most common values first, newest year first)
+    """
+    result = await db.execute(
+        select(DatasetFacet.facet, DatasetFacet.value, DatasetFacet.dataset_count)
+        .order_by(DatasetFacet.facet, DatasetFacet.dataset_count.desc(), DatasetFacet.value)
+    )
+
+    facets = {facet: [] for facet in FACETS}
+    for facet, value, count in result.all():
+        facets.setdefault(facet, []).append(FacetCount(value=value, count=count))
+
+    facets["year"].sort(key=lambda item: item.value, reverse=True)
+    return facets
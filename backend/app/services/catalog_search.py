@@ -0,0 +1,62 @@
+import re
+from typing import Optional
+from sqlalchemy import cast, func, literal
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from app.models.db import DatasetCatalog, SEARCH_CONFIG
+
+# ts_headline options for the highlighted snippet returned with search results
+# (the only markup in a snippet, the description itself is HTML-escaped)
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=25, MinWords=8, FragmentDelimiter=" ... "'
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# Characters escaped in descriptions before highlighting, "&" first
+_HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#x27;"))
+
+
+def build_prefix_tsquery(search: str) -> Optional[str]:
+    """
+    Turn free text from the search box into a prefix tsquery ("samp jab" -> "samp:* & jab:*"),
+    so partially typed words still match. Returns None when nothing searchable is left.
+    """
+    tokens = _TOKEN_RE.findall(search.lower())
+    if not tokens:
+        return None
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+def search_query(tsquery_text: str):
+    """
+    tsquery expression for the given prefix query text
+    """
+    return func.to_tsquery(cast(literal(SEARCH_CONFIG), REGCONFIG), tsquery_text)
+
+
+def search_rank(query):
+    """
+    Relevance of a catalog row for the query (title matches weigh more than description)
+    """
+    return func.ts_rank(DatasetCatalog.search_vector, query)
+
+
+def html_escape(text):
+    """
+    SQL expression escaping `text` for HTML, like Python's html.escape
+    """
+    for char, entity in _HTML_ESCAPES:
+        text = func.replace(text, char, entity)
+    return text
+
+
+def search_snippet(query):
+    """
+    Highlighted fragment of the description around the matched terms: HTML, safe to
+    render as is, where the description is escaped and only the matches are wrapped in
+    <mark> tags
+    """
+    return func.ts_headline(
+        cast(literal(SEARCH_CONFIG), REGCONFIG),
+        html_escape(DatasetCatalog.description),
+        query,
+        HEADLINE_OPTIONS
+    )
@@ -0,0 +1,84 @@
+import os
+import time
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.db import EmbeddingModel
+from app.utils.embedding import embedding_model
+
+# Load environment variables
+load_dotenv()
+
+# How long (seconds) a worker trusts its last read of the active embedding model
+EMBEDDING_MODEL_TTL = float(os.getenv("EMBEDDING_MODEL_TTL", 5))
+
+# Embedding column slots and the content hash column that goes with each
+EMBEDDING_SLOTS = {
+    "embedding": "content_hash",
+    "embedding_alt": "content_hash_alt",
+}
+
+_active_cache = {"slot": None, "expires_at": 0.0}
+
+
+@dataclass(frozen=True)
+class EmbeddingSlot:
+    """
+    An embedding model together with the columns its vectors and content hashes live in.
+    Retrieval always takes both from the same slot, so questions are never embedded with
+    one model and compared against vectors of another.
+    """
+    model: str
+    column: str
+
+    @property
+    def hash_column(self) -> str:
+        return EMBEDDING_SLOTS[self.column]
+
+    @property
+    def other_column(self) -> str:
+        return next(column for column in EMBEDDING_SLOTS if column != self.column)
+
+    @property
+    def other_hash_column(self) -> str:
+        return EMBEDDING_SLOTS[self.other_column]
+
+
+# Used until the embedding_models table has an active model
+DEFAULT_SLOT = EmbeddingSlot(model=embedding_model, column="embedding")
+
+
+async def read_active_embedding(db: AsyncSession) -> EmbeddingSlot:
+    """
+    Active embedding model, read from the database
+    """
+    result = await db.execute(
+        select(EmbeddingModel.name, EmbeddingModel.slot).where(EmbeddingModel.status == "active")
+    )
+    row = result.first()
+    if row is None:
+        return DEFAULT_SLOT
+    return EmbeddingSlot(model=row.name, column=row.slot)
+
+
+async def get_active_embedding(db: AsyncSession) -> EmbeddingSlot:
+    """
+    Active embedding model, re-read from the database at most every EMBEDDING_MODEL_TTL seconds
+    """
+    now = time.monotonic()
+    if _active_cache["slot"] is not None and now < _active_cache["expires_at"]:
+        return _active_cache["slot"]
+
+    slot = await read_active_embedding(db)
+    _active_cache["slot"] = slot
+    _active_cache["expires_at"] = now + EMBEDDING_MODEL_TTL
+    return slot
+
+
+def reset_embedding_cache() -> None:
+    """
+    Forget the cached active embedding model (tests, or right after a switchover)
+    """
+    _active_cache["slot"] = None
+    _active_cache["expires_at"] = 0.0
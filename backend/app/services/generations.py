@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, Optional, Tuple
+from dotenv import load_dotenv
+from app.utils.sse import HEARTBEAT, SSE_HEARTBEAT_INTERVAL, format_event
+from app.utils.uuid_helper import uuid7
+
+# Load environment variables
+load_dotenv()
+
+# Events of a generation kept for replay to reconnecting clients
+GENERATION_BUFFER_EVENTS = int(os.getenv("GENERATION_BUFFER_EVENTS", 1000))
+# Seconds a generation keeps running after its last client disconnected, waiting for a reconnect
+GENERATION_RESUME_GRACE = float(os.getenv("GENERATION_RESUME_GRACE", 15))
+# Seconds a finished generation can still be replayed
+GENERATION_RETENTION = float(os.getenv("GENERATION_RETENTION", 60))
+
+
+class Generation:
+    """
+    A streamed generation running as its own task, independent of the connections
+    following it. Its events are numbered and the last GENERATION_BUFFER_EVENTS are kept,
+    so a client that lost its connection can reconnect with the id of the last event it
+    got and carry on. When nobody follows it for GENERATION_RESUME_GRACE seconds the
+    task is cancelled. Once finished and caught up on by its followers, only `meta` and
+    the final event (`done` with the whole answer, or `error`) are kept, which is all a
+    late follower needs.
+    """
+
+    def __init__(self, session_id: Hashable, buffer_events: int = GENERATION_BUFFER_EVENTS):
+        self.id = str(uuid7())
+        self.session_id = session_id
+        self.events: Deque[Tuple[int, str, Any]] = deque(maxlen=buffer_events)
+        self.last_seq = 0
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.followers = 0
+        self._changed = asyncio.Event()
+        self._abandon_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.id}:{seq}"
+
+    def _wake(self) -> None:
+        # Followers wait on the current event object, a new one is used from here on
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, event: str, data: Any) -> None:
+        self.last_seq += 1
+        self.events.append((self.last_seq, event, data))
+        self._wake()
+
+    def _compact(self) -> None:
+        if self.events:
+            last = self.events[-1]
+            kept = [event for event in self.events if event[1] == "meta" and event is not last]
+            self.events = deque(kept + [last], maxlen=self.events.maxlen)
+
+    def finish(self) -> None:
+        self.finished_at = time.monotonic()
+        if not self.followers:
+            self._compact()
+        if self._abandon_handle is not None:
+            self._abandon_handle.cancel()
+        self._wake()
+
+    def start(self, producer) -> "Generation":
+        """Run the `producer` coroutine, which publishes this generation's events"""
+        self.task = asyncio.ensure_future(producer)
+        return self
+
+    def _abandon(self) -> None:
+        self._abandon_handle = None
+        if not self.followers and not self.finished and self.task is not None:
+            self.task.cancel()
+
+    async def follow(self, after_seq: int = 0, heartbeat_interval: float = SSE_HEARTBEAT_INTERVAL) -> AsyncIterator[str]:
+        """
+        Server-sent events of this generation after event `after_seq` (replayed from the
+        buffer, then live), heartbeat comments while idle, until the generation ends
+        """
+        self.followers += 1
+        if self._abandon_handle is not None:
+            self._abandon_handle.cancel()
+            self._abandon_handle = None
+        try:
+            seq = after_seq
+            if self.events and self.events[0][0] > seq + 1:
+                if not self.finished:
+                    yield format_event("error", {"detail": "The events to resume from are gone, ask again"})
+                    return
+                # Only the last event is left to send, done (with the whole answer) or error
+                seq = self.events[-1][0] - 1
+
+            while True:
+                changed = self._changed
+                for event_seq, event, data in list(self.events):
+                    if event_seq > seq:
+                        seq = event_seq
+                        yield format_event(event, data, self.event_id(event_seq))
+                if self.finished:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+        finally:
+            self.followers -= 1
+            if not self.followers and self.finished:
+                self._compact()
+            elif not self.followers:
+                self._abandon_handle = asyncio.get_running_loop().call_later(GENERATION_RESUME_GRACE, self._abandon)
+
+
+class GenerationRegistry:
+    """Running and recently finished generations of this worker, by id"""
+
+    def __init__(self, retention: float = GENERATION_RETENTION):
+        self.retention = retention
+        self._generations: Dict[str, Generation] = {}
+
+    def _prune(self) -> None:
+        expired_before = time.monotonic() - self.retention
+        for generation_id, generation in list(self._generations.items()):
+            if generation.finished and generation.finished_at < expired_before:
+                del self._generations[generation_id]
+
+    def add(self, generation: Generation) -> Generation:
+        self._prune()
+        self._generations[generation.id] = generation
+        return generation
+
+    def get(self, generation_id: str) -> Optional[Generation]:
+        self._prune()
+        return self._generations.get(generation_id)
+
+    def values(self):
+        return list(self._generations.values())
+
+
+def parse_event_id(event_id: str) -> Optional[Tuple[str, int]]:
+    """(generation id, event number) of a Last-Event-ID value, None when malformed"""
+    generation_id, _, seq = event_id.strip().rpartition(":")
+    if not generation_id or not seq.isdigit():
+        return None
+    return generation_id, int(seq)
+
+
+# Shared by the generation endpoints
+generations = GenerationRegistry()
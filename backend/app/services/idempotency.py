@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+from dotenv import load_dotenv
+from app.utils.metrics import IDEMPOTENT_REPLAYS
+
+# Load environment variables
+load_dotenv()
+
+# Seconds the result of a request is kept for retries with the same Idempotency-Key,
+# counted from when its response is ready (for streams, from when the stream starts)
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", 600))
+# Completed requests remembered at most (per worker), the oldest are forgotten first
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10000))
+# Longest Idempotency-Key accepted
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+T = TypeVar("T")
+
+
+class IdempotencyError(Exception):
+    """Raised when an Idempotency-Key cannot be honoured; carries the HTTP status"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "future", "expires_at")
+
+    def __init__(self, fingerprint: str, future: asyncio.Future):
+        self.fingerprint = fingerprint
+        self.future = future
+        # Set once the request completed, None while it is in flight
+        self.expires_at: Optional[float] = None
+
+
+class IdempotencyStore:
+    """
+    Requests by Idempotency-Key, within an endpoint and a chat session. The first request
+    with a key runs; duplicates arriving while it is in flight wait for its result, and
+    retries arriving after it completed get the same result for `ttl` seconds. A request
+    that fails is forgotten (its duplicates fail alike), so a retry runs it again. Reusing
+    a key for a different question is an error.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._entries: Dict[Tuple[str, Hashable, str], _Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        excess = len(self._entries) - self.max_keys
+        # Entries are in insertion order, so the oldest completed ones go first
+        for key, entry in list(self._entries.items()):
+            if entry.expires_at is None:
+                continue
+            if entry.expires_at < now or excess > 0:
+                del self._entries[key]
+                excess -= 1
+
+    async def run(
+        self,
+        endpoint: str,
+        session_id: Hashable,
+        key: Optional[str],
+        fingerprint: str,
+        operation: Callable[[], Awaitable[T]]
+    ) -> Tuple[T, bool]:
+        """
+        Result of `operation` for this request, and whether it was replayed from an
+        earlier request with the same key. Without a key the operation just runs.
+        """
+        if not key:
+            return await operation(), False
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise IdempotencyError(400, f"Idempotency-Key is longer than {IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+
+        self._prune()
+        entry_key = (endpoint, session_id, key)
+        entry = self._entries.get(entry_key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyError(422, "Idempotency-Key was already used for a different question")
+            IDEMPOTENT_REPLAYS.labels(endpoint, "in_flight" if entry.expires_at is None else "completed").inc()
+            # Leaving early does not cancel the request being waited for
+            return await asyncio.shield(entry.future), True
+
+        entry = self._entries[entry_key] = _Entry(fingerprint, asyncio.get_running_loop().create_future())
+        try:
+            result = await operation()
+        except BaseException as e:
+            if self._entries.get(entry_key) is entry:
+                del self._entries[entry_key]
+            error = e if isinstance(e, Exception) else IdempotencyError(
+                409, "The request with this Idempotency-Key was cancelled, send it again"
+            )
+            entry.future.set_exception(error)
+            # Mark it retrieved, there may be no duplicates waiting for it
+            entry.future.exception()
+            raise
+        entry.future.set_result(result)
+        entry.expires_at = time.monotonic() + self.ttl
+        return result, False
+
+    def forget(self, endpoint: str, session_id: Hashable, key: Optional[str]) -> None:
+        """Drop a completed request, so a retry with its key runs again"""
+        if key:
+            self._entries.pop((endpoint, session_id, key), None)
+
+
+# Shared by the generation endpoints
+idempotent_requests = IdempotencyStore()
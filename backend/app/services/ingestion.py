@@ -0,0 +1,164 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+from dotenv import load_dotenv
+from sqlalchemy import select, update, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.db import DatasetCatalog, SourceWatermark, IngestionRun
+
+# Load environment variables
+load_dotenv()
+
+# Seconds without a heartbeat after which a run still marked running is taken as dead
+INGEST_RUN_STALE_AFTER = float(os.getenv("INGEST_RUN_STALE_AFTER", 600))
+
+# Catalog columns refreshed when an already known dataset (same slug) is synced again
+UPSERT_COLUMNS = (
+    "title",
+    "description",
+    "url",
+    "info_url",
+    "original_source",
+    "direct_source",
+    "source_at",
+    "is_cors_allowed",
+    "prompt_card",
+    "embedding",
+    "content_hash",
+    "embedding_alt",
+    "content_hash_alt",
+)
+
+
+async def get_watermark(db: AsyncSession, source: str) -> Optional[datetime]:
+    """
+    Newest source modification time synced so far for `source`, None before the first sync
+    """
+    result = await db.execute(select(SourceWatermark.watermark).where(SourceWatermark.source == source))
+    return result.scalar_one_or_none()
+
+
+async def set_watermark(db: AsyncSession, source: str, watermark: datetime) -> None:
+    """
+    Advance the watermark of `source` (never moves it backwards)
+    """
+    stmt = insert(SourceWatermark).values(source=source, watermark=watermark)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SourceWatermark.source],
+        set_={
+            "watermark": func.greatest(SourceWatermark.watermark, stmt.excluded.watermark),
+            "updated_at": func.now(),
+        }
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def get_content_hashes(
+    db: AsyncSession,
+    slugs: Iterable[str],
+    hash_column: str = "content_hash"
+) -> Dict[str, Optional[str]]:
+    """
+    Stored content hashes (of the given embedding slot) of the catalog rows with the given slugs
+    """
+    result = await db.execute(
+        select(DatasetCatalog.slug, getattr(DatasetCatalog, hash_column)).where(DatasetCatalog.slug.in_(list(slugs)))
+    )
+    return dict(result.all())
+
+
+async def upsert_datasets(db: AsyncSession, rows: List[Dict[str, Any]]) -> Dict[str, Set[str]]:
+    """
+    Bulk INSERT ... ON CONFLICT (slug) DO UPDATE a batch of catalog rows and commit.
+    Only the columns present in the rows are updated, so rows whose embedding did not
+    change can leave out their embedding columns and keep the stored ones.
+    Returns the slugs that were newly inserted and those that updated an existing row.
+    """
+    if not rows:
+        return {"inserted": set(), "updated": set()}
+
+    stmt = insert(DatasetCatalog)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DatasetCatalog.slug],
+        set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS if column in rows[0]}
+    ).returning(
+        DatasetCatalog.slug,
+        # xmax is 0 only for freshly inserted tuples
+        literal_column("(xmax = 0)").label("inserted")
+    )
+
+    result = await db.execute(stmt, rows)
+    written = result.all()
+    await db.commit()
+
+    return {
+        "inserted": {slug for slug, inserted in written if inserted},
+        "updated": {slug for slug, inserted in written if not inserted},
+    }
+
+
+async def start_ingestion_run(
+    db: AsyncSession,
+    source: str,
+    watermark: Optional[datetime],
+    full: bool = False
+) -> IngestionRun:
+    """
+    Record the start of a new ingestion run of `source`
+    """
+    run = IngestionRun(source=source, watermark=watermark, full=full, counts={})
+    db.add(run)
+    await db.commit()
+    return run
+
+
+async def get_resumable_run(
+    db: AsyncSession,
+    source: str,
+    stale_after: float = INGEST_RUN_STALE_AFTER
+) -> Optional[IngestionRun]:
+    """
+    Latest run of `source` when it was interrupted: it failed, or it is still marked
+    running but sent no heartbeat for `stale_after` seconds because the process died.
+    None when there is nothing to resume, including while another process is running it.
+    """
+    result = await db.execute(
+        select(IngestionRun, (IngestionRun.updated_at < func.now() - timedelta(seconds=stale_after)).label("stale"))
+        .where(IngestionRun.source == source)
+        .order_by(IngestionRun.started_at.desc())
+        .limit(1)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    run, stale = row
+    if run.status == "failed" or (run.status == "running" and stale):
+        return run
+    return None
+
+
+async def touch_ingestion_runs(db: AsyncSession, run_ids: List[uuid.UUID]) -> None:
+    """
+    Heartbeat of runs in progress: mark them alive so they are not resumed elsewhere, and commit
+    """
+    await db.execute(
+        update(IngestionRun)
+        .where(IngestionRun.id.in_(run_ids), IngestionRun.status == "running")
+        .values(updated_at=func.now())
+    )
+    await db.commit()
+
+
+async def update_ingestion_run(db: AsyncSession, run_id: uuid.UUID, **values: Any) -> None:
+    """
+    Save progress (checkpoint, counters) or the outcome of an ingestion run and commit
+    """
+    await db.execute(
+        update(IngestionRun)
+        .where(IngestionRun.id == run_id)
+        .values(**values, updated_at=func.now())
+    )
+    await db.commit()
@@ -0,0 +1,605 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+import httpx
+from dotenv import load_dotenv
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.connectors import Connector
+from app.models.db import AsyncSessionLocal
+from app.services.catalog_cache import bump_catalog_version
+from app.services.catalog_facets import refresh_catalog_facets, collect_facet_values, get_stored_facet_rows
+from app.services.embedding_models import EmbeddingSlot, read_active_embedding
+from app.services.ingestion import (
+    get_watermark,
+    set_watermark,
+    get_content_hashes,
+    upsert_datasets,
+    start_ingestion_run,
+    get_resumable_run,
+    update_ingestion_run,
+    touch_ingestion_runs,
+)
+from app.utils.embedding import get_embeddings, embedding_content_hash, EMBEDDING_BATCH_SIZE
+from app.utils.prompt_card import build_prompt_card
+from app.utils.uuid_helper import uuid7
+
+# Load environment variables
+load_dotenv()
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 20))
+
+# Pipeline defaults, overridable from the command line
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", 4))  # embedding calls in flight
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 100))  # datasets per embedding call and insert
+INGEST_PREFETCH = int(os.getenv("INGEST_PREFETCH", 4))  # fetched pages buffered ahead of processing
+# Seconds between heartbeats of running ingestion runs, well below INGEST_RUN_STALE_AFTER
+INGEST_HEARTBEAT_INTERVAL = float(os.getenv("INGEST_HEARTBEAT_INTERVAL", 60))
+
+
+class IngestStats:
+    """
+    Counters of one source, reported at the end of an ingestion run
+    """
+    COUNTERS = (
+        "pages",
+        "fetched",
+        "skipped_no_url",
+        "embedded",
+        "embedding_failures",
+        "embeddings_skipped",
+        "inserted",
+        "updated",
+        "write_failures",
+    )
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None):
+        self.started_at = time.perf_counter()
+        for counter in self.COUNTERS:
+            setattr(self, counter, (counts or {}).get(counter, 0))
+        self.fetch_failed = False
+        self.error: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        """Whether every fetched dataset made it into the catalog (safe to advance the watermark)"""
+        return not self.fetch_failed and not self.embedding_failures and not self.write_failures
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def counts(self) -> Dict[str, int]:
+        return {counter: getattr(self, counter) for counter in self.COUNTERS}
+
+    def report(self, source: str):
+        elapsed = self.elapsed
+        rate = (self.inserted + self.updated) / elapsed if elapsed > 0 else 0.0
+        print(f"\n[{source}]")
+        print(f"Pages fetched:        {self.pages}")
+        print(f"Datasets fetched:     {self.fetched}")
+        print(f"Skipped (no CSV URL): {self.skipped_no_url}")
+        print(f"Embedded:             {self.embedded} ({self.embedding_failures} failed, {self.embeddings_skipped} unchanged and skipped)")
+        print(f"Written:              {self.inserted} inserted, {self.updated} updated, {self.write_failures} failed")
+        print(f"Elapsed:              {elapsed:.1f}s ({rate:.1f} datasets/s)")
+
+
+class PageCheckpoint:
+    """
+    Tracks which fetched pages of a source are fully written to the catalog.
+    `next_page` only moves past a page once that page and every page before it were
+    committed without failures, so resuming from it never skips a dataset.
+    """
+    def __init__(self, next_page: int = 0, max_mdate: Optional[datetime] = None):
+        self.next_page = next_page
+        self.max_mdate = max_mdate  # newest modification time among committed pages
+        self._expected: Dict[int, int] = {}
+        self._page_mdates: Dict[int, Optional[datetime]] = {}
+        self._written: Dict[int, int] = defaultdict(int)
+        self._failed: Set[int] = set()
+
+    def expect(self, page: int, count: int, page_max_mdate: Optional[datetime]) -> bool:
+        """Register how many datasets of `page` go to the catalog"""
+        self._expected[page] = count
+        self._page_mdates[page] = page_max_mdate
+        return self._advance()
+
+    def written(self, pages: List[int]) -> bool:
+        """Record committed datasets (one page number per dataset)"""
+        for page in pages:
+            self._written[page] += 1
+        return self._advance()
+
+    def failed(self, pages: List[int]):
+        """Record datasets that did not make it; their pages block the checkpoint"""
+        self._failed.update(pages)
+
+    def _advance(self) -> bool:
+        moved = False
+        page = self.next_page
+        while page in self._expected and page not in self._failed and self._written[page] >= self._expected[page]:
+            page_max_mdate = self._page_mdates.pop(page)
+            if page_max_mdate and (self.max_mdate is None or page_max_mdate > self.max_mdate):
+                self.max_mdate = page_max_mdate
+            del self._expected[page]
+            self._written.pop(page, None)
+            page += 1
+            moved = True
+        self.next_page = page
+        return moved
+
+
+class HostLimiter:
+    """
+    Caps the requests in flight and the request rate towards one host
+    """
+    def __init__(self, max_concurrency: int, requests_per_second: Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._semaphore:
+            if self._interval:
+                async with self._lock:
+                    now = time.monotonic()
+                    wait = self._next_slot - now
+                    self._next_slot = max(now, self._next_slot) + self._interval
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            yield
+
+
+def build_host_limiters(connectors: List[Connector]) -> Dict[str, HostLimiter]:
+    """
+    One limiter per host, with the strictest limits of the connectors sharing it
+    """
+    limits: Dict[str, Tuple[int, Optional[float]]] = {}
+    for connector in connectors:
+        concurrency, rate = limits.get(connector.host, (connector.max_concurrency, connector.requests_per_second))
+        concurrency = min(concurrency, connector.max_concurrency)
+        if connector.requests_per_second:
+            rate = min(rate or connector.requests_per_second, connector.requests_per_second)
+        limits[connector.host] = (concurrency, rate)
+    return {host: HostLimiter(*limit) for host, limit in limits.items()}
+
+
+@dataclass
+class SourceRun:
+    """
+    Pipeline state of one connector: its ingestion run, checkpoint and counters
+    """
+    connector: Connector
+    run_id: uuid.UUID
+    watermark: Optional[datetime]
+    stats: IngestStats
+    checkpoint: PageCheckpoint
+    previous_duration: float = 0.0
+    written_datasets: List[Dict[str, Any]] = field(default_factory=list)
+    # Facet columns of the stored rows the written datasets replaced
+    replaced_datasets: List[Dict[str, Any]] = field(default_factory=list)
+
+    def progress(self) -> Dict[str, Any]:
+        """Ingestion run columns describing the current progress"""
+        return {
+            "next_page": self.checkpoint.next_page,
+            "max_mdate": self.checkpoint.max_mdate,
+            "counts": self.stats.counts(),
+            "duration_seconds": self.previous_duration + self.stats.elapsed,
+        }
+
+
+async def fetch_pages(
+    client: httpx.AsyncClient,
+    source_run: SourceRun,
+    limiter: HostLimiter,
+    pages: asyncio.Queue
+):
+    """
+    Stage 1 (one per connector): fetch pages in order from the checkpoint on, with up to the
+    host's concurrency in flight. `pages` is bounded, so fetching pauses once `prefetch` pages
+    wait for processing. When the portal lists newest first, the walk stops at the first
+    dataset older than the watermark; otherwise older datasets are just filtered out.
+    """
+    connector = source_run.connector
+    stats = source_run.stats
+    watermark = source_run.watermark
+
+    async def fetch(page: int):
+        async with limiter.slot():
+            return await connector.list_page(client, page)
+
+    in_flight = deque()
+    next_page = source_run.checkpoint.next_page
+    last_page_reached = False
+
+    try:
+        while in_flight or not last_page_reached:
+            while not last_page_reached and len(in_flight) < limiter.max_concurrency:
+                in_flight.append((next_page, asyncio.create_task(fetch(next_page))))
+                next_page += 1
+
+            page, task = in_flight.popleft()
+            try:
+                records = await task
+            except Exception as e:
+                stats.error = f"Error fetching {connector.source} page {page + 1}: {str(e)}"
+                print(stats.error)
+                stats.fetch_failed = True
+                break
+
+            page_size = len(records)
+            stats.pages += 1
+
+            # Keep only datasets changed since the last sync. Datasets modified exactly at the
+            # watermark are synced again, the upsert makes that harmless.
+            reached_watermark = False
+            if watermark:
+                changed = [record for record in records if (connector.record_mdate(record) or watermark) >= watermark]
+                reached_watermark = connector.newest_first and len(changed) < page_size
+                records = changed
+
+            page_max_mdate = max(filter(None, (connector.record_mdate(record) for record in records)), default=None)
+
+            stats.fetched += len(records)
+            print(f"Fetched {connector.source} page {page + 1} ({len(records)} changed datasets)")
+
+            # Empty pages are forwarded too, so the checkpoint can move past them
+            await pages.put((connector.source, page, records, page_max_mdate))
+
+            # A short page is the last one; anything requested after it is empty or already synced
+            if page_size < connector.page_size or reached_watermark:
+                last_page_reached = True
+                for _, pending in in_flight:
+                    pending.cancel()
+                in_flight.clear()
+    finally:
+        for _, pending in in_flight:
+            pending.cancel()
+        await pages.put(None)
+
+
+async def batch_datasets(
+    pages: asyncio.Queue,
+    batches: asyncio.Queue,
+    source_runs: Dict[str, SourceRun],
+    batch_size: int,
+    embed_workers: int
+):
+    """
+    Stage 2: normalize fetched records of every source and group them into embedding batches.
+    Each dataset remembers the page it came from for its source's checkpoint.
+    """
+    batch = []
+    finished_fetchers = 0
+    while finished_fetchers < len(source_runs):
+        item = await pages.get()
+        if item is None:
+            finished_fetchers += 1
+            continue
+
+        source, page, records, page_max_mdate = item
+        source_run = source_runs[source]
+        forwarded = 0
+        for record in records:
+            try:
+                processed_data = source_run.connector.normalize(record)
+            except Exception as e:
+                print(f"Error processing {source} dataset: {str(e)}")
+                continue
+
+            # Skip if no CSV URL available
+            if not processed_data['url']:
+                source_run.stats.skipped_no_url += 1
+                continue
+
+            batch.append({**processed_data, "page": page})
+            forwarded += 1
+            if len(batch) >= batch_size:
+                await batches.put(batch)
+                batch = []
+
+        source_run.checkpoint.expect(page, forwarded, page_max_mdate)
+
+    if batch:
+        await batches.put(batch)
+    for _ in range(embed_workers):
+        await batches.put(None)
+
+
+def catalog_row(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Catalog columns written for a normalized dataset (without its embedding)
+    """
+    return {
+        "id": uuid7(),
+        "title": data['title'],
+        "description": data['description'],
+        "url": data['url'],
+        "info_url": data['info_url'],
+        "original_source": data['original_source'],
+        "direct_source": data['direct_source'],
+        "slug": data['slug'],
+        "is_cors_allowed": False,
+        "source_at": data['source_at'],
+        "prompt_card": build_prompt_card(data['description']),
+    }
+
+
+async def embed_batches(
+    session_factory,
+    batches: asyncio.Queue,
+    writes: asyncio.Queue,
+    source_runs: Dict[str, SourceRun],
+    slot: EmbeddingSlot
+):
+    """
+    Stage 3: embed a whole batch with one batched embedding call of the active model.
+    Datasets whose embedded text (and embedding model) did not change since the last
+    sync keep their stored embedding and are written without calling the embedding API.
+    Re-embedded rows clear the hash of the other slot, so a running re-embedding
+    backfill picks them up again.
+    Writes are queued as (rows, (source, page) of each row).
+    """
+    async with session_factory() as session:
+        while (batch := await batches.get()) is not None:
+            texts = [f"{data['title']} {data['description']}" for data in batch]
+            hashes = [embedding_content_hash(text, slot.model) for text in texts]
+            stored_hashes = await get_content_hashes(session, [data['slug'] for data in batch], slot.hash_column)
+            # Read-only lookup, don't keep a transaction open while waiting on the embedding API
+            await session.rollback()
+
+            unchanged = []
+            changed = []
+            for data, text, content_hash in zip(batch, texts, hashes):
+                if stored_hashes.get(data['slug']) == content_hash:
+                    unchanged.append((data, content_hash))
+                    source_runs[data['direct_source']].stats.embeddings_skipped += 1
+                else:
+                    changed.append((data, text, content_hash))
+
+            if unchanged:
+                await writes.put((
+                    [{**catalog_row(data), slot.hash_column: content_hash} for data, content_hash in unchanged],
+                    [(data['direct_source'], data['page']) for data, _ in unchanged],
+                ))
+            if not changed:
+                continue
+
+            embeddings = await get_embeddings([text for _, text, _ in changed], model=slot.model)
+
+            rows = []
+            row_pages = []
+            for (data, _, content_hash), embedding in zip(changed, embeddings):
+                source_run = source_runs[data['direct_source']]
+                if not embedding:
+                    source_run.stats.embedding_failures += 1
+                    source_run.checkpoint.failed([data['page']])
+                    print(f"Failed to generate embedding for: {data['title']}")
+                    continue
+                source_run.stats.embedded += 1
+                rows.append({
+                    **catalog_row(data),
+                    slot.column: embedding,
+                    slot.hash_column: content_hash,
+                    slot.other_hash_column: None,
+                })
+                row_pages.append((data['direct_source'], data['page']))
+
+            if rows:
+                await writes.put((rows, row_pages))
+
+    await writes.put(None)
+
+
+def _pages_by_source(row_pages: List[Tuple[str, int]]) -> Dict[str, List[int]]:
+    pages = defaultdict(list)
+    for source, page in row_pages:
+        pages[source].append(page)
+    return pages
+
+
+async def write_batches(
+    session: AsyncSession,
+    writes: asyncio.Queue,
+    source_runs: Dict[str, SourceRun],
+    embed_workers: int
+):
+    """
+    Stage 4: bulk upsert each batch (executemany) and commit once per batch.
+    Whenever the committed pages move a source's checkpoint, it is saved on its ingestion run.
+    """
+    finished_workers = 0
+    while finished_workers < embed_workers:
+        item = await writes.get()
+        if item is None:
+            finished_workers += 1
+            continue
+
+        rows, row_pages = item
+        pages = _pages_by_source(row_pages)
+        try:
+            # The facet values updated rows are about to leave need recounting too
+            replaced = await get_stored_facet_rows(session, [row["slug"] for row in rows])
+            written = await upsert_datasets(session, rows)
+        except Exception as e:
+            await session.rollback()
+            error = f"Error writing batch of {len(rows)} datasets: {str(e)}"
+            print(error)
+            for source, source_pages in pages.items():
+                source_runs[source].stats.write_failures += len(source_pages)
+                source_runs[source].stats.error = error
+                source_runs[source].checkpoint.failed(source_pages)
+            continue
+
+        for row in rows:
+            source_run = source_runs[row["direct_source"]]
+            if row["slug"] in written["inserted"]:
+                source_run.stats.inserted += 1
+            elif row["slug"] in written["updated"]:
+                source_run.stats.updated += 1
+            source_run.written_datasets.append(row)
+        sources = {row["slug"]: row["direct_source"] for row in rows}
+        for row in replaced:
+            source_runs[sources[row["slug"]]].replaced_datasets.append(row)
+        print(f"Wrote {len(rows)} datasets")
+
+        for source, source_pages in pages.items():
+            source_run = source_runs[source]
+            if source_run.checkpoint.written(source_pages):
+                await update_ingestion_run(session, source_run.run_id, **source_run.progress())
+
+
+async def send_heartbeats(session_factory, run_ids: List[uuid.UUID], interval: float) -> None:
+    """
+    Keep marking the runs alive until cancelled, so --resume elsewhere leaves them alone
+    """
+    while True:
+        await asyncio.sleep(interval)
+        async with session_factory() as session:
+            await touch_ingestion_runs(session, run_ids)
+
+
+async def start_source_run(session: AsyncSession, connector: Connector, full: bool, resume: bool) -> SourceRun:
+    """
+    Resume the interrupted run of a connector (with `resume`) or start a new one
+    """
+    run = await get_resumable_run(session, connector.source) if resume else None
+    if run:
+        await update_ingestion_run(session, run.id, status="running", attempts=run.attempts + 1, error=None)
+        print(f"Resuming {connector.source} run {run.id} from page {run.next_page + 1}")
+        return SourceRun(
+            connector=connector,
+            run_id=run.id,
+            watermark=run.watermark,
+            stats=IngestStats(run.counts),
+            checkpoint=PageCheckpoint(run.next_page, run.max_mdate),
+            previous_duration=run.duration_seconds,
+        )
+
+    if resume:
+        print(f"No failed or interrupted {connector.source} run to resume, starting a new one")
+    watermark = None if full else await get_watermark(session, connector.source)
+    run = await start_ingestion_run(session, connector.source, watermark, full)
+    print(f"Syncing {connector.source} datasets modified since: {watermark or 'the beginning'}")
+    return SourceRun(
+        connector=connector,
+        run_id=run.id,
+        watermark=watermark,
+        stats=IngestStats(),
+        checkpoint=PageCheckpoint(),
+    )
+
+
+async def run_ingestion(
+    connectors: List[Connector],
+    session_factory=AsyncSessionLocal,
+    embed_workers: int = INGEST_CONCURRENCY,
+    batch_size: int = INGEST_BATCH_SIZE,
+    prefetch: int = INGEST_PREFETCH,
+    full: bool = False,
+    resume: bool = False,
+    http_timeout: float = HTTP_TIMEOUT
+) -> Dict[str, IngestStats]:
+    """
+    Sync the dataset catalog from several portals at once.
+
+    Every connector gets its own page fetcher (limited per host), all of them feed the same
+    batching -> batched embedding -> bulk upsert stages. Each source has its own ingestion
+    run, checkpoint and watermark; with `resume`, interrupted runs continue from their last
+    committed page. Only datasets modified since a source's watermark are synced, unless
+    `full` is set.
+    """
+    batch_size = max(1, min(batch_size, EMBEDDING_BATCH_SIZE))
+
+    active = []
+    for connector in connectors:
+        if connector.is_configured():
+            active.append(connector)
+        else:
+            print(f"Skipping {connector.name}: connector is not configured")
+
+    async with session_factory() as session:
+        slot = await read_active_embedding(session)
+        source_runs = {
+            connector.source: await start_source_run(session, connector, full, resume)
+            for connector in active
+        }
+    if not source_runs:
+        return {}
+
+    limiters = build_host_limiters(active)
+    pages = asyncio.Queue(maxsize=prefetch)
+    batches = asyncio.Queue(maxsize=embed_workers)
+    writes = asyncio.Queue(maxsize=embed_workers)
+
+    async with session_factory() as session:
+        heartbeat = asyncio.create_task(send_heartbeats(
+            session_factory, [source_run.run_id for source_run in source_runs.values()], INGEST_HEARTBEAT_INTERVAL
+        ))
+        try:
+            try:
+                async with httpx.AsyncClient(timeout=http_timeout) as client:
+                    async with asyncio.TaskGroup() as pipeline:
+                        for source_run in source_runs.values():
+                            limiter = limiters[source_run.connector.host]
+                            pipeline.create_task(fetch_pages(client, source_run, limiter, pages))
+                        pipeline.create_task(batch_datasets(pages, batches, source_runs, batch_size, embed_workers))
+                        for _ in range(embed_workers):
+                            pipeline.create_task(embed_batches(session_factory, batches, writes, source_runs, slot))
+                        pipeline.create_task(write_batches(session, writes, source_runs, embed_workers))
+            finally:
+                heartbeat.cancel()
+        except BaseException as e:
+            # Crash, Ctrl+C or deploy restart: keep the last checkpoints so --resume can pick up from them
+            await session.rollback()
+            for source_run in source_runs.values():
+                await update_ingestion_run(
+                    session, source_run.run_id,
+                    status="failed", error=repr(e), finished_at=func.now(), **source_run.progress()
+                )
+            raise
+
+        # Recount only the facet values touched by this run: those of the written datasets
+        # and those the updated rows had before
+        touched_datasets = [
+            row
+            for source_run in source_runs.values()
+            for row in source_run.written_datasets + source_run.replaced_datasets
+        ]
+        await refresh_catalog_facets(session, collect_facet_values(touched_datasets))
+        # Invalidate cached catalog responses in the API
+        await bump_catalog_version(session)
+
+        for source, source_run in source_runs.items():
+            stats = source_run.stats
+            checkpoint = source_run.checkpoint
+
+            # Only move the watermark once everything up to it is in the catalog,
+            # otherwise the next run retries the same window
+            if stats.complete and checkpoint.max_mdate:
+                await set_watermark(session, source, checkpoint.max_mdate)
+                print(f"{source} watermark advanced to {checkpoint.max_mdate}")
+            elif not stats.complete:
+                print(f"{source} run incomplete, watermark left unchanged (resume from page {checkpoint.next_page + 1})")
+
+            await update_ingestion_run(
+                session, source_run.run_id,
+                status="completed" if stats.complete else "failed",
+                error=stats.error,
+                finished_at=func.now(),
+                **source_run.progress()
+            )
+
+    for source, source_run in source_runs.items():
+        source_run.stats.report(source)
+    return {source: source_run.stats for source, source_run in source_runs.items()}
@@ -1,9 +1,17 @@
 import os
-from typing import Dict, List, Any, AsyncGenerator
+import time
+from contextlib import aclosing
+from typing import Dict, List, Any, AsyncGenerator, Optional
 from dotenv import load_dotenv
 from langchain_community.chat_models.litellm import ChatLiteLLM # Import ChatLiteLLM
-from langchain_core.messages import HumanMessage # Import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage # Import HumanMessage
 from app.models.schema import DatasetReference, QueryReference, MessageModel # Import necessary types
+from app.utils.prompt_card import build_prompt_card
+from app.utils.metrics import (
+    LLM_TTFT_SECONDS, LLM_TOKENS_PER_SECOND, LLM_CASCADE_DRAFTS, SQL_VALIDATIONS, estimate_tokens, timed_stage
+)
+from app.services.llm_router import LLMRouter
+from app.services.sql_validation import SQL_VALIDATION, check_generated_sql, validate_generated_sql
 
 # Load environment variables
 load_dotenv()
@@ -14,8 +22,22 @@ API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 # Get the model name from environment variable, default to gemini/gemini-2.0-flash-lite
 LITELLM_MODEL = os.getenv("LITELLM_MODEL", "gemini/gemini-2.0-flash-lite")
 
-# Initialize the LiteLLM chat model
-llm = ChatLiteLLM(model=LITELLM_MODEL, litellm_api_base="https://openrouter.ai/api/v1")
+# Models to try in order (comma separated), the first healthy one that answers in time is used
+LLM_MODELS = [model.strip() for model in os.getenv("LLM_MODELS", LITELLM_MODEL).split(",") if model.strip()]
+
+# Cascade mode: fast models that answer first (comma separated, empty = off). Their answer
+# is checked locally and the models above are only asked when the check fails.
+LLM_CASCADE_MODELS = [model.strip() for model in os.getenv("LLM_CASCADE_MODELS", "").split(",") if model.strip()]
+
+def _build_router(models: List[str]) -> LLMRouter:
+    # Initialize the LiteLLM chat models behind a router
+    return LLMRouter([
+        (model, ChatLiteLLM(model=model, litellm_api_base="https://openrouter.ai/api/v1"))
+        for model in models
+    ])
+
+router = _build_router(LLM_MODELS)
+cascade_router = _build_router(LLM_CASCADE_MODELS) if LLM_CASCADE_MODELS else None
 
 def _create_prompt(
     question: str,
@@ -28,13 +50,14 @@ def _create_prompt(
     """
     # Format chat history
     formatted_history = "\n".join([
-        f"{msg.role.capitalize()}: {msg.content}"
+        f"{msg.role.capitalize()}: {msg.content}" + (" [cut off, the user left before it finished]" if msg.truncated else "")
         for msg in chat_history
     ])
 
-    # Format dataset information with table creation
+    # Format dataset information with table creation, using the precomputed prompt card
+    # (falls back to building one on the fly for rows ingested before cards existed)
     dataset_context = "\n".join([
-        f"- {dataset.title}: {dataset.description}\n  Data URL: {API_BASE_URL}/dataset/{dataset.slug}"
+        f"- {dataset.title}: {dataset.prompt_card or build_prompt_card(dataset.description)}\n  Data URL: {API_BASE_URL}/dataset/{dataset.slug}"
         for dataset in datasets
     ])
 
@@ -81,33 +104,130 @@ Question: {question}
 Please generate a SQL query to answer this question, following the format specified above.
 """
 
-async def generate_sql_from_nl(
+async def _stream_answer(model_router: LLMRouter, messages: List[Any]) -> AsyncGenerator[str, None]:
+    """
+    Stream the answer of `model_router`, recording time to first token and output tokens
+    per second of the model that answered
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    output_tokens = None
+    streamed_text = ""
+    model = None
+    # aclosing: when this generator is closed early (client gone) the provider stream is closed too
+    async with aclosing(model_router.stream(messages)) as chunks:
+        async for model, chunk in chunks:
+            if getattr(chunk, "usage_metadata", None):
+                output_tokens = chunk.usage_metadata.get("output_tokens") or output_tokens
+            if chunk.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    LLM_TTFT_SECONDS.labels(model).observe(first_token_at - start)
+                streamed_text += chunk.content
+                yield chunk.content
+
+    if first_token_at is not None:
+        elapsed = time.perf_counter() - first_token_at
+        if elapsed > 0:
+            tokens = output_tokens or estimate_tokens(streamed_text)
+            LLM_TOKENS_PER_SECOND.labels(model).observe(tokens / elapsed)
+
+async def _complete(model_router: LLMRouter, messages: List[Any]) -> str:
+    # Streamed even when the whole answer is needed, so the router's first token deadline and hedging apply
+    text = ""
+    async with aclosing(_stream_answer(model_router, messages)) as chunks:
+        async for chunk in chunks:
+            text += chunk
+    return text
+
+async def _draft_answer(
+    messages: List[Any],
+    chat_history: List[MessageModel],
+    datasets: List[DatasetReference]
+) -> Optional[str]:
+    """
+    Cascade mode: the answer of the cheap models if it passes the local SQL checks,
+    None when the stronger models have to answer instead
+    """
+    with timed_stage("llm_draft"):
+        try:
+            draft = await _complete(cascade_router, messages)
+        except Exception:
+            LLM_CASCADE_DRAFTS.labels("error").inc()
+            return None
+        problem = check_generated_sql(draft, datasets, chat_history)
+    LLM_CASCADE_DRAFTS.labels(problem.reason if problem else "accepted").inc()
+    return None if problem else draft
+
+async def _validated_answer(
+    answer: str,
+    messages: List[Any],
+    chat_history: List[MessageModel],
+    datasets: List[DatasetReference]
+) -> str:
+    """
+    Validate an answer as configured by SQL_VALIDATION. An invalid answer gets one repair
+    round: the error goes back to the LLM and its corrected answer is used.
+    """
+    with timed_stage("validation"):
+        problem = await validate_generated_sql(answer, datasets, chat_history, SQL_VALIDATION)
+    if problem is None:
+        SQL_VALIDATIONS.labels("none", "valid").inc()
+        return answer
+
+    repair_messages = messages + [
+        AIMessage(content=answer),
+        HumanMessage(content=f"""Your answer failed validation in DuckDB:
+{problem.message}
+
+Fix the SQL and answer again in exactly the same format (explanation, the line of 14 equals signs, then the SQL)."""),
+    ]
+    with timed_stage("llm_repair"):
+        repaired = await _complete(router, repair_messages)
+    with timed_stage("validation"):
+        still_invalid = await validate_generated_sql(repaired, datasets, chat_history, SQL_VALIDATION)
+    SQL_VALIDATIONS.labels(problem.reason, "unrepaired" if still_invalid else "repaired").inc()
+    return repaired
+
+async def generate_answer(
     question: str,
     chat_history: List[MessageModel],
     datasets: List[DatasetReference],
     reference_queries: List[QueryReference]
-) -> Dict[str, str]:
+) -> str:
     """
-    Generate SQL from natural language using LiteLLM with context via Langchain
+    Whole answer (explanation, separator line, SQL) to a question: a cascade draft when
+    it passes the checks, else the main models' answer, validated when SQL_VALIDATION is
+    on. Errors are raised.
     """
-    try:
-        prompt = _create_prompt(question, chat_history, datasets, reference_queries)
-        messages = [HumanMessage(content=prompt)] # Langchain expects a list of messages
-
-        response = await llm.ainvoke(messages) # Use ainvoke for async call
+    prompt = _create_prompt(question, chat_history, datasets, reference_queries)
+    messages = [HumanMessage(content=prompt)] # Langchain expects a list of messages
 
-        # Langchain response structure
-        generated_text = response.content
+    generated_text = None
+    if cascade_router is not None:
+        generated_text = await _draft_answer(messages, chat_history, datasets)
+    if generated_text is None:
+        generated_text = await _complete(router, messages)
+    if SQL_VALIDATION != "off":
+        generated_text = await _validated_answer(generated_text, messages, chat_history, datasets)
+    return generated_text
 
-        return {
-            "sql": generated_text,
-            "explanation": ""  # No need to parse as frontend will handle it
-        }
-    except Exception as e:
-        return {
-            "sql": f"Error generating SQL: {str(e)}",
-            "explanation": f"An error occurred: {str(e)}"
-        }
+async def generate_sql_from_nl(
+    question: str,
+    chat_history: List[MessageModel],
+    datasets: List[DatasetReference],
+    reference_queries: List[QueryReference]
+) -> Dict[str, str]:
+    """
+    Generate SQL from natural language using LiteLLM with context via Langchain.
+    Errors are raised, so the request fails instead of answering with the error
+    (and a retry with the same Idempotency-Key generates again).
+    """
+    generated_text = await generate_answer(question, chat_history, datasets, reference_queries)
+    return {
+        "sql": generated_text,
+        "explanation": ""  # No need to parse as frontend will handle it
+    }
 
 async def generate_sql_stream(
     question: str,
@@ -116,15 +236,26 @@ async def generate_sql_stream(
     reference_queries: List[QueryReference]
 ) -> AsyncGenerator[str, None]:
     """
-    Stream SQL generation results using LiteLLM via Langchain
+    Stream SQL generation results using LiteLLM via Langchain.
+    Answers that have to be complete before they can be used, a cascade draft or any
+    answer when SQL_VALIDATION is on, are sent in one piece once checked; otherwise the
+    answer is streamed as it is generated. Errors are raised, for the caller to report.
     """
-    try:
-        prompt = _create_prompt(question, chat_history, datasets, reference_queries)
-        messages = [HumanMessage(content=prompt)] # Langchain expects a list of messages
+    prompt = _create_prompt(question, chat_history, datasets, reference_queries)
+    messages = [HumanMessage(content=prompt)] # Langchain expects a list of messages
 
-        async for chunk in llm.astream(messages): # Use astream for async streaming
-            if chunk.content:
-                yield chunk.content
+    answer = None
+    if cascade_router is not None:
+        answer = await _draft_answer(messages, chat_history, datasets)
+
+    if answer is None and SQL_VALIDATION == "off":
+        async with aclosing(_stream_answer(router, messages)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+        return
 
-    except Exception as e:
-        yield f"Error generating SQL: {str(e)}"
+    if answer is None:
+        answer = await _complete(router, messages)
+    if SQL_VALIDATION != "off":
+        answer = await _validated_answer(answer, messages, chat_history, datasets)
+    yield answer
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from app.utils.metrics import LLM_ATTEMPTS, LLM_CIRCUIT_OPEN
+
+# Load environment variables
+load_dotenv()
+
+# Seconds a model gets to send its first token before the next model is tried
+LLM_TTFT_TIMEOUT = float(os.getenv("LLM_TTFT_TIMEOUT", 20))
+# Seconds without a first token after which the next model is raced against it (0 = no hedging)
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", 0))
+# Consecutive failures that open a model's circuit, and seconds it then stays skipped
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", 3))
+LLM_CIRCUIT_COOLDOWN = float(os.getenv("LLM_CIRCUIT_COOLDOWN", 30))
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no model produced a first token"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker of one model. After `failures` failures in a row
+    the model is skipped for `cooldown` seconds, then a single trial call is let through
+    (half-open): success closes the circuit, failure opens it again. The trial is claimed
+    when the call starts and released when it ends, whatever the outcome.
+    """
+
+    def __init__(self, failures: int = LLM_CIRCUIT_FAILURES, cooldown: float = LLM_CIRCUIT_COOLDOWN):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether a call may start now; claims nothing"""
+        if self.opened_at is None:
+            return True
+        return time.monotonic() - self.opened_at >= self.cooldown and not self._trial_running
+
+    def claim_trial(self) -> bool:
+        """Claim the trial call of an open circuit past its cooldown, False if there is none to claim"""
+        if self.opened_at is None or not self.allow():
+            return False
+        self._trial_running = True
+        return True
+
+    def release_trial(self) -> None:
+        self._trial_running = False
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            self.opened_at = time.monotonic()
+
+
+class _Attempt:
+    """One model's stream, racing for the first token"""
+
+    def __init__(self, model: str, client: Any, messages: List[Any], trial: bool = False):
+        self.model = model
+        # Whether this attempt holds the half-open trial of the model's circuit
+        self.trial = trial
+        self.stream = client.astream(messages)
+        self.started_at = time.monotonic()
+        self.first_chunk = asyncio.ensure_future(self._first_chunk())
+
+    async def _first_chunk(self):
+        # Skip empty chunks (role or usage only), the first token is the first content
+        async for chunk in self.stream:
+            if chunk.content:
+                return chunk
+        raise LLMUnavailableError(f"{self.model} returned an empty response")
+
+    async def close(self) -> None:
+        if not self.first_chunk.done():
+            self.first_chunk.cancel()
+            await asyncio.gather(self.first_chunk, return_exceptions=True)
+        await self.stream.aclose()
+
+
+class LLMRouter:
+    """
+    Streams a completion from an ordered list of (model name, chat model) pairs.
+
+    Models are tried in order, skipping those whose circuit is open. A model that fails or
+    sends no first token within `ttft_timeout` seconds counts as a failure and the next one
+    is tried. With `hedge_delay`, the next model is also started when the current one has
+    been silent for that long, and whichever sends a first token first is used (the other
+    is cancelled). Once tokens flow the stream stays on that model.
+    """
+
+    def __init__(
+        self,
+        models: Sequence[Tuple[str, Any]],
+        ttft_timeout: float = LLM_TTFT_TIMEOUT,
+        hedge_delay: float = LLM_HEDGE_DELAY,
+        circuit_failures: int = LLM_CIRCUIT_FAILURES,
+        circuit_cooldown: float = LLM_CIRCUIT_COOLDOWN,
+    ):
+        if not models:
+            raise ValueError("LLMRouter needs at least one model")
+        self.models = list(models)
+        self.ttft_timeout = ttft_timeout
+        self.hedge_delay = hedge_delay
+        self.breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(circuit_failures, circuit_cooldown) for name, _ in self.models
+        }
+
+    def _candidates(self) -> List[Tuple[str, Any]]:
+        available = [(name, client) for name, client in self.models if self.breakers[name].allow()]
+        # Every circuit open: trying them anyway beats failing without a call
+        return available or list(self.models)
+
+    def _finish(self, attempt: _Attempt, outcome: str) -> None:
+        """Record how an attempt's race for the first token ended, handing back its trial claim"""
+        if attempt.trial:
+            self.breakers[attempt.model].release_trial()
+            attempt.trial = False
+        self._record(attempt.model, outcome)
+
+    def _record(self, model: str, outcome: str) -> None:
+        LLM_ATTEMPTS.labels(model, outcome).inc()
+        breaker = self.breakers[model]
+        if outcome == "success":
+            breaker.success()
+        elif outcome in ("error", "timeout"):
+            breaker.failure()
+        LLM_CIRCUIT_OPEN.labels(model).set(1 if breaker.is_open else 0)
+
+    async def _first_token(self, messages: List[Any]) -> Tuple[_Attempt, Any]:
+        """Race the candidates as configured, returning the winning attempt and its first chunk"""
+        candidates = self._candidates()
+        # Every circuit open: the candidates are started without claiming trials
+        forced = not any(self.breakers[name].allow() for name, _ in candidates)
+        active: List[_Attempt] = []
+        errors = []
+
+        def start_next() -> bool:
+            while candidates:
+                model, client = candidates.pop(0)
+                breaker = self.breakers[model]
+                # Another request may have claimed the trial since the candidates were picked
+                trial = breaker.claim_trial()
+                if breaker.is_open and not trial and not forced:
+                    continue
+                active.append(_Attempt(model, client, messages, trial))
+                return True
+            return False
+
+        start_next()
+        try:
+            while active:
+                now = time.monotonic()
+                deadlines = [attempt.started_at + self.ttft_timeout for attempt in active]
+                wake_at = min(deadlines)
+                hedge_at = None
+                if self.hedge_delay and len(active) == 1 and candidates:
+                    hedge_at = active[0].started_at + self.hedge_delay
+                    wake_at = min(wake_at, hedge_at)
+
+                done, _ = await asyncio.wait(
+                    [attempt.first_chunk for attempt in active],
+                    timeout=max(0.0, wake_at - now),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for attempt in [attempt for attempt in active if attempt.first_chunk in done]:
+                    active.remove(attempt)
+                    try:
+                        chunk = attempt.first_chunk.result()
+                    except Exception as e:
+                        errors.append(f"{attempt.model}: {e}")
+                        self._finish(attempt, "error")
+                        await attempt.close()
+                        continue
+                    self._finish(attempt, "success")
+                    return attempt, chunk
+
+                now = time.monotonic()
+                for attempt in [attempt for attempt in active if now >= attempt.started_at + self.ttft_timeout]:
+                    active.remove(attempt)
+                    errors.append(f"{attempt.model}: no first token after {self.ttft_timeout}s")
+                    self._finish(attempt, "timeout")
+                    await attempt.close()
+
+                if not active:
+                    start_next()
+                elif hedge_at is not None and now >= hedge_at:
+                    start_next()
+        finally:
+            # Losers of the race (or everything, when cancelled)
+            for attempt in active:
+                self._finish(attempt, "hedge_lost")
+                await attempt.close()
+
+        raise LLMUnavailableError("; ".join(errors) or "no model available")
+
+    async def stream(self, messages: List[Any]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Yield (model, chunk) for the completion of `messages`, chunk being the chat model's
+        message chunk. Raises LLMUnavailableError when no model produced a first token.
+        """
+        attempt, chunk = await self._first_token(messages)
+        try:
+            yield attempt.model, chunk
+            async for chunk in attempt.stream:
+                yield attempt.model, chunk
+        except Exception:
+            # Failing mid-stream still counts against the model
+            self._record(attempt.model, "error")
+            raise
+        finally:
+            await attempt.stream.aclose()
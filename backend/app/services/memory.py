@@ -28,10 +28,13 @@ async def save_message(
     db: AsyncSession, 
     session_id: UUID, 
     role: str, 
-    content: str
+    content: str,
+    truncated: bool = False,
+    dataset_ids: Optional[List[UUID]] = None
 ) -> ChatMessage:
     """
-    Save a message to the chat history
+    Save a message to the chat history (`truncated` marks a partial assistant response,
+    `dataset_ids` are the catalog datasets an assistant response was generated with)
     """
     # First verify the session exists
     session = await get_session(db, session_id)
@@ -41,7 +44,9 @@ async def save_message(
     message = ChatMessage(
         session_id=session_id,
         role=role,
-        content=content
+        content=content,
+        truncated=truncated,
+        dataset_ids=dataset_ids
     )
     db.add(message)
     await db.commit()
@@ -72,6 +77,8 @@ async def get_session_history(
             id=msg.id,
             role=msg.role,
             content=msg.content,
+            truncated=msg.truncated,
+            dataset_ids=msg.dataset_ids,
             created_at=msg.created_at
         )
         for msg in messages
@@ -1,21 +1,30 @@
-from sqlalchemy import select, func
+from sqlalchemy import select, func, values, column, cast, true, case, or_, Integer
 from sqlalchemy.ext.asyncio import AsyncSession
+from pgvector.sqlalchemy import Vector
 from app.models.db import DatasetCatalog
 from app.utils.embedding import get_embedding
+from app.services.embedding_models import get_active_embedding, EmbeddingSlot
+from app.utils.metrics import timed_stage
 from app.models.schema import DatasetReference
-from typing import List
+from typing import List, Optional, Sequence
+from uuid import UUID
 import numpy as np
 
 async def get_relevant_datasets(
     db: AsyncSession, 
     question: str, 
-    limit: int = 3
+    limit: int = 3,
+    boost_ids: Sequence[UUID] = (),
+    boost: float = 0.0
 ) -> List[DatasetReference]:
     """
-    Get relevant datasets using vector similarity search
+    Get relevant datasets using vector similarity search. Datasets in `boost_ids` (those
+    already used in the conversation) rank as if `boost` closer to the question.
     """
-    # Get embedding for question
-    question_embedding = await get_embedding(question)
+    # Embed the question with the model retrieval currently uses
+    slot = await get_active_embedding(db)
+    with timed_stage("embedding"):
+        question_embedding = await get_embedding(question, model=slot.model)
     
     if not question_embedding:
         return []
@@ -26,11 +35,21 @@ async def get_relevant_datasets(
     # Query most similar datasets
     query = select(DatasetCatalog).order_by(
         # Using cosine similarity with pgvector
-        DatasetCatalog.embedding.cosine_distance(embedding_array)
+        getattr(DatasetCatalog, slot.column).cosine_distance(embedding_array)
     ).limit(limit)
+    if boost_ids:
+        # The boosted datasets compete with the nearest ones; the nearest are still found
+        # with the vector index, only these few rows are ranked again
+        distance = getattr(DatasetCatalog, slot.column).cosine_distance(embedding_array)
+        query = select(DatasetCatalog).where(
+            or_(DatasetCatalog.id.in_(query.with_only_columns(DatasetCatalog.id)), DatasetCatalog.id.in_(boost_ids))
+        ).order_by(
+            distance - case((DatasetCatalog.id.in_(boost_ids), boost), else_=0.0)
+        ).limit(limit)
     
-    result = await db.execute(query)
-    datasets = result.scalars().all()
+    with timed_stage("vector_search"):
+        result = await db.execute(query)
+        datasets = result.scalars().all()
     
     # Convert to response model
     return [
@@ -44,7 +63,57 @@ async def get_relevant_datasets(
             is_cors_allowed=dataset.is_cors_allowed,
             direct_source=dataset.direct_source,
             original_source=dataset.original_source,
-            source_at=dataset.source_at
+            source_at=dataset.source_at,
+            prompt_card=dataset.prompt_card
         )
         for dataset in datasets
     ]
+
+async def get_relevant_datasets_batch(
+    db: AsyncSession,
+    slot: EmbeddingSlot,
+    embeddings: List[Optional[List[float]]],
+    limit: int = 3
+) -> List[List[DatasetReference]]:
+    """
+    Relevant datasets for many questions at once, embedded with the model of `slot`:
+    one query finds the nearest datasets of every embedding. The result is aligned with
+    `embeddings`; a question without an embedding gets no datasets.
+    """
+    rows = [(position, embedding) for position, embedding in enumerate(embeddings) if embedding]
+    results: List[List[DatasetReference]] = [[] for _ in embeddings]
+    if not rows:
+        return results
+
+    questions = values(
+        column("position", Integer), column("embedding", Vector()), name="questions"
+    ).data([(position, cast(np.array(embedding), Vector())) for position, embedding in rows])
+    # The nearest datasets of each question, side by side; only the columns of the
+    # references are read, not the vectors
+    distance = getattr(DatasetCatalog, slot.column).cosine_distance(questions.c.embedding)
+    nearest = select(
+        *(getattr(DatasetCatalog, field) for field in DatasetReference.model_fields),
+        distance.label("distance")
+    ).order_by(distance).limit(limit).lateral("nearest")
+    query = select(questions.c.position, nearest).join(nearest, true()).order_by(
+        questions.c.position, nearest.c.distance
+    )
+
+    with timed_stage("vector_search"):
+        result = await db.execute(query)
+        for row in result.all():
+            results[row.position].append(DatasetReference.model_validate(row))
+    return results
+
+async def get_datasets_by_id(db: AsyncSession, ids: Sequence[UUID]) -> List[DatasetReference]:
+    """
+    Catalog datasets by id, in the order of `ids`; ids no longer in the catalog are skipped
+    """
+    if not ids:
+        return []
+    result = await db.execute(
+        select(*(getattr(DatasetCatalog, field) for field in DatasetReference.model_fields))
+        .where(DatasetCatalog.id.in_(ids))
+    )
+    datasets = {row.id: DatasetReference.model_validate(row) for row in result.all()}
+    return [datasets[dataset_id] for dataset_id in ids if dataset_id in datasets]
@@ -0,0 +1,103 @@
+import os
+import re
+from typing import List, Set, Tuple
+from uuid import UUID
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.schema import DatasetReference, MessageModel, QueryReference
+from app.services.rag_dataset import get_relevant_datasets, get_datasets_by_id
+from app.services.rag_sql import get_relevant_queries
+from app.utils.metrics import SESSION_RETRIEVALS, timed_stage
+
+# Load environment variables
+load_dotenv()
+
+# Longest question (in words) that can be a refinement of the previous answer
+FOLLOWUP_MAX_WORDS = int(os.getenv("FOLLOWUP_MAX_WORDS", 12))
+# Cosine distance taken off the datasets already used in the conversation when ranking
+SESSION_DATASET_BOOST = float(os.getenv("SESSION_DATASET_BOOST", 0.1))
+# Messages of the conversation whose words count as already talked about
+FOLLOWUP_CONTEXT_MESSAGES = 4
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+# Words that reshape a query rather than say what it is about (Indonesian and English):
+# sorting, grouping, filtering, aggregating and conversational filler
+_REFINEMENT_WORDS = frozenset("""
+    sekarang lalu kemudian terus juga hanya saja cuma tapi tetapi dan atau yang di ke dari untuk per
+    dengan tanpa dalam pada oleh berdasarkan menurut tampilkan tunjukkan lihat urutkan urut kelompokkan
+    kelompok filter saring batasi ambil teratas terbawah tertinggi terendah terbesar terkecil terbanyak
+    paling jumlahkan hitung rata maksimum minimum naik turun lebih kurang antara kecuali selain itu ini
+    tersebut sama tolong coba buat buatkan tambahkan tambah hapus ganti ubah jadi menjadi bagaimana kalau
+    jika apa berapa mana setiap tiap semua data datanya nya dong ya
+    now then also only just instead and or the a an of for by in on to from with without show list
+    sort sorted order ordered group grouped filtered limit top bottom first last each every all
+    total sum count average avg mean max maximum min ascending descending asc desc highest
+    lowest largest smallest biggest most least more less than over under between except exclude
+    include it that this these those them same but please can could you make add remove change
+    what how which again
+""".split())
+
+
+def _words(text: str) -> List[str]:
+    return [word.lower() for word in _WORD_RE.findall(text)]
+
+
+def conversation_dataset_ids(chat_history: List[MessageModel]) -> List[UUID]:
+    """
+    Datasets the latest assistant answer of the conversation was generated with
+    """
+    for message in reversed(chat_history):
+        if message.role == "assistant" and message.dataset_ids:
+            return list(message.dataset_ids)
+    return []
+
+
+def is_refinement(question: str, chat_history: List[MessageModel], datasets: List[DatasetReference]) -> bool:
+    """
+    Cheap guess whether a question reshapes the previous answer ("sekarang kelompokkan per
+    tahun", "only 2020") instead of asking about something new: it is short, and every
+    word that is not a refinement word or a number already came up in the last messages
+    or in the conversation's datasets.
+    """
+    words = _words(question)
+    if not words or len(words) > FOLLOWUP_MAX_WORDS:
+        return False
+
+    known: Set[str] = set()
+    for message in chat_history[-FOLLOWUP_CONTEXT_MESSAGES:]:
+        known.update(_words(message.content))
+    for dataset in datasets:
+        known.update(_words(f"{dataset.title} {dataset.description} {dataset.slug} {dataset.prompt_card or ''}"))
+
+    return all(word in _REFINEMENT_WORDS or word.isdigit() or word in known for word in words)
+
+
+async def get_session_context(
+    db: AsyncSession,
+    question: str,
+    chat_history: List[MessageModel]
+) -> Tuple[List[DatasetReference], List[QueryReference]]:
+    """
+    Relevant datasets and reference queries for a question asked in a conversation.
+    A refinement of the previous answer reuses its datasets as they are, without
+    embedding the question or searching; any other question is searched with the
+    conversation's datasets boosted by SESSION_DATASET_BOOST, so a follow-up keeps the
+    tables the browser has already loaded unless something else fits clearly better.
+    """
+    pinned: List[DatasetReference] = []
+    dataset_ids = conversation_dataset_ids(chat_history)
+    if dataset_ids:
+        with timed_stage("session_datasets"):
+            pinned = await get_datasets_by_id(db, dataset_ids)
+
+    if pinned and is_refinement(question, chat_history, pinned):
+        SESSION_RETRIEVALS.labels("refinement").inc()
+        return pinned, []
+
+    SESSION_RETRIEVALS.labels("boosted" if pinned else "fresh").inc()
+    datasets = await get_relevant_datasets(
+        db, question, boost_ids=[dataset.id for dataset in pinned], boost=SESSION_DATASET_BOOST
+    )
+    reference_queries = await get_relevant_queries(db, question)
+    return datasets, reference_queries
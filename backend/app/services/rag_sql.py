@@ -1,9 +1,12 @@
-from sqlalchemy import select
+from sqlalchemy import select, values, column, cast, true, Integer
 from sqlalchemy.ext.asyncio import AsyncSession
+from pgvector.sqlalchemy import Vector
 from app.models.db import ReferenceQuery
 from app.utils.embedding import get_embedding
+from app.services.embedding_models import get_active_embedding, EmbeddingSlot
+from app.utils.metrics import timed_stage
 from app.models.schema import QueryReference
-from typing import List
+from typing import List, Optional
 import numpy as np
 
 async def get_relevant_queries(
@@ -14,8 +17,10 @@ async def get_relevant_queries(
     """
     Get relevant SQL reference queries using vector similarity search
     """
-    # Get embedding for question
-    question_embedding = await get_embedding(question)
+    # Embed the question with the model retrieval currently uses
+    slot = await get_active_embedding(db)
+    with timed_stage("embedding"):
+        question_embedding = await get_embedding(question, model=slot.model)
     
     if not question_embedding:
         return []
@@ -26,11 +31,12 @@ async def get_relevant_queries(
     # Query most similar reference queries
     query = select(ReferenceQuery).order_by(
         # Using cosine similarity with pgvector
-        ReferenceQuery.embedding.cosine_distance(embedding_array)
+        getattr(ReferenceQuery, slot.column).cosine_distance(embedding_array)
     ).limit(limit)
     
-    result = await db.execute(query)
-    reference_queries = result.scalars().all()
+    with timed_stage("vector_search"):
+        result = await db.execute(query)
+        reference_queries = result.scalars().all()
     
     # Convert to response model
     return [
@@ -41,4 +47,38 @@ async def get_relevant_queries(
             sql_query=query.sql_query
         )
         for query in reference_queries
-    ]
\ No newline at end of file
+    ]
+
+async def get_relevant_queries_batch(
+    db: AsyncSession,
+    slot: EmbeddingSlot,
+    embeddings: List[Optional[List[float]]],
+    limit: int = 2
+) -> List[List[QueryReference]]:
+    """
+    Relevant SQL reference queries for many questions at once, embedded with the model
+    of `slot`, in one query. The result is aligned with `embeddings`.
+    """
+    rows = [(position, embedding) for position, embedding in enumerate(embeddings) if embedding]
+    results: List[List[QueryReference]] = [[] for _ in embeddings]
+    if not rows:
+        return results
+
+    questions = values(
+        column("position", Integer), column("embedding", Vector()), name="questions"
+    ).data([(position, cast(np.array(embedding), Vector())) for position, embedding in rows])
+    # The nearest reference queries of each question, side by side
+    distance = getattr(ReferenceQuery, slot.column).cosine_distance(questions.c.embedding)
+    nearest = select(
+        *(getattr(ReferenceQuery, field) for field in QueryReference.model_fields),
+        distance.label("distance")
+    ).order_by(distance).limit(limit).lateral("nearest")
+    query = select(questions.c.position, nearest).join(nearest, true()).order_by(
+        questions.c.position, nearest.c.distance
+    )
+
+    with timed_stage("vector_search"):
+        result = await db.execute(query)
+        for row in result.all():
+            results[row.position].append(QueryReference.model_validate(row))
+    return results
@@ -0,0 +1,200 @@
+import asyncio
+from typing import Dict, Optional
+from sqlalchemy import select, update, delete, bindparam, func, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from app.models.db import DatasetCatalog, ReferenceQuery, EmbeddingModel
+from app.services.embedding_models import EmbeddingSlot, read_active_embedding, reset_embedding_cache
+from app.utils.embedding import get_embeddings, embedding_content_hash, EMBEDDING_BATCH_SIZE
+
+# Tables holding embeddings, with the text each row embeds (as built at ingestion / seeding)
+EMBEDDED_TABLES = {
+    DatasetCatalog: lambda: DatasetCatalog.title + " " + DatasetCatalog.description,
+    ReferenceQuery: lambda: ReferenceQuery.title + " " + ReferenceQuery.description + " " + ReferenceQuery.sql_query,
+}
+
+# Don't queue behind long-running queries when changing the schema of a live table
+DDL_LOCK_TIMEOUT = "5s"
+
+
+class ReembeddingError(Exception):
+    """Raised when a re-embedding step cannot run in the current state"""
+
+
+def ann_index_name(table, column: str) -> str:
+    return f"ix_{table.__tablename__}_{column}_hnsw"
+
+
+async def prepare_shadow_slot(db: AsyncSession, model: str, dimensions: int) -> EmbeddingSlot:
+    """
+    Register `model` for backfilling into the slot the active model does not use, recreating
+    that slot's columns with the new dimensions. Dropping and adding nullable columns only
+    touches the catalog, so it is instant even on large tables. Preparing a model that is
+    already being backfilled keeps its progress.
+    """
+    active = await read_active_embedding(db)
+    if model == active.model:
+        raise ReembeddingError(f"{model} is already the active embedding model")
+
+    existing = await db.get(EmbeddingModel, model)
+    if existing and existing.status in ("backfilling", "ready") and existing.slot == active.other_column:
+        return EmbeddingSlot(model=model, column=existing.slot)
+
+    shadow = EmbeddingSlot(model=model, column=active.other_column)
+    await db.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+    for table in EMBEDDED_TABLES:
+        name = table.__tablename__
+        await db.execute(text(f"ALTER TABLE {name} DROP COLUMN IF EXISTS {shadow.column}"))
+        await db.execute(text(f"ALTER TABLE {name} DROP COLUMN IF EXISTS {shadow.hash_column}"))
+        await db.execute(text(f"ALTER TABLE {name} ADD COLUMN {shadow.column} vector({int(dimensions)})"))
+        await db.execute(text(f"ALTER TABLE {name} ADD COLUMN {shadow.hash_column} varchar(64)"))
+
+    # The slot no longer holds the vectors of whatever model used it before
+    await db.execute(delete(EmbeddingModel).where(EmbeddingModel.slot == shadow.column))
+    await db.execute(delete(EmbeddingModel).where(EmbeddingModel.name == model))
+    db.add(EmbeddingModel(name=model, dimensions=dimensions, slot=shadow.column, status="backfilling"))
+    await db.commit()
+    return shadow
+
+
+async def backfill_table(
+    session_factory,
+    table,
+    slot: EmbeddingSlot,
+    active: EmbeddingSlot,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    pause: float = 0.0
+) -> Dict[str, int]:
+    """
+    Embed every row of `table` whose `slot` hash is missing, one keyset-paginated pass in
+    batches of one embedding call, committing per batch and sleeping `pause` seconds in
+    between so the live database and the embedding API are not saturated.
+
+    Ingestion keeps writing the active slot and clears the shadow hash of rows whose text
+    changed, so a later pass picks them up. A row is only updated if its active hash still
+    matches what was read, which keeps a concurrent ingestion from being overwritten with a
+    vector of the old text.
+    """
+    columns = table.__table__.c
+    embedded_text = EMBEDDED_TABLES[table]().label("embedded_text")
+    update_stmt = (
+        update(table.__table__)
+        .where(
+            columns.id == bindparam("row_id"),
+            columns[active.hash_column].is_not_distinct_from(bindparam("active_hash")),
+        )
+        .values({slot.column: bindparam("new_vector"), slot.hash_column: bindparam("new_content_hash")})
+    )
+
+    counts = {"embedded": 0, "failed": 0}
+    last_id = None
+    async with session_factory() as session:
+        while True:
+            query = (
+                select(columns.id, columns[active.hash_column].label("active_hash"), embedded_text)
+                .where(columns[slot.hash_column].is_(None))
+                .order_by(columns.id)
+                .limit(batch_size)
+            )
+            if last_id is not None:
+                query = query.where(columns.id > last_id)
+            rows = (await session.execute(query)).all()
+            await session.rollback()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            embeddings = await get_embeddings([row.embedded_text for row in rows], model=slot.model)
+            params = [
+                {
+                    "row_id": row.id,
+                    "active_hash": row.active_hash,
+                    "new_vector": embedding,
+                    "new_content_hash": embedding_content_hash(row.embedded_text, slot.model),
+                }
+                for row, embedding in zip(rows, embeddings)
+                if embedding
+            ]
+            counts["failed"] += len(rows) - len(params)
+            if params:
+                await session.execute(update_stmt, params)
+                await session.commit()
+                counts["embedded"] += len(params)
+            print(f"{table.__tablename__}: {counts['embedded']} embedded with {slot.model}, {counts['failed']} failed")
+
+            if pause:
+                await asyncio.sleep(pause)
+
+    return counts
+
+
+async def count_missing(db: AsyncSession, slot: EmbeddingSlot) -> int:
+    """
+    Rows that still have no embedding in `slot`
+    """
+    missing = 0
+    for table in EMBEDDED_TABLES:
+        column = table.__table__.c[slot.hash_column]
+        missing += (await db.execute(select(func.count()).select_from(table).where(column.is_(None)))).scalar_one()
+    return missing
+
+
+async def build_ann_indexes(engine: AsyncEngine, slot: EmbeddingSlot) -> None:
+    """
+    Build HNSW cosine indexes on the slot with CREATE INDEX CONCURRENTLY, so reads and
+    ingestion writes go on while the index builds. An invalid index left by an interrupted
+    build is dropped and built again.
+    """
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in EMBEDDED_TABLES:
+            index_name = ann_index_name(table, slot.column)
+            valid = (await conn.execute(
+                text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                {"name": index_name}
+            )).scalar_one_or_none()
+            if valid:
+                continue
+            if valid is False:
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+
+            print(f"Building {index_name}...")
+            await conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY {index_name} ON {table.__tablename__} "
+                f"USING hnsw ({slot.column} vector_cosine_ops)"
+            ))
+
+
+async def mark_ready(db: AsyncSession, model: str) -> None:
+    await db.execute(update(EmbeddingModel).where(EmbeddingModel.name == model).values(status="ready"))
+    await db.commit()
+
+
+async def switch_active_model(db: AsyncSession, model: str, max_missing: int = 0) -> Optional[str]:
+    """
+    Make `model` the one retrieval uses, in a single transaction. Retrieval reads the model
+    name and its slot from the same row, so every request sees either the old pair or the
+    new one. Returns the previously active model, which is kept (retired) until its slot is
+    reused by the next model change.
+    """
+    models = {
+        row.name: row
+        for row in (await db.execute(select(EmbeddingModel).with_for_update())).scalars()
+    }
+    target = models.get(model)
+    if target is None or target.status != "ready":
+        raise ReembeddingError(f"{model} is not backfilled and indexed yet")
+
+    missing = await count_missing(db, EmbeddingSlot(model=model, column=target.slot))
+    if missing > max_missing:
+        raise ReembeddingError(f"{missing} rows are still missing {model} embeddings")
+
+    previous = next((row.name for row in models.values() if row.status == "active"), None)
+    await db.execute(
+        update(EmbeddingModel).where(EmbeddingModel.status == "active").values(status="retired")
+    )
+    await db.execute(
+        update(EmbeddingModel).where(EmbeddingModel.name == model).values(status="active", activated_at=func.now())
+    )
+    await db.commit()
+    reset_embedding_cache()
+    return previous
@@ -0,0 +1,147 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+import yaml
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.db import ReferenceQuery
+from app.services.embedding_models import EmbeddingSlot
+from app.utils.embedding import get_embeddings, embedding_content_hash, EMBEDDING_BATCH_SIZE
+from app.utils.sql_hash import sql_hash
+from app.utils.uuid_helper import uuid7
+
+REQUIRED_FIELDS = ("title", "description", "sql_query")
+
+
+class ReferenceQueryFileError(ValueError):
+    """Raised when a reference query file cannot be read"""
+
+
+def reference_query_text(example: Dict[str, Any]) -> str:
+    """
+    Text embedded for a reference query (same as the re-embedding backfill builds)
+    """
+    return f"{example['title']} {example['description']} {example['sql_query']}"
+
+
+def load_reference_examples(path: str) -> List[Dict[str, Any]]:
+    """
+    Read reference queries from a YAML file (a list, or a mapping with an `examples` list)
+    or a JSONL file (one example per line). Every example needs a title, a description
+    and a sql_query.
+    """
+    file_path = Path(path)
+    content = file_path.read_text(encoding="utf-8")
+
+    if file_path.suffix in (".yaml", ".yml"):
+        data = yaml.safe_load(content) or []
+        examples = data.get("examples", []) if isinstance(data, dict) else data
+    elif file_path.suffix == ".jsonl":
+        examples = []
+        for line_number, line in enumerate(content.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                examples.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ReferenceQueryFileError(f"{path}:{line_number}: {e}") from e
+    else:
+        raise ReferenceQueryFileError(f"{path}: expected a .yaml, .yml or .jsonl file")
+
+    if not isinstance(examples, list):
+        raise ReferenceQueryFileError(f"{path}: expected a list of examples")
+    for index, example in enumerate(examples):
+        missing = [field for field in REQUIRED_FIELDS if not isinstance(example, dict) or not example.get(field)]
+        if missing:
+            raise ReferenceQueryFileError(f"{path}: example {index + 1} is missing {', '.join(missing)}")
+    return examples
+
+
+async def upsert_reference_queries(
+    db: AsyncSession,
+    examples: List[Dict[str, Any]],
+    slot: EmbeddingSlot,
+    batch_size: int = EMBEDDING_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Load reference queries in bulk, keyed by the hash of their normalized SQL so loading
+    the same file again is a no-op. Examples repeating a query already in the batch are
+    dropped (the last one wins), only examples whose embedded text changed are embedded
+    again, in batches, and everything is written with one INSERT ... ON CONFLICT in a
+    single transaction. No transaction is held open while the examples are embedded.
+    """
+    by_hash = {}
+    for example in examples:
+        by_hash[sql_hash(example["sql_query"])] = example
+
+    counts = {
+        "loaded": len(examples),
+        "duplicates": len(examples) - len(by_hash),
+        "embedded": 0,
+        "skipped": 0,
+        "failed": 0,
+        "inserted": 0,
+        "updated": 0,
+    }
+    if not by_hash:
+        return counts
+
+    hash_column = getattr(ReferenceQuery, slot.hash_column)
+    result = await db.execute(
+        select(ReferenceQuery.sql_hash, hash_column).where(ReferenceQuery.sql_hash.in_(list(by_hash)))
+    )
+    stored_hashes = dict(result.all())
+    # Release the connection while the embedding API is called
+    await db.commit()
+
+    rows = []
+    pending = []
+    for query_hash, example in by_hash.items():
+        text = reference_query_text(example)
+        content_hash = embedding_content_hash(text, slot.model)
+        row = {
+            "id": uuid7(),
+            "title": example["title"],
+            "description": example["description"],
+            "sql_query": example["sql_query"],
+            "sql_hash": query_hash,
+        }
+        if query_hash in stored_hashes and stored_hashes[query_hash] == content_hash:
+            counts["skipped"] += 1
+            continue
+        pending.append((row, text, content_hash))
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        embeddings = await get_embeddings([text for _, text, _ in batch], model=slot.model)
+        for (row, _, content_hash), embedding in zip(batch, embeddings):
+            if not embedding:
+                counts["failed"] += 1
+                continue
+            row[slot.column] = embedding
+            row[slot.hash_column] = content_hash
+            # The other slot's vector is of the old text, leave it to the next backfill
+            row[slot.other_hash_column] = None
+            rows.append(row)
+    counts["embedded"] = len(rows)
+
+    if rows:
+        stmt = insert(ReferenceQuery)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ReferenceQuery.sql_hash],
+            set_={
+                **{
+                    column: stmt.excluded[column]
+                    for column in ("title", "description", "sql_query", slot.column, slot.hash_column, slot.other_hash_column)
+                },
+                "updated_at": func.now(),
+            }
+        ).returning(
+            # xmax is 0 only for freshly inserted tuples
+            literal_column("(xmax = 0)").label("inserted")
+        )
+        for inserted, in (await db.execute(stmt, rows)).all():
+            counts["inserted" if inserted else "updated"] += 1
+    await db.commit()
+    return counts
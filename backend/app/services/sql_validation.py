@@ -0,0 +1,397 @@
+import asyncio
+import io
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import duckdb
+import httpx
+from dotenv import load_dotenv
+from app.models.schema import DatasetReference, MessageModel
+from app.services.catalog_cache import ResponseCache
+
+# Load environment variables
+load_dotenv()
+
+# Validation of generated SQL before it is returned: "off", "parse" (the local checks of
+# check_generated_sql) or "explain" (those plus EXPLAIN of every query in DuckDB, against
+# empty tables typed like the datasets). A failure gets one repair round with the LLM.
+SQL_VALIDATION = os.getenv("SQL_VALIDATION", "off")
+# Bytes read from the start of a dataset to infer its column types, and how long to wait for them
+SQL_SCHEMA_SAMPLE_BYTES = int(os.getenv("SQL_SCHEMA_SAMPLE_BYTES", 65536))
+SQL_SCHEMA_TIMEOUT = float(os.getenv("SQL_SCHEMA_TIMEOUT", 5))
+# Seconds a dataset whose schema could not be read is left alone before trying again
+SQL_SCHEMA_MISS_TTL = float(os.getenv("SQL_SCHEMA_MISS_TTL", 60))
+
+# The prompt asks for a line of 14 equals signs between explanation and SQL; like the
+# frontend (lib/llm.ts), any run of 5 or more is accepted
+SQL_SEPARATOR_RE = re.compile(r"={5,}")
+
+_CREATE_TABLE_RE = re.compile(
+    r"\bCREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMP(?:ORARY)?\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?"
+    r"(?P<name>\"[^\"]+\"|[\w.]+)",
+    re.IGNORECASE,
+)
+_AS_QUERY_RE = re.compile(r"\s*(?:\([^)]*\)\s*)?AS\s+(?P<query>.*)", re.IGNORECASE | re.DOTALL)
+_CSV_FUNCTIONS = {"read_csv", "read_csv_auto"}
+_DATASET_URL_RE = re.compile(r"/dataset/(?P<slug>[\w\-]+)/?$")
+_READ_CSV_RE = re.compile(r"\bread_csv(?:_auto)?\s*\(", re.IGNORECASE)
+_URL_ARGUMENT_RE = re.compile(r"\s*'(?P<url>[^']*)'")
+
+# Column names and types per dataset source URL (a changed URL is a new entry, so the
+# catalog version plays no part)
+dataset_schema_cache = ResponseCache()
+# When to try again, per source URL whose schema could not be read
+dataset_schema_misses = ResponseCache()
+_SCHEMA_CACHE_VERSION = 0
+
+
+@dataclass(frozen=True)
+class SQLProblem:
+    """
+    Why a generated answer was rejected: `reason` is a short label (for metrics),
+    `message` the details, worded so they can be handed back to the LLM
+    """
+    reason: str
+    message: str
+
+
+def split_response(text: str) -> Optional[Tuple[str, str]]:
+    """
+    Split an LLM answer into (explanation, sql) at the separator line, None without one
+    """
+    match = SQL_SEPARATOR_RE.search(text)
+    if not match:
+        return None
+    return text[:match.start()].strip(), text[match.end():].strip()
+
+
+class AnswerSplitter:
+    """
+    Splits a streamed LLM answer into explanation and SQL as it arrives. `feed` returns
+    the new ("explanation" | "sql", text) deltas; a trailing run of equals signs is held
+    back until it is known whether it is the separator.
+    """
+
+    def __init__(self):
+        self.part = "explanation"
+        self.explanation = ""
+        self.sql = ""
+        self._pending = ""
+
+    def _emit(self, text: str) -> List[Tuple[str, str]]:
+        if not text:
+            return []
+        if self.part == "explanation":
+            self.explanation += text
+        else:
+            self.sql += text
+        return [(self.part, text)]
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        if self.part == "sql":
+            return self._emit(text)
+
+        self._pending += text
+        match = SQL_SEPARATOR_RE.search(self._pending)
+        if match and match.end() < len(self._pending):
+            before, after = self._pending[:match.start()], self._pending[match.end():]
+            self._pending = ""
+            deltas = self._emit(before)
+            self.part = "sql"
+            return deltas + self._emit(after)
+
+        # Everything up to a trailing "=" run is explanation for sure
+        safe = len(self._pending.rstrip("="))
+        deltas = self._emit(self._pending[:safe])
+        self._pending = self._pending[safe:]
+        return deltas
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """The held back rest, at the end of the answer"""
+        pending, self._pending = self._pending, ""
+        if SQL_SEPARATOR_RE.fullmatch(pending):
+            self.part = "sql"
+            return []
+        return self._emit(pending)
+
+
+def _table_name(name: str) -> str:
+    # Unqualified, unquoted and case-insensitive, like DuckDB resolves it
+    return name.strip('"').split(".")[-1].lower()
+
+
+def _walk(node: Any) -> Iterator[dict]:
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _query_tables(connection: duckdb.DuckDBPyConnection, query: str) -> Tuple[Set[str], Set[str]]:
+    """
+    Tables a SELECT reads and the CSV URLs it loads, from DuckDB's parse tree (the query
+    is parsed only, nothing is read or resolved). CTE names are not counted as tables.
+    """
+    tree = json.loads(connection.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0])
+    if tree.get("error"):
+        return set(), set()
+    tables, ctes, urls = set(), set(), set()
+    for node in _walk(tree["statements"]):
+        if node.get("type") == "BASE_TABLE":
+            tables.add(_table_name(node["table_name"]))
+        elif "cte_map" in node:
+            ctes.update(_table_name(cte["key"]) for cte in node["cte_map"]["map"])
+        elif node.get("type") == "TABLE_FUNCTION" and node["function"].get("function_name") in _CSV_FUNCTIONS:
+            argument = (node["function"].get("children") or [{}])[0]
+            if argument.get("class") == "CONSTANT" and not argument["value"].get("is_null"):
+                urls.add(str(argument["value"]["value"]))
+    return tables - ctes, urls
+
+
+def loaded_tables(sql: str) -> Set[str]:
+    """
+    Names of the tables a script creates (regex based, tolerant of unparsable SQL)
+    """
+    return {_table_name(match.group("name")) for match in _CREATE_TABLE_RE.finditer(sql)}
+
+
+def check_generated_sql(
+    text: str,
+    datasets: List[DatasetReference],
+    chat_history: Optional[List[MessageModel]] = None
+) -> Optional[SQLProblem]:
+    """
+    Cheap local checks of an LLM answer, without running anything: the separator is there,
+    the SQL parses as DuckDB, every CREATE TABLE loads one of the offered datasets (or one
+    loaded earlier in the conversation) and every table queried is created by the answer
+    or was created earlier in the conversation. Returns the first problem found, or None.
+    """
+    parts = split_response(text)
+    if parts is None or not parts[1]:
+        return SQLProblem("no_separator", "The answer has no '==============' line followed by SQL.")
+    sql = parts[1]
+
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error as e:
+        return SQLProblem("parse_error", str(e))
+    if not statements:
+        return SQLProblem("parse_error", "The SQL part contains no statement.")
+
+    earlier = "\n".join(message.content for message in chat_history or [] if message.role == "assistant")
+    known_slugs = {dataset.slug for dataset in datasets} | set(re.findall(r"/dataset/([\w\-]+)", earlier))
+    available = loaded_tables(earlier)
+
+    connection = duckdb.connect()
+    try:
+        for statement in statements:
+            query = statement.query.strip().rstrip(";")
+            if statement.type == duckdb.StatementType.CREATE:
+                create = _CREATE_TABLE_RE.search(query)
+                if not create:
+                    continue
+                as_query = _AS_QUERY_RE.match(query, create.end())
+                if as_query:
+                    tables, urls = _query_tables(connection, as_query.group("query"))
+                else:
+                    tables, urls = set(), set()
+                for url in urls:
+                    match = _DATASET_URL_RE.search(url)
+                    if not match or match.group("slug") not in known_slugs:
+                        return SQLProblem("unknown_dataset", f"{url} is not the URL of any of the available datasets.")
+                missing = tables - available
+                available.add(_table_name(create.group("name")))
+            elif statement.type == duckdb.StatementType.SELECT:
+                missing = _query_tables(connection, query)[0] - available
+            else:
+                continue
+            if missing:
+                return SQLProblem(
+                    "unknown_table",
+                    f"Table {', '.join(sorted(missing))} is queried but never created with CREATE TABLE."
+                )
+    finally:
+        connection.close()
+    return None
+
+
+async def get_dataset_schema(dataset: DatasetReference) -> Optional[List[Tuple[str, str]]]:
+    """
+    Column names and DuckDB types of a dataset, inferred from the first
+    SQL_SCHEMA_SAMPLE_BYTES of its CSV and cached. None when it cannot be read, for
+    whatever reason; such a dataset is not tried again for SQL_SCHEMA_MISS_TTL seconds.
+    """
+    schema = dataset_schema_cache.get(dataset.url, _SCHEMA_CACHE_VERSION)
+    if schema is not None:
+        return schema
+    retry_at = dataset_schema_misses.get(dataset.url, _SCHEMA_CACHE_VERSION)
+    if retry_at is not None and time.monotonic() < retry_at:
+        return None
+
+    try:
+        sample = bytearray()
+        async with httpx.AsyncClient(timeout=SQL_SCHEMA_TIMEOUT, follow_redirects=True) as client:
+            async with client.stream("GET", dataset.url) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    sample += chunk
+                    if len(sample) >= SQL_SCHEMA_SAMPLE_BYTES:
+                        # Only whole rows, a cut off last value would skew its column type
+                        del sample[sample.rfind(b"\n") + 1:]
+                        break
+
+        connection = duckdb.connect()
+        try:
+            relation = connection.read_csv(io.BytesIO(bytes(sample)))
+            schema = [(column, str(column_type)) for column, column_type in zip(relation.columns, relation.types)]
+        finally:
+            connection.close()
+    except Exception:
+        # Unreachable portal, malformed URL, unreadable CSV...: the schema is unavailable
+        dataset_schema_misses.set(dataset.url, _SCHEMA_CACHE_VERSION, time.monotonic() + SQL_SCHEMA_MISS_TTL)
+        return None
+    return dataset_schema_cache.set(dataset.url, _SCHEMA_CACHE_VERSION, schema)
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _closing_paren(sql: str, start: int) -> Optional[int]:
+    """Index of the parenthesis closing the one opened just before `start`"""
+    depth, quote = 1, None
+    for index in range(start, len(sql)):
+        char = sql[index]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return index
+    return None
+
+
+def _replace_csv_loads(sql: str, tables: Dict[str, str]) -> Optional[str]:
+    """
+    Replace every read_csv('<.../dataset/slug>', ...) call with the table standing in for
+    that dataset (`tables` maps slugs to quoted table names). None if a call has no stand-in.
+    """
+    parts, position = [], 0
+    for match in _READ_CSV_RE.finditer(sql):
+        if match.start() < position:
+            continue
+        end = _closing_paren(sql, match.end())
+        url = _URL_ARGUMENT_RE.match(sql, match.end())
+        slug = _DATASET_URL_RE.search(url.group("url")) if url else None
+        if end is None or slug is None or slug.group("slug") not in tables:
+            return None
+        parts += [sql[position:match.start()], tables[slug.group("slug")]]
+        position = end + 1
+    parts.append(sql[position:])
+    return "".join(parts)
+
+
+async def explain_generated_sql(
+    sql: str,
+    datasets: List[DatasetReference],
+    chat_history: Optional[List[MessageModel]] = None
+) -> Optional[SQLProblem]:
+    """
+    Run the generated script in an in-memory DuckDB without external access, the datasets
+    replaced by empty tables with their inferred column types: CREATE statements are
+    executed, queries are EXPLAINed, so unknown columns, type errors and the like surface
+    as binder errors. Tables loaded earlier in the conversation are recreated first.
+    Returns None when the script passes or cannot be checked (dataset schema unavailable).
+    """
+    schemas = await asyncio.gather(*(get_dataset_schema(dataset) for dataset in datasets))
+    stand_ins = {
+        dataset.slug: (_quote(f"__dataset_{dataset.slug}"), schema)
+        for dataset, schema in zip(datasets, schemas) if schema
+    }
+    tables = {slug: table for slug, (table, _) in stand_ins.items()}
+
+    earlier = [
+        parts[1] for parts in (
+            split_response(message.content) for message in chat_history or [] if message.role == "assistant"
+        ) if parts
+    ]
+
+    connection = duckdb.connect(config={"enable_external_access": False})
+    try:
+        for table, schema in stand_ins.values():
+            columns = ", ".join(f"{_quote(name)} {column_type}" for name, column_type in schema)
+            connection.execute(f"CREATE TABLE {table} ({columns})")
+
+        # Best effort: earlier loads of datasets no longer offered cannot be recreated
+        for script in earlier:
+            try:
+                statements = duckdb.extract_statements(script)
+            except duckdb.Error:
+                continue
+            for statement in statements:
+                if statement.type != duckdb.StatementType.CREATE:
+                    continue
+                query = _replace_csv_loads(statement.query, tables)
+                if query is not None:
+                    try:
+                        connection.execute(query)
+                    except duckdb.Error:
+                        pass
+
+        for statement in duckdb.extract_statements(sql):
+            if statement.type not in (duckdb.StatementType.CREATE, duckdb.StatementType.SELECT):
+                continue
+            query = _replace_csv_loads(statement.query, tables)
+            if query is None:
+                return None
+            if statement.type == duckdb.StatementType.SELECT:
+                source = query
+            else:
+                create = _CREATE_TABLE_RE.search(query)
+                as_query = _AS_QUERY_RE.match(query, create.end()) if create else None
+                source = as_query.group("query") if as_query else None
+            if source is not None:
+                existing = {row[0].lower() for row in connection.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+                if _query_tables(connection, source.strip().rstrip(";"))[0] - existing:
+                    # Depends on a table that could not be recreated
+                    return None
+            try:
+                if statement.type == duckdb.StatementType.SELECT:
+                    connection.execute(f"EXPLAIN {query}")
+                else:
+                    connection.execute(query)
+            except duckdb.Error as e:
+                return SQLProblem("explain_error", str(e))
+    except duckdb.Error:
+        return None
+    finally:
+        connection.close()
+    return None
+
+
+async def validate_generated_sql(
+    text: str,
+    datasets: List[DatasetReference],
+    chat_history: Optional[List[MessageModel]] = None,
+    mode: str = SQL_VALIDATION
+) -> Optional[SQLProblem]:
+    """
+    The checks of the configured SQL_VALIDATION mode, returning the first problem found or None
+    """
+    if mode == "off":
+        return None
+    problem = check_generated_sql(text, datasets, chat_history)
+    if problem is None and mode == "explain":
+        problem = await explain_generated_sql(split_response(text)[1], datasets, chat_history)
+    return problem
@@ -0,0 +1,72 @@
+import base64
+import hashlib
+import hmac
+import os
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Secret used to sign pagination cursors so clients cannot forge arbitrary positions
+# (shared by every worker, so a cursor from one is accepted by the others)
+CURSOR_SECRET = os.getenv("CURSOR_SECRET", "").encode()
+if not CURSOR_SECRET:
+    raise ValueError("CURSOR_SECRET environment variable not set")
+
+# Number of signature bytes kept in the cursor (truncated HMAC-SHA256)
+CURSOR_SIGNATURE_BYTES = 12
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor is malformed or its signature does not match"""
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(CURSOR_SECRET, payload, hashlib.sha256).digest()[:CURSOR_SIGNATURE_BYTES]
+
+
+def encode_cursor(source_at: datetime, dataset_id: uuid.UUID, rank: Optional[float] = None) -> str:
+    """
+    Encode a (source_at, id) keyset position into an opaque, signed cursor.
+    Ranked search results also carry the relevance `rank` of the last row.
+    """
+    fields = [source_at.isoformat(), dataset_id.hex]
+    if rank is not None:
+        fields.append(repr(rank))
+    payload = "|".join(fields).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID, Optional[float]]:
+    """
+    Decode and verify a cursor produced by `encode_cursor`
+    """
+    try:
+        payload_part, signature_part = cursor.split(".", 1)
+        payload = _b64decode(payload_part)
+        signature = _b64decode(signature_part)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Malformed cursor") from e
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidCursorError("Cursor signature mismatch")
+
+    try:
+        fields = payload.decode().split("|")
+        if len(fields) not in (2, 3):
+            raise ValueError("Unexpected number of cursor fields")
+        rank = float(fields[2]) if len(fields) == 3 else None
+        return datetime.fromisoformat(fields[0]), uuid.UUID(hex=fields[1]), rank
+    except ValueError as e:
+        raise InvalidCursorError("Malformed cursor") from e
@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import os
 from typing import List, Optional
 import google.generativeai as genai
@@ -11,10 +13,21 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 genai.configure(api_key=GOOGLE_API_KEY)
 
-# Initialize embedding model
+# Initialize embedding model (the model fresh databases start with; once the
+# embedding_models table exists, retrieval uses the model marked active there)
 embedding_model = 'models/embedding-001'
 
-async def get_embedding(text: str) -> Optional[List[float]]:
+# Maximum number of texts Gemini embeds in one request
+EMBEDDING_BATCH_SIZE = 100
+
+def embedding_content_hash(text: str, model: Optional[str] = None) -> str:
+    """
+    Fingerprint of an embedded text together with the embedding model that embeds it.
+    A stored row only needs a new embedding when this value changes.
+    """
+    return hashlib.sha256(f"{model or embedding_model}\n{text}".encode()).hexdigest()
+
+async def get_embedding(text: str, model: Optional[str] = None) -> Optional[List[float]]:
     """
     Get embedding vector for text using Gemini API
     """
@@ -24,7 +37,7 @@ async def get_embedding(text: str) -> Optional[List[float]]:
     try:
         # Get embeddings using Gemini's embedding model
         result = genai.embed_content(
-            model=embedding_model,
+            model=model or embedding_model,
             content=text,
             task_type="retrieval_document"
         )
@@ -36,6 +49,32 @@ async def get_embedding(text: str) -> Optional[List[float]]:
         print(f"Error getting embedding: {str(e)}")
         return None
 
+async def get_embeddings(texts: List[str], model: Optional[str] = None) -> List[Optional[List[float]]]:
+    """
+    Get embedding vectors for many texts using batched Gemini API calls.
+    The result is aligned with `texts`; a failed batch yields None for each of its texts.
+    """
+    if not GOOGLE_API_KEY:
+        raise ValueError("Missing Google API key")
+
+    embeddings: List[Optional[List[float]]] = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+        try:
+            # The Gemini client is synchronous, keep it off the event loop
+            result = await asyncio.to_thread(
+                genai.embed_content,
+                model=model or embedding_model,
+                content=batch,
+                task_type="retrieval_document"
+            )
+            embeddings.extend(result["embedding"])
+        except Exception as e:
+            print(f"Error getting embeddings: {str(e)}")
+            embeddings.extend([None] * len(batch))
+
+    return embeddings
+
 async def compute_similarity(embedding1: List[float], embedding2: List[float]) -> float:
     """
     Compute cosine similarity between two embeddings
@@ -0,0 +1,37 @@
+import hashlib
+import os
+from typing import Dict
+from dotenv import load_dotenv
+from fastapi import Request
+
+# Load environment variables
+load_dotenv()
+
+# Cache-Control for catalog responses; browsers and the CDN revalidate with the ETag afterwards
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=300")
+
+
+def make_etag(*parts: object) -> str:
+    """
+    Strong ETag derived from the given parts (e.g. catalog version and response body)
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()[:20]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Whether the client's If-None-Match already covers `etag`
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
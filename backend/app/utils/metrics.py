@@ -0,0 +1,141 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+from prometheus_client import Counter, Gauge, Histogram
+
+# Latency buckets (seconds) shared by the request stage histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "generate_sql_stage_seconds",
+    "Time spent in each stage of SQL generation",
+    ["endpoint", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TTFT_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending the prompt to the first streamed chunk",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_stream_tokens_per_second",
+    "Output tokens per second after the first chunk (provider usage when reported, else estimated from characters)",
+    ["model"],
+    buckets=(5, 10, 20, 40, 80, 160, 320, 640),
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a connection from the database pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+PROXY_BYTES_PER_SECOND = Histogram(
+    "dataset_proxy_bytes_per_second",
+    "Throughput of datasets proxied by /dataset/{slug}",
+    buckets=(1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8),
+)
+PROXY_BYTES = Counter("dataset_proxy_bytes", "Bytes proxied by /dataset/{slug}")
+GENERATIONS_CANCELLED = Counter(
+    "llm_generations_cancelled",
+    "Streamed generations stopped because the client disconnected",
+    ["endpoint"],
+)
+IDEMPOTENT_REPLAYS = Counter(
+    "llm_generations_deduplicated",
+    "Requests answered from the generation of an earlier request with the same Idempotency-Key, by its state (in_flight, completed)",
+    ["endpoint", "state"],
+)
+SESSION_RETRIEVALS = Counter(
+    "session_retrievals",
+    "Dataset retrievals by kind: refinement (the conversation's datasets reused, no embedding), boosted (kNN favouring them) or fresh",
+    ["kind"],
+)
+LLM_IN_FLIGHT = Gauge("llm_generations_in_flight", "Generations holding an LLM slot")
+LLM_QUEUE_DEPTH = Gauge("llm_generation_queue_depth", "Generations waiting for an LLM slot")
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "llm_generation_queue_wait_seconds",
+    "Time generations waited for an LLM slot",
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "llm_generations_rejected",
+    "Generations turned away by admission control",
+    ["reason"],
+)
+LLM_ATTEMPTS = Counter(
+    "llm_attempts",
+    "Calls made to each model by the router, by outcome (success, error, timeout, hedge_lost)",
+    ["model", "outcome"],
+)
+LLM_CIRCUIT_OPEN = Gauge("llm_circuit_open", "1 while a model is out of rotation after repeated failures", ["model"])
+LLM_CASCADE_DRAFTS = Counter(
+    "llm_cascade_drafts",
+    "Cascade mode drafts of the fast models: accepted, or the check that sent the question to the stronger models",
+    ["outcome"],
+)
+SQL_VALIDATIONS = Counter(
+    "generated_sql_validations",
+    "Validated answers: the first problem found (none when valid) and whether the repair round fixed it",
+    ["reason", "outcome"],
+)
+
+# Rough characters per token, for providers that do not report usage on streams
+CHARS_PER_TOKEN = 4
+
+_current_timer: ContextVar[Optional["StageTimer"]] = ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    """
+    Durations of the stages of one request. Every stage is observed in the
+    generate_sql_stage_seconds histogram and summed per name for the Server-Timing header.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        STAGE_SECONDS.labels(self.endpoint, name).observe(seconds)
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value, durations in milliseconds
+        """
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.durations.items())
+
+
+def start_stage_timer(endpoint: str) -> StageTimer:
+    """
+    Create the stage timer of the current request, picked up by `timed_stage` in services
+    """
+    timer = StageTimer(endpoint)
+    _current_timer.set(timer)
+    return timer
+
+
+@contextmanager
+def timed_stage(name: str) -> Iterator[None]:
+    """
+    Time a stage into the current request's timer (does nothing outside a timed request)
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, round(len(text) / CHARS_PER_TOKEN))
@@ -0,0 +1,69 @@
+import re
+from typing import List
+
+# Maximum length (in characters) of a dataset prompt card
+PROMPT_CARD_MAX_CHARS = 800
+
+# Boilerplate phrases repeated across Jabar / BPS dataset descriptions.
+# They carry no information for SQL generation, so they are dropped.
+BOILERPLATE_PATTERNS = [
+    r"sesuai (?:ketentuan|penamaan) BPS\s+merujuk pada aturan Peraturan Badan Pusat Statistik Nomor \d+ Tahun \d+",
+    r"merujuk pada aturan Peraturan Badan Pusat Statistik Nomor \d+ Tahun \d+",
+    r"Penjelasan mengenai variabel di dalam dataset ini\s*:?",
+]
+_BOILERPLATE_RE = re.compile("|".join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+# "kolom: menyatakan <arti> dengan tipe data <tipe>." -> "kolom (<tipe>): <arti>"
+_VARIABLE_RE = re.compile(
+    r"^(?P<name>[\w\-]+)\s*:\s*menyatakan\s+(?P<meaning>.*?)\s*(?:dengan\s+)?tipe data\s+(?P<type>\w+)\.?$",
+    re.IGNORECASE,
+)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_WHITESPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+def _compact_line(line: str) -> str:
+    """
+    Strip boilerplate and redundant whitespace from a single description line
+    """
+    line = _BOILERPLATE_RE.sub("", line)
+    return _WHITESPACE_RE.sub(" ", line).strip(" ,;")
+
+
+def build_prompt_card(description: str, max_chars: int = PROMPT_CARD_MAX_CHARS) -> str:
+    """
+    Build a compact, boilerplate-free summary of a dataset description for LLM prompts.
+    Column definitions are kept right after the lead sentence because they matter
+    most for SQL generation and must survive the length cap.
+    """
+    text = _HTML_TAG_RE.sub("\n", description or "")
+
+    prose: List[str] = []
+    columns: List[str] = []
+    seen = set()
+    for raw_line in text.splitlines():
+        line = _compact_line(raw_line)
+        key = line.lower()
+        if not line or key in seen:
+            continue
+        seen.add(key)
+
+        match = _VARIABLE_RE.match(line)
+        if match:
+            meaning = match.group("meaning").strip(" ,;")
+            columns.append(f"{match.group('name')} ({match.group('type').lower()}): {meaning}")
+        else:
+            prose.append(line)
+
+    parts = prose[:1]
+    if columns:
+        parts.append("Kolom: " + "; ".join(columns))
+    parts.extend(prose[1:])
+
+    card = " | ".join(parts)
+    if len(card) <= max_chars:
+        return card
+
+    # Cut on a word boundary so the model never sees half a column name
+    truncated = card[:max_chars - 3].rsplit(" ", 1)[0].rstrip(" ,;:|")
+    return f"{truncated}..."
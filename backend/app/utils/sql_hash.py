@@ -0,0 +1,39 @@
+import hashlib
+import re
+
+# Quoted string literals and identifiers, kept verbatim by the normalization
+_QUOTED_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_LINE_COMMENT_RE = re.compile(r"--[^\n]*")
+_BLOCK_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_WHITESPACE_RE = re.compile(r"\s+")
+_PUNCTUATION_SPACE_RE = re.compile(r"\s*([(),;=<>+\-*/])\s*")
+
+
+def _normalize_unquoted(fragment: str) -> str:
+    fragment = _BLOCK_COMMENT_RE.sub(" ", fragment)
+    fragment = _LINE_COMMENT_RE.sub(" ", fragment)
+    fragment = _WHITESPACE_RE.sub(" ", fragment.lower())
+    return _PUNCTUATION_SPACE_RE.sub(r"\1", fragment)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Canonical form of a query for duplicate detection: comments dropped, keywords and
+    unquoted names lowercased, whitespace collapsed, trailing semicolons removed.
+    Quoted literals and identifiers are left untouched ('Bandung' != 'bandung').
+    """
+    parts = []
+    position = 0
+    for match in _QUOTED_RE.finditer(sql):
+        parts.append(_normalize_unquoted(sql[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_normalize_unquoted(sql[position:]))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def sql_hash(sql: str) -> str:
+    """
+    SHA-256 of the normalized query, used to dedupe reference queries
+    """
+    return hashlib.sha256(normalize_sql(sql).encode()).hexdigest()
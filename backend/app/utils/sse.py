@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Mapping, Optional, Tuple
+from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+# Load environment variables
+load_dotenv()
+
+# Streamed text is held back at most SSE_FLUSH_INTERVAL seconds, or until SSE_FLUSH_CHARS
+# characters are pending, so a burst of tiny LLM chunks becomes one event. After
+# SSE_HEARTBEAT_INTERVAL seconds without an event a comment is sent, so proxies do not
+# drop a connection that waits on a slow model.
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL", 0.05))
+SSE_FLUSH_CHARS = int(os.getenv("SSE_FLUSH_CHARS", 1024))
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", 15))
+
+# Headers every server-sent event stream is sent with
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Content-Type": "text/event-stream",
+}
+
+# Comment line, ignored by clients
+HEARTBEAT = ": keep-alive\n\n"
+
+
+def format_event(event: str, data: Any, event_id: Optional[str] = None) -> str:
+    """
+    One server-sent event with a JSON payload (JSON escapes newlines, so the payload is
+    always a single data line)
+    """
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def coalesce_text(
+    deltas: AsyncIterator[Tuple[str, str]],
+    flush_interval: float = SSE_FLUSH_INTERVAL,
+    flush_chars: int = SSE_FLUSH_CHARS,
+    heartbeat_interval: Optional[float] = SSE_HEARTBEAT_INTERVAL
+) -> AsyncIterator[Optional[Tuple[str, str]]]:
+    """
+    Merge consecutive (kind, text) deltas of the same kind, flushing after `flush_interval`
+    seconds or `flush_chars` characters. Yields None when nothing was sent for
+    `heartbeat_interval` seconds (never when it is None). The deltas are read in a separate task, so close this
+    generator (aclosing) before closing what feeds `deltas`.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = deltas.__aiter__()
+    next_delta: Optional[asyncio.Future] = None
+    kind, text, pending_since = None, "", 0.0
+    last_sent = loop.time()
+    try:
+        while True:
+            if next_delta is None:
+                next_delta = asyncio.ensure_future(iterator.__anext__())
+            if text:
+                timeout = max(0.0, pending_since + flush_interval - loop.time())
+            elif heartbeat_interval is not None:
+                timeout = max(0.0, last_sent + heartbeat_interval - loop.time())
+            else:
+                timeout = None
+            done, _ = await asyncio.wait({next_delta}, timeout=timeout)
+            if not done:
+                if text:
+                    yield kind, text
+                    text = ""
+                else:
+                    yield None
+                last_sent = loop.time()
+                continue
+
+            try:
+                delta_kind, delta_text = next_delta.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_delta = None
+            if text and delta_kind != kind:
+                yield kind, text
+                text = ""
+                last_sent = loop.time()
+            if not text:
+                pending_since = loop.time()
+            kind = delta_kind
+            text += delta_text
+            if len(text) >= flush_chars:
+                yield kind, text
+                text = ""
+                last_sent = loop.time()
+
+        if text:
+            yield kind, text
+    finally:
+        if next_delta is not None and not next_delta.done():
+            next_delta.cancel()
+            await asyncio.gather(next_delta, return_exceptions=True)
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    Server-sent event stream that closes its body generator as soon as the response ends.
+
+    Starlette cancels the response when the client disconnects, but a generator suspended
+    at a `yield` is only closed whenever it gets garbage collected, keeping the upstream
+    LLM stream and its database session open until then. Closing it here runs the
+    generator's cleanup right away. `on_close` runs after that, also when the generator
+    never started.
+    """
+
+    def __init__(
+        self,
+        content,
+        headers: Optional[Mapping[str, str]] = None,
+        on_close: Optional[Callable[[], None]] = None
+    ):
+        super().__init__(content, media_type="text/event-stream", headers={**SSE_HEADERS, **(headers or {})})
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            if self.on_close is not None:
+                self.on_close()
@@ -0,0 +1,142 @@
+"""
+Benchmark GET /dataset keyword search on synthetic catalogs.
+
+Compares the old `ILIKE '%term%'` filter with the GIN-indexed full-text search used
+by `list_datasets`, at several catalog sizes. Runs against BENCHMARK_DATABASE_URL
+(the tables in that database are dropped and recreated, never point it at production).
+
+Usage:
+    uv run python benchmarks/catalog_search.py --sizes 10000 100000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from dotenv import load_dotenv
+from sqlalchemy import select, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.db import Base, DatasetCatalog
+from app.routes.dataset import query_dataset_page
+
+# Load environment variables
+load_dotenv()
+
+BENCHMARK_DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL")
+if not BENCHMARK_DATABASE_URL:
+    raise ValueError("BENCHMARK_DATABASE_URL environment variable not set")
+
+# Convert to async URL if needed
+if BENCHMARK_DATABASE_URL.startswith("postgresql://"):
+    BENCHMARK_DATABASE_URL = BENCHMARK_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+VOCABULARY = [
+    "jumlah", "penduduk", "sampah", "anggaran", "pendidikan", "kesehatan", "kemiskinan",
+    "jalan", "sekolah", "rumah", "sakit", "pertanian", "padi", "produksi", "kabupaten",
+    "kota", "provinsi", "desa", "kecamatan", "pangan", "konsumsi", "tenaga", "kerja",
+    "pariwisata", "wisatawan", "industri", "ekspor", "impor", "air", "bersih", "listrik",
+    "kendaraan", "bermotor", "pajak", "retribusi", "bencana", "banjir", "hutan", "ikan",
+]
+BOILERPLATE = (
+    "kode_provinsi: menyatakan kode Provinsi Jawa Barat sesuai ketentuan BPS merujuk pada aturan "
+    "Peraturan Badan Pusat Statistik Nomor 3 Tahun 2019 dengan tipe data numerik. "
+)
+SEARCH_TERMS = ["sampah", "penduduk kota", "angg", "wisatawan pajak", "tidakada"]
+
+
+async def populate(engine, size: int):
+    """Recreate the catalog tables and fill them with `size` synthetic datasets."""
+    async with engine.begin() as conn:
+        await conn.execute(text('CREATE EXTENSION IF NOT EXISTS "vector"'))
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+        def word():
+            return "v.words[1 + floor(random() * cardinality(v.words))::int]"
+
+        await conn.execute(
+            text(f"""
+                INSERT INTO dataset_catalog
+                    (id, title, description, url, direct_source, original_source, source_at, slug, is_cors_allowed)
+                SELECT
+                    gen_random_uuid(),
+                    initcap({word()} || ' ' || {word()} || ' ' || {word()} || ' ' || {word()}),
+                    'Dataset ini berisi data ' || {word()} || ' ' || {word()} || ' ' || {word()}
+                        || ' per ' || {word()} || '. ' || repeat(:boilerplate, 8),
+                    'https://example.com/' || g || '.csv',
+                    'benchmark',
+                    'benchmark',
+                    now() - (g || ' minutes')::interval,
+                    'benchmark_' || g,
+                    false
+                FROM generate_series(1, :size) AS g,
+                     (SELECT CAST(:vocab AS text[]) AS words) AS v
+            """),
+            {"vocab": VOCABULARY, "boilerplate": BOILERPLATE, "size": size},
+        )
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE dataset_catalog"))
+
+
+async def time_calls(call, repeat: int):
+    """Return per-call latencies in milliseconds."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered):8.2f} ms   p95 {p95:8.2f} ms"
+
+
+async def run(sizes, repeat: int):
+    engine = create_async_engine(BENCHMARK_DATABASE_URL, echo=False)
+    SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    for size in sizes:
+        print(f"\nPopulating {size} datasets...")
+        await populate(engine, size)
+
+        async with SessionLocal() as session:
+            for term in SEARCH_TERMS:
+                async def ilike():
+                    like = f"%{term}%"
+                    stmt = (
+                        select(DatasetCatalog)
+                        .where(or_(DatasetCatalog.title.ilike(like), DatasetCatalog.description.ilike(like)))
+                        .order_by(DatasetCatalog.source_at.desc(), DatasetCatalog.id.desc())
+                        .limit(10)
+                    )
+                    (await session.execute(stmt)).scalars().all()
+
+                async def fulltext():
+                    await query_dataset_page(session, 10, search=term)
+
+                # Warm up caches so both variants are measured hot
+                await ilike()
+                await fulltext()
+
+                print(f"[{size:>8}] {term!r:<20} ILIKE     {summarize(await time_calls(ilike, repeat))}")
+                print(f"[{size:>8}] {term!r:<20} full-text {summarize(await time_calls(fulltext, repeat))}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark catalog keyword search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="Catalog sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=20, help="Queries per search term")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.sizes, args.repeat))
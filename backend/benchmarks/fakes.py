@@ -0,0 +1,128 @@
+"""
+Deterministic local stand-ins for the embedding API and the chat model, so benchmarks
+exercise the whole request path without calling Gemini or OpenRouter.
+"""
+import asyncio
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+import numpy as np
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+FAKE_SQL_RESPONSE = """Menjumlahkan data per tahun dari dataset yang paling relevan.
+==============
+CREATE TABLE IF NOT EXISTS data_benchmark AS SELECT * FROM read_csv('http://localhost/dataset/benchmark_1');
+SELECT tahun, SUM(jumlah) AS total
+FROM data_benchmark
+GROUP BY tahun
+ORDER BY tahun;"""
+
+
+def fake_vector(text: str, dimensions: int = 768) -> List[float]:
+    """Unit vector seeded by the text, identical for identical text"""
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeEmbeddings:
+    """
+    Replacement for `get_embedding`: sleeps `latency` seconds (the embedding API round
+    trip) and returns `fake_vector(text)`
+    """
+
+    def __init__(self, latency: float = 0.05, dimensions: int = 768):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.calls = 0
+
+    async def __call__(self, text: str, model: Optional[str] = None) -> List[float]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return fake_vector(text, self.dimensions)
+
+
+class FakeChatModel:
+    """
+    Replacement for the ChatLiteLLM instance: answers every prompt with `response`
+    after `ttft` seconds, streaming it in `chunk_tokens`-token chunks at `tokens_per_second`
+    (tokens approximated as 4 characters)
+    """
+
+    def __init__(
+        self,
+        ttft: float = 0.5,
+        tokens_per_second: float = 80.0,
+        response: str = FAKE_SQL_RESPONSE,
+        chunk_tokens: int = 4,
+    ):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.response = response
+        self.chunk_size = chunk_tokens * 4
+        self.calls = 0
+
+    def _chunks(self) -> List[str]:
+        return [self.response[i:i + self.chunk_size] for i in range(0, len(self.response), self.chunk_size)]
+
+    def _chunk_delay(self) -> float:
+        return (self.chunk_size / 4) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    async def ainvoke(self, messages, **kwargs) -> AIMessage:
+        self.calls += 1
+        await asyncio.sleep(self.ttft + self._chunk_delay() * (len(self._chunks()) - 1))
+        return AIMessage(content=self.response)
+
+    async def astream(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.ttft)
+        for index, chunk in enumerate(self._chunks()):
+            if index:
+                await asyncio.sleep(self._chunk_delay())
+            yield AIMessageChunk(content=chunk)
+
+
+class CsvStubServer:
+    """
+    Local HTTP server answering every GET with the same `size_kb` CSV, standing in for
+    the portals /dataset/{slug} proxies
+    """
+
+    def __init__(self, size_kb: int = 256):
+        row = "kode_provinsi,nama_provinsi,tahun,jumlah\n32,JAWA BARAT,2024,12345\n"
+        self.body = (row * (size_kb * 1024 // len(row) + 1)).encode()[:size_kb * 1024]
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        body = self.body
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "CsvStubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,291 @@
+"""
+Offline load test of the API with local stand-ins for Gemini and the LLM.
+
+Serves the app with uvicorn on a random local port, backed by BENCHMARK_DATABASE_URL (a
+local pgvector Postgres; its tables are dropped and recreated, never point it at
+production). `get_embedding` and the LLM router's models are replaced by the fakes in
+benchmarks/fakes.py and dataset URLs point at a local CSV stub server, so no external
+API is called. Each scenario is run at every concurrency level and reports p50/p95/p99
+latency and throughput (for the stream, also time to the first text event).
+
+Usage:
+    uv run python benchmarks/load_test.py --concurrency 1 8 32 --requests 200
+    uv run python benchmarks/load_test.py --scenarios generate-sql-stream --llm-ttft 1.5 --json report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+import httpx
+import uvicorn
+from dotenv import load_dotenv
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.db import Base, DatasetCatalog, ReferenceQuery, get_db
+from app.services.catalog_cache import reset_catalog_cache
+from app.services.embedding_models import reset_embedding_cache
+from app.services.llm_router import LLMRouter
+from app.utils.uuid_helper import uuid7
+import app.services.llm as llm_service
+import app.services.rag_dataset as rag_dataset
+import app.services.rag_sql as rag_sql
+from benchmarks.fakes import FakeEmbeddings, FakeChatModel, CsvStubServer, fake_vector
+from main import app
+
+# Load environment variables
+load_dotenv()
+
+BENCHMARK_DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL")
+if not BENCHMARK_DATABASE_URL:
+    raise ValueError("BENCHMARK_DATABASE_URL environment variable not set")
+
+# Convert to async URL if needed
+if BENCHMARK_DATABASE_URL.startswith("postgresql://"):
+    BENCHMARK_DATABASE_URL = BENCHMARK_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+TOPICS = [
+    "sampah", "penduduk", "anggaran pendidikan", "kemiskinan", "padi", "wisatawan",
+    "kendaraan bermotor", "air bersih", "rumah sakit", "tenaga kerja",
+]
+REGIONS = ["Kota Bandung", "Kabupaten Bogor", "Jawa Barat", "Kota Bekasi", "Kabupaten Garut"]
+SCENARIOS = ("generate-sql", "generate-sql-stream", "dataset-list", "dataset-proxy")
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, ttfb: Optional[List[float]] = None) -> Dict:
+    """Latency percentiles in milliseconds and throughput in requests per second"""
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    if ordered:
+        summary.update({
+            "p50_ms": round(statistics.median(ordered), 2),
+            "p95_ms": round(percentile(ordered, 0.95), 2),
+            "p99_ms": round(percentile(ordered, 0.99), 2),
+        })
+    if ttfb:
+        ordered_ttfb = sorted(ttfb)
+        summary.update({
+            "ttfb_p50_ms": round(statistics.median(ordered_ttfb), 2),
+            "ttfb_p95_ms": round(percentile(ordered_ttfb, 0.95), 2),
+        })
+    return summary
+
+
+async def populate(engine, datasets: int, reference_queries: int, csv_url: str):
+    """Recreate the tables with synthetic datasets (proxied, pointing at the CSV stub) and reference queries."""
+    async with engine.begin() as conn:
+        await conn.execute(text('CREATE EXTENSION IF NOT EXISTS "vector"'))
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for i in range(datasets):
+            title = f"Jumlah {TOPICS[i % len(TOPICS)]} di {REGIONS[i % len(REGIONS)]} {2015 + i % 10}"
+            description = f"Dataset ini berisi data {title.lower()} per kecamatan dan tahun."
+            rows.append({
+                "id": uuid7(), "title": title, "description": description,
+                "url": f"{csv_url}/benchmark_{i}.csv", "direct_source": "benchmark",
+                "original_source": "benchmark", "source_at": now - timedelta(minutes=i),
+                "slug": f"benchmark_{i}", "is_cors_allowed": False, "prompt_card": description,
+                "embedding": fake_vector(f"{title} {description}"),
+            })
+        for start in range(0, len(rows), 1000):
+            await conn.execute(insert(DatasetCatalog), rows[start:start + 1000])
+
+        rows = []
+        for i in range(reference_queries):
+            topic = TOPICS[i % len(TOPICS)].replace(" ", "_")
+            title = f"Total {topic} per tahun #{i}"
+            sql_query = f"SELECT tahun, SUM(jumlah) FROM {topic}_{i} GROUP BY tahun ORDER BY tahun;"
+            rows.append({
+                "id": uuid7(), "title": title, "description": title, "sql_query": sql_query,
+                "embedding": fake_vector(f"{title} {title} {sql_query}"),
+            })
+        if rows:
+            await conn.execute(insert(ReferenceQuery), rows)
+
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE"))
+
+
+def question() -> str:
+    return f"Berapa total {random.choice(TOPICS)} di {random.choice(REGIONS)} per tahun?"
+
+
+async def run_scenario(make_request: Callable, concurrency: int, requests: int) -> Dict:
+    """Run `requests` calls of `make_request(worker)` over `concurrency` workers"""
+    latencies, ttfb, errors = [], [], 0
+    remaining = iter(range(requests))
+
+    async def worker(index: int):
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                first_byte_at = await make_request(index)
+            except (httpx.HTTPError, AssertionError):
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            if first_byte_at is not None:
+                ttfb.append((first_byte_at - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start, ttfb)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(args):
+    engine = create_async_engine(BENCHMARK_DATABASE_URL, echo=False, pool_size=20, max_overflow=30)
+    SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def benchmark_db():
+        async with SessionLocal() as session:
+            yield session
+
+    # Local stand-ins for everything outside the box
+    app.dependency_overrides[get_db] = benchmark_db
+    fake_embedding = FakeEmbeddings(latency=args.embedding_latency)
+    rag_dataset.get_embedding = fake_embedding
+    rag_sql.get_embedding = fake_embedding
+    llm_service.router = LLMRouter([
+        ("fake", FakeChatModel(ttft=args.llm_ttft, tokens_per_second=args.llm_tokens_per_second))
+    ])
+    # A cascade configured in .env would draft with real models
+    llm_service.cascade_router = None
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "json"},
+        "results": [],
+    }
+    with CsvStubServer(size_kb=args.csv_kb) as csv_server:
+        print(f"Populating {args.datasets} datasets and {args.reference_queries} reference queries...")
+        await populate(engine, args.datasets, args.reference_queries, csv_server.url)
+        reset_catalog_cache()
+        reset_embedding_cache()
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+
+        limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+            # One chat session per worker, generations of a session never overlap
+            sessions = [
+                (await client.post("/start-session")).json()["session_id"]
+                for _ in range(max(args.concurrency))
+            ]
+
+            async def generate_sql(worker: int):
+                response = await client.post(
+                    "/generate-sql", json={"session_id": sessions[worker], "question": question()}
+                )
+                assert response.status_code == 200, response.text
+                return None
+
+            async def generate_sql_stream(worker: int):
+                first_event_at = None
+                async with client.stream(
+                    "POST", "/generate-sql-stream", json={"session_id": sessions[worker], "question": question()}
+                ) as response:
+                    assert response.status_code == 200
+                    async for line in response.aiter_lines():
+                        # Time to the first text of the answer, not to the meta event
+                        if first_event_at is None and line in ("event: explanation", "event: sql"):
+                            first_event_at = time.perf_counter()
+                        assert line != "event: error", line
+                return first_event_at
+
+            async def dataset_list(worker: int):
+                params = {"limit": 10}
+                if random.random() < 0.5:
+                    params["search"] = random.choice(TOPICS)
+                response = await client.get("/dataset", params=params)
+                assert response.status_code == 200, response.text
+                return None
+
+            async def dataset_proxy(worker: int):
+                slug = f"benchmark_{random.randrange(args.datasets)}"
+                first_chunk_at = None
+                async with client.stream("GET", f"/dataset/{slug}") as response:
+                    assert response.status_code == 200
+                    async for _ in response.aiter_raw():
+                        if first_chunk_at is None:
+                            first_chunk_at = time.perf_counter()
+                return first_chunk_at
+
+            scenarios = {
+                "generate-sql": generate_sql,
+                "generate-sql-stream": generate_sql_stream,
+                "dataset-list": dataset_list,
+                "dataset-proxy": dataset_proxy,
+            }
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    result = await run_scenario(scenarios[name], concurrency, args.requests)
+                    report["results"].append({"scenario": name, "concurrency": concurrency, **result})
+                    line = (
+                        f"{name:<20} c={concurrency:<4} {result['throughput_rps']:8.1f} req/s"
+                        f"   errors {result['errors']:<4}"
+                    )
+                    if "p50_ms" in result:
+                        line += f"   p50 {result['p50_ms']:8.1f} ms   p95 {result['p95_ms']:8.1f} ms   p99 {result['p99_ms']:8.1f} ms"
+                    if "ttfb_p50_ms" in result:
+                        line += f"   first byte p50 {result['ttfb_p50_ms']:7.1f} ms"
+                    print(line)
+
+        server.should_exit = True
+        await server_task
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test of the API with local fakes")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS), help="Endpoints to load")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrent clients, one run per level")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--datasets", type=int, default=5000, help="Synthetic catalog size")
+    parser.add_argument("--reference-queries", type=int, default=200, help="Synthetic reference queries")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Fake embedding API latency (s)")
+    parser.add_argument("--llm-ttft", type=float, default=0.5, help="Fake LLM time to first token (s)")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80.0, help="Fake LLM output rate")
+    parser.add_argument("--csv-kb", type=int, default=256, help="Size of the CSV the stub portal serves")
+    parser.add_argument("--json", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
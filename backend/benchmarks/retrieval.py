@@ -0,0 +1,297 @@
+"""
+Benchmark vector retrieval latency and recall on synthetic catalogs.
+
+Fills `dataset_catalog` and `reference_queries` with `size` rows of clustered 768-dim
+unit vectors each, then times `get_relevant_datasets` / `get_relevant_queries` (question
+embedding replaced by a query vector near a random row) with:
+
+- seqscan:  exact search, index scans disabled; also the ground truth for recall
+- hnsw:     the HNSW cosine index reembedding builds, at each --ef-search value
+- memory:   brute-force cosine search over a float32 numpy matrix held by the worker
+
+Runs against BENCHMARK_DATABASE_URL (the tables in that database are dropped and
+recreated, never point it at production) and writes a JSON report.
+
+Usage:
+    uv run python benchmarks/retrieval.py --sizes 10000 100000 --json retrieval.json
+    uv run python benchmarks/retrieval.py --sizes 1000000 --ef-search 40 100 --no-memory
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import asyncpg
+import numpy as np
+from dotenv import load_dotenv
+from pgvector.asyncpg import register_vector
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.db import Base, DatasetCatalog, ReferenceQuery
+from app.services.embedding_models import DEFAULT_SLOT, reset_embedding_cache
+from app.services.reembedding import ann_index_name
+import app.services.rag_dataset as rag_dataset
+import app.services.rag_sql as rag_sql
+
+# Load environment variables
+load_dotenv()
+
+BENCHMARK_DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL")
+if not BENCHMARK_DATABASE_URL:
+    raise ValueError("BENCHMARK_DATABASE_URL environment variable not set")
+
+# asyncpg takes the plain URL, SQLAlchemy the async one
+ASYNCPG_URL = BENCHMARK_DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+SQLALCHEMY_URL = ASYNCPG_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+DIMENSIONS = 768
+COPY_BATCH = 10_000
+
+# Retrieval function and row builder of each embedded table
+TABLES = {
+    "dataset_catalog": {
+        "retrieve": rag_dataset.get_relevant_datasets,
+        "module": rag_dataset,
+        "columns": ["id", "title", "description", "url", "direct_source", "original_source",
+                    "source_at", "slug", "is_cors_allowed", "embedding"],
+        "row": lambda i, vector, now: (
+            uuid.uuid4(), f"Dataset {i}", f"Deskripsi dataset sintetis {i}", f"https://example.com/{i}.csv",
+            "benchmark", "benchmark", now, f"benchmark_{i}", False, vector,
+        ),
+    },
+    "reference_queries": {
+        "retrieve": rag_sql.get_relevant_queries,
+        "module": rag_sql,
+        "columns": ["id", "title", "description", "sql_query", "embedding"],
+        "row": lambda i, vector, now: (
+            uuid.uuid4(), f"Query {i}", f"Contoh query sintetis {i}", f"SELECT * FROM t_{i};", vector,
+        ),
+    },
+}
+
+
+def clustered_vectors(rng: np.random.Generator, centroids: np.ndarray, count: int) -> np.ndarray:
+    """Unit vectors scattered around random centroids, like embeddings of related datasets"""
+    assigned = centroids[rng.integers(0, len(centroids), count)]
+    vectors = assigned + 0.6 * rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def populate(engine, table: str, size: int, seed: int, keep_matrix: bool) -> Optional[np.ndarray]:
+    """
+    Recreate `table` with `size` synthetic rows, loaded with COPY. Returns the vectors
+    (in row order) when they are needed for the in-memory backend.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((max(16, size // 200), DIMENSIONS)).astype(np.float32)
+    matrix = np.empty((size, DIMENSIONS), dtype=np.float32) if keep_matrix else None
+
+    async with engine.begin() as conn:
+        await conn.execute(text('CREATE EXTENSION IF NOT EXISTS "vector"'))
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        # ANN indexes need a fixed dimension
+        for name in TABLES:
+            await conn.execute(text(f"ALTER TABLE {name} ALTER COLUMN embedding TYPE vector({DIMENSIONS})"))
+
+    spec = TABLES[table]
+    now = datetime.now(timezone.utc)
+    conn = await asyncpg.connect(ASYNCPG_URL)
+    try:
+        await register_vector(conn)
+        for start in range(0, size, COPY_BATCH):
+            count = min(COPY_BATCH, size - start)
+            vectors = clustered_vectors(rng, centroids, count)
+            if matrix is not None:
+                matrix[start:start + count] = vectors
+            await conn.copy_records_to_table(
+                table,
+                columns=spec["columns"],
+                records=[spec["row"](start + i, vectors[i], now) for i in range(count)],
+            )
+            print(f"  {table}: {start + count}/{size} rows", end="\r")
+        print()
+        await conn.execute(f"VACUUM ANALYZE {table}")
+    finally:
+        await conn.close()
+    return matrix
+
+
+async def build_hnsw(table: str) -> float:
+    """Build the HNSW cosine index on the active slot, returns the build time in seconds"""
+    model = DatasetCatalog if table == "dataset_catalog" else ReferenceQuery
+    conn = await asyncpg.connect(ASYNCPG_URL)
+    try:
+        await conn.execute("SET maintenance_work_mem = '1GB'")
+        start = time.perf_counter()
+        await conn.execute(
+            f"CREATE INDEX {ann_index_name(model, DEFAULT_SLOT.column)} ON {table} "
+            f"USING hnsw ({DEFAULT_SLOT.column} vector_cosine_ops)"
+        )
+        return time.perf_counter() - start
+    finally:
+        await conn.close()
+
+
+def sample_queries(rng: np.random.Generator, rows: np.ndarray, count: int) -> np.ndarray:
+    """Query vectors close to random stored rows, like questions about existing datasets"""
+    picked = rows[rng.integers(0, len(rows), count)]
+    queries = picked + 0.4 * rng.standard_normal(picked.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+async def stored_vectors(table: str, count: int, seed: int) -> np.ndarray:
+    """Random stored vectors, to derive queries from when the matrix is not kept in memory"""
+    conn = await asyncpg.connect(ASYNCPG_URL)
+    try:
+        await register_vector(conn)
+        await conn.execute(f"SELECT setseed({(seed % 1000) / 1000})")
+        rows = await conn.fetch(f"SELECT embedding FROM {table} ORDER BY random() LIMIT $1", count)
+        return np.array([row["embedding"] for row in rows], dtype=np.float32)
+    finally:
+        await conn.close()
+
+
+async def row_ids(table: str) -> List[str]:
+    """Row ids in insertion order (the order of the in-memory matrix)"""
+    conn = await asyncpg.connect(ASYNCPG_URL)
+    try:
+        # COPY appends in order to a fresh heap, ctid order is insertion order
+        rows = await conn.fetch(f"SELECT id FROM {table} ORDER BY ctid")
+        return [str(row["id"]) for row in rows]
+    finally:
+        await conn.close()
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "qps": round(len(ordered) / (sum(ordered) / 1000), 1),
+    }
+
+
+def recall(results: List[List[str]], truth: List[List[str]]) -> float:
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(results, truth))
+    return round(hits / sum(len(expected) for expected in truth), 4)
+
+
+async def time_retrieval(session_factory, table: str, queries: np.ndarray, k: int, settings: List[str]):
+    """
+    Run the table's retrieval function for every query with the given session settings,
+    returning per-query latencies (ms) and result ids
+    """
+    spec = TABLES[table]
+    current = {}
+
+    async def fake_embedding(question, model=None):
+        return current["vector"]
+
+    spec["module"].get_embedding = fake_embedding
+    latencies, results = [], []
+    async with session_factory() as session:
+        for setting in settings:
+            await session.execute(text(setting))
+        # Warm up the connection, plan and buffers
+        current["vector"] = queries[0].tolist()
+        await spec["retrieve"](session, "warmup", limit=k)
+
+        for index, vector in enumerate(queries):
+            current["vector"] = vector.tolist()
+            start = time.perf_counter()
+            found = await spec["retrieve"](session, f"q{index}", limit=k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append([str(item.id) for item in found])
+        await session.rollback()
+    return latencies, results
+
+
+async def run(args):
+    engine = create_async_engine(SQLALCHEMY_URL, echo=False)
+    SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    report = {"config": {key: value for key, value in vars(args).items() if key != "json"}, "results": []}
+
+    for size in args.sizes:
+        for table in args.tables:
+            print(f"\nPopulating {table} with {size} rows...")
+            matrix = await populate(engine, table, size, args.seed, keep_matrix=not args.no_memory)
+            reset_embedding_cache()
+            rng = np.random.default_rng(args.seed + 1)
+            base = matrix if matrix is not None else await stored_vectors(table, args.queries, args.seed)
+            queries = sample_queries(rng, base, args.queries)
+
+            def record(backend, latencies, results, truth, **extra):
+                entry = {
+                    "table": table, "size": size, "backend": backend, "k": args.k,
+                    **extra, **latency_summary(latencies), f"recall_at_{args.k}": recall(results, truth),
+                }
+                report["results"].append(entry)
+                label = backend + (f" ef_search={extra['ef_search']}" if "ef_search" in extra else "")
+                print(
+                    f"[{size:>8}] {table:<18} {label:<22} p50 {entry['p50_ms']:8.2f} ms   "
+                    f"p95 {entry['p95_ms']:8.2f} ms   recall@{args.k} {entry[f'recall_at_{args.k}']:.3f}"
+                )
+
+            # Exact search first, it is the ground truth for the others
+            latencies, truth = await time_retrieval(
+                SessionLocal, table, queries, args.k,
+                ["SET LOCAL enable_indexscan = off", "SET LOCAL enable_bitmapscan = off"],
+            )
+            record("seqscan", latencies, truth, truth)
+
+            print(f"Building HNSW index on {table}...")
+            build_seconds = await build_hnsw(table)
+            for ef_search in args.ef_search:
+                latencies, results = await time_retrieval(
+                    SessionLocal, table, queries, args.k, [f"SET LOCAL hnsw.ef_search = {int(ef_search)}"]
+                )
+                record("hnsw", latencies, results, truth, ef_search=ef_search, build_seconds=round(build_seconds, 2))
+
+            if matrix is not None:
+                ids = await row_ids(table)
+                latencies, results = [], []
+                for vector in queries:
+                    start = time.perf_counter()
+                    scores = matrix @ vector
+                    top = np.argpartition(-scores, args.k)[:args.k]
+                    top = top[np.argsort(-scores[top])]
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    results.append([ids[i] for i in top])
+                record("memory", latencies, results, truth, memory_mb=round(matrix.nbytes / 2**20, 1))
+
+    await engine.dispose()
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vector retrieval latency and recall")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="Rows per table (e.g. 10000 100000 1000000)")
+    parser.add_argument("--tables", nargs="+", choices=sorted(TABLES), default=sorted(TABLES), help="Tables to benchmark")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[20, 40, 100, 200], help="HNSW ef_search values")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (recall@k)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per configuration")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic data")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the in-memory backend (1M rows need ~3 GB)")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
@@ -3,7 +3,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-from app.routes import generate_sql, session, dataset
+from app.routes import generate_sql, session, dataset, metrics
 from app.models.db import init_db
 
 @asynccontextmanager
@@ -33,6 +33,7 @@ app.add_middleware(
 app.include_router(generate_sql.router, tags=["SQL Generation"])
 app.include_router(session.router, tags=["Chat Sessions"])
 app.include_router(dataset.router, tags=["Datasets"])
+app.include_router(metrics.router, tags=["Monitoring"])
 
 @app.get("/", tags=["Health Check"])
 async def root():
@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.connectors import CONNECTORS, get_connectors
+from app.models.db import engine
+from app.services.ingestion_pipeline import (
+    run_ingestion,
+    INGEST_CONCURRENCY,
+    INGEST_BATCH_SIZE,
+    INGEST_PREFETCH,
+)
+from app.utils.embedding import EMBEDDING_BATCH_SIZE
+
+# SQL echo off by default, bulk inserts would print every embedding
+engine.echo = os.getenv("SQL_ECHO") == "1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the dataset catalog from open data portals")
+    parser.add_argument(
+        "--connector",
+        dest="connectors",
+        action="append",
+        choices=sorted(CONNECTORS),
+        help="Portal to sync, repeatable (default: every configured connector but bps, which has no CSV tables yet)"
+    )
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY, help="Embedding calls in flight")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help=f"Datasets per embedding call and insert batch (max {EMBEDDING_BATCH_SIZE})")
+    parser.add_argument("--prefetch", type=int, default=INGEST_PREFETCH, help="Fetched pages buffered ahead of processing")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermarks and re-sync every dataset")
+    parser.add_argument("--resume", action="store_true", help="Continue interrupted runs from their checkpoints")
+    args = parser.parse_args()
+
+    asyncio.run(run_ingestion(
+        get_connectors(args.connectors),
+        embed_workers=args.concurrency,
+        batch_size=args.batch_size,
+        prefetch=args.prefetch,
+        full=args.full,
+        resume=args.resume,
+    ))
@@ -0,0 +1,33 @@
+import argparse
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.db import engine, AsyncSessionLocal
+from app.services.embedding_models import read_active_embedding
+from app.services.reference_queries import load_reference_examples, upsert_reference_queries
+from app.utils.embedding import EMBEDDING_BATCH_SIZE
+
+# SQL echo off by default, bulk inserts would print every embedding
+engine.echo = os.getenv("SQL_ECHO") == "1"
+
+
+async def load(paths, batch_size):
+    examples = []
+    for path in paths:
+        examples.extend(load_reference_examples(path))
+
+    async with AsyncSessionLocal() as session:
+        slot = await read_active_embedding(session)
+        counts = await upsert_reference_queries(session, examples, slot, batch_size=batch_size)
+    print(", ".join(f"{value} {name}" for name, value in counts.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load reference queries from YAML or JSONL files")
+    parser.add_argument("paths", nargs="+", help="Example files (.yaml, .yml or .jsonl)")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="Examples per embedding call")
+    args = parser.parse_args()
+
+    asyncio.run(load(args.paths, args.batch_size))
@@ -0,0 +1,76 @@
+"""
+Move retrieval to a new embedding model without rebuilding the catalog.
+
+Steps (each one can be re-run, an interrupted run continues where it stopped):
+    1. prepare   recreate the unused embedding slot with the new dimensions
+    2. backfill  embed every dataset and reference query into it, in throttled batches
+    3. index     build HNSW indexes on it with CREATE INDEX CONCURRENTLY
+    4. switch    make the new model active in one transaction, then catch up on rows
+                 ingestion changed in the meantime
+
+Usage:
+    uv run scripts/reembed.py models/text-embedding-004 --dimensions 768
+"""
+import argparse
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.db import engine, AsyncSessionLocal
+from app.services.embedding_models import read_active_embedding
+from app.services.reembedding import (
+    EMBEDDED_TABLES,
+    prepare_shadow_slot,
+    backfill_table,
+    build_ann_indexes,
+    count_missing,
+    mark_ready,
+    switch_active_model,
+)
+from app.utils.embedding import EMBEDDING_BATCH_SIZE
+
+# SQL echo off by default, backfill updates would print every embedding
+engine.echo = os.getenv("SQL_ECHO") == "1"
+
+async def backfill(slot, active, batch_size: int, pause: float):
+    for table in EMBEDDED_TABLES:
+        await backfill_table(AsyncSessionLocal, table, slot, active, batch_size, pause)
+
+async def reembed(model: str, dimensions: int, batch_size: int, pause: float, switch: bool, max_missing: int):
+    async with AsyncSessionLocal() as session:
+        active = await read_active_embedding(session)
+        print(f"Active embedding model: {active.model} ({active.column})")
+        slot = await prepare_shadow_slot(session, model, dimensions)
+        print(f"Backfilling {model} into {slot.column}")
+
+    await backfill(slot, active, batch_size, pause)
+    await build_ann_indexes(engine, slot)
+
+    async with AsyncSessionLocal() as session:
+        # Rows changed by ingestion during the index build
+        if await count_missing(session, slot):
+            await backfill(slot, active, batch_size, pause)
+        await mark_ready(session, model)
+
+        if not switch:
+            print(f"{model} is ready, run again without --no-switch to activate it")
+            return
+
+        previous = await switch_active_model(session, model, max_missing)
+        print(f"Retrieval switched from {previous} to {model}")
+
+    # Ingestion runs that started before the switch may still have written the old slot
+    await backfill(slot, slot, batch_size, pause)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed the catalog with a new embedding model, online")
+    parser.add_argument("model", help="New embedding model, e.g. models/text-embedding-004")
+    parser.add_argument("--dimensions", type=int, required=True, help="Embedding size of the new model")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="Rows per embedding call and update")
+    parser.add_argument("--pause", type=float, default=1.0, help="Seconds to sleep between batches")
+    parser.add_argument("--max-missing", type=int, default=0, help="Rows allowed to lack the new embedding at switch time")
+    parser.add_argument("--no-switch", dest="switch", action="store_false", help="Stop once the new model is backfilled and indexed")
+    args = parser.parse_args()
+
+    asyncio.run(reembed(args.model, args.dimensions, args.batch_size, args.pause, args.switch, args.max_missing))
@@ -11,8 +11,13 @@ import uuid
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.models.db import DatasetCatalog, ReferenceQuery
-from app.utils.embedding import get_embedding
+from app.models.db import DatasetCatalog
+from app.utils.embedding import get_embedding, embedding_content_hash
+from app.services.embedding_models import read_active_embedding
+from app.services.reference_queries import upsert_reference_queries
+from app.utils.prompt_card import build_prompt_card
+from app.services.catalog_cache import bump_catalog_version
+from app.services.catalog_facets import refresh_catalog_facets
 
 # Load environment variables
 load_dotenv()
@@ -176,12 +181,15 @@ ORDER BY
 async def seed_data():
     """Seed the database with example data"""
     async with AsyncSessionLocal() as session:
+        # Embed with the model retrieval currently uses, into its column slot
+        slot = await read_active_embedding(session)
+
         # Add datasets
         print("Adding example datasets...")
         for dataset_data in EXAMPLE_DATASETS:
             # Get embedding for dataset
             combined_text = f"{dataset_data['title']} {dataset_data['description']}"
-            embedding = await get_embedding(combined_text)
+            embedding = await get_embedding(combined_text, model=slot.model)
             
             if embedding:
                 # Create dataset record
@@ -193,36 +201,29 @@ async def seed_data():
                     info_url=dataset_data["info_url"],
                     source=dataset_data["source"],
                     source_at=dataset_data["source_at"],
-                    embedding=embedding
+                    prompt_card=build_prompt_card(dataset_data["description"]),
+                    **{
+                        slot.column: embedding,
+                        slot.hash_column: embedding_content_hash(combined_text, slot.model),
+                    }
                 )
                 session.add(dataset)
                 print(f"Added dataset: {dataset.title}")
             else:
                 print(f"Failed to generate embedding for: {dataset_data['title']}")
         
-        # Add reference queries
-        print("\nAdding example reference queries...")
-        for query_data in EXAMPLE_QUERIES:
-            # Get embedding for query
-            combined_text = f"{query_data['title']} {query_data['description']} {query_data['sql_query']}"
-            embedding = await get_embedding(combined_text)
-            
-            if embedding:
-                # Create reference query record
-                ref_query = ReferenceQuery(
-                    id=uuid.uuid4(),
-                    title=query_data["title"],
-                    description=query_data["description"],
-                    sql_query=query_data["sql_query"],
-                    embedding=embedding
-                )
-                session.add(ref_query)
-                print(f"Added reference query: {ref_query.title}")
-            else:
-                print(f"Failed to generate embedding for query: {query_data['title']}")
-        
         # Commit changes
         await session.commit()
+
+        # Add reference queries (one bulk upsert, re-seeding does not duplicate them)
+        print("\nAdding example reference queries...")
+        counts = await upsert_reference_queries(session, EXAMPLE_QUERIES, slot)
+        print(f"Reference queries: {counts['inserted']} added, {counts['updated']} updated, {counts['skipped']} unchanged")
+
+        # Rebuild dataset facet counts
+        await refresh_catalog_facets(session)
+        # Invalidate cached catalog responses in the API
+        await bump_catalog_version(session)
         print("\nSeed data successfully added to the database!")
 
 if __name__ == "__main__":
@@ -1,10 +1,16 @@
+import os
+
+# Cursors signed in tests need a secret; set it before the app is imported
+os.environ.setdefault("CURSOR_SECRET", "test-cursor-secret")
+
 import pytest
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.models.db import get_db, Base
+from app.services.catalog_cache import reset_catalog_cache
+from app.services.embedding_models import reset_embedding_cache
 from main import app  # Import your FastAPI app
-import os
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -58,6 +64,10 @@ async def setup_test_db():
     
     # Apply the override
     app.dependency_overrides[get_db] = override_get_db
+
+    # Every test starts from an empty catalog, so drop responses cached by earlier tests
+    reset_catalog_cache()
+    reset_embedding_cache()
     
     # Yield control to the test
     yield
@@ -96,3 +106,17 @@ async def test_client():
     import httpx
     async with httpx.AsyncClient(app=app, base_url="http://test") as client:
         yield client
+
+# Optional: Fixture for code that opens its own sessions (ingestion pipeline, re-embedding)
+@pytest_asyncio.fixture(scope="function")
+async def session_factory():
+    """
+    Session factory on a pooled engine, for code that uses several connections at once.
+    Usage: async def test_something(session_factory): ...
+    """
+    database_url = os.getenv("TEST_DATABASE_URL") or os.getenv("DATABASE_URL")
+    if database_url.startswith("postgresql://"):
+        database_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    engine = create_async_engine(database_url, echo=False)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
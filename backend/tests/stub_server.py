@@ -0,0 +1,76 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List
+from urllib.parse import urlparse, parse_qsl
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+class StubServer:
+    """
+    Local HTTP server replaying recorded responses.
+
+    A fixture file is a JSON list of {"path", "query", "status", "body"} entries (a string body
+    is served as CSV); a request is answered by the entry with the same path whose query params
+    are all present in the request (the most specific match wins), anything else gets a 404.
+    """
+    def __init__(self, exchanges: List[Dict[str, Any]]):
+        self.exchanges = sorted(exchanges, key=lambda exchange: len(exchange.get("query") or {}), reverse=True)
+        self.requests: List[str] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @classmethod
+    def from_fixture(cls, name: str) -> "StubServer":
+        return cls(json.loads((FIXTURES_DIR / name).read_text()))
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def match(self, path: str, query: Dict[str, str]):
+        for exchange in self.exchanges:
+            expected = exchange.get("query") or {}
+            if exchange["path"] == path and all(query.get(key) == value for key, value in expected.items()):
+                return exchange
+        return None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                stub.requests.append(self.path)
+                exchange = stub.match(url.path, dict(parse_qsl(url.query)))
+                if exchange is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                # Text bodies (CSV files) are served as they are
+                if isinstance(exchange["body"], str):
+                    body, content_type = exchange["body"].encode(), "text/csv"
+                else:
+                    body, content_type = json.dumps(exchange["body"]).encode(), "application/json"
+                self.send_response(exchange.get("status", 200))
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_admission_limits_concurrency_queue_and_sessions():
+    from app.services.admission import AdmissionController, AdmissionError
+
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.2)
+    first = await controller.admit("session-a")
+
+    # One generation per session
+    with pytest.raises(AdmissionError) as busy:
+        await controller.admit("session-a")
+    assert busy.value.status_code == 429 and busy.value.retry_after >= 1
+
+    # A second session queues, a third is turned away while the queue is full
+    waiting = asyncio.create_task(controller.admit("session-b"))
+    await asyncio.sleep(0)
+    assert controller.queued == 1
+    with pytest.raises(AdmissionError) as full:
+        await controller.admit("session-c")
+    assert full.value.status_code == 503
+
+    # Releasing hands the slot to the queued generation
+    first.release()
+    second = await waiting
+    assert controller.in_flight == 1 and controller.queued == 0
+
+    # A queued generation gives up after the deadline
+    with pytest.raises(AdmissionError) as timeout:
+        await controller.admit("session-c")
+    assert timeout.value.status_code == 503 and controller.queued == 0
+
+    second.release()
+    second.release()
+    assert controller.in_flight == 0
+    async with await controller.admit("session-a"):
+        assert controller.in_flight == 1
+    assert controller.in_flight == 0
@@ -0,0 +1,117 @@
+import pytest
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from sqlalchemy import select
+from stub_server import StubServer
+
+
+def _stubbed(connector, server):
+    """Point a connector at the stub server, keeping the API path of the real portal"""
+    connector.base_url = server.url + urlparse(connector.base_url).path
+    return connector
+
+
+@pytest.fixture
+def stub_connectors():
+    from app.connectors import JabarConnector, BandungConnector, BpsConnector, BadanPanganConnector
+
+    servers = {
+        "jabar": StubServer.from_fixture("connectors/jabar.json"),
+        "bandung": StubServer.from_fixture("connectors/bandung.json"),
+        "bps": StubServer.from_fixture("connectors/bps.json"),
+        "badan_pangan": StubServer.from_fixture("connectors/badan_pangan.json"),
+    }
+    for server in servers.values():
+        server.__enter__()
+
+    jabar = JabarConnector()
+    jabar.page_size = 2  # the recorded Jabar pages hold two datasets
+    connectors = [
+        _stubbed(jabar, servers["jabar"]),
+        _stubbed(BandungConnector(), servers["bandung"]),
+        _stubbed(BpsConnector(api_key="test-key", domain="0000"), servers["bps"]),
+        _stubbed(BadanPanganConnector(), servers["badan_pangan"]),
+    ]
+    yield connectors, servers
+
+    for server in servers.values():
+        server.__exit__(None, None, None)
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """Deterministic embeddings instead of the Gemini API; records the embedded texts"""
+    import app.services.ingestion_pipeline as pipeline
+
+    embedded = []
+
+    async def get_embeddings(texts, model=None):
+        embedded.extend(texts)
+        return [[float(len(text) % 7)] * 768 for text in texts]
+
+    monkeypatch.setattr(pipeline, "get_embeddings", get_embeddings)
+    return embedded
+
+
+def test_connectors_normalize_recorded_records():
+    import json
+    from stub_server import FIXTURES_DIR
+    from app.connectors import JabarConnector, BpsConnector, BadanPanganConnector, get_connectors
+
+    jabar_record = json.loads((FIXTURES_DIR / "connectors/jabar.json").read_text())[0]["body"]["data"][0]
+    data = JabarConnector().normalize(jabar_record)
+    assert data["url"] == "https://data.jabarprov.go.id/api-backend/bigdata/disdukcapil/jumlah_penduduk_berdasarkan_jenis_kelamin?download=csv"
+    assert data["slug"] == "jabarprov_jumlah-penduduk-berdasarkan-jenis-kelamin-di-jawa-barat"
+    assert data["source_at"] == datetime(2025, 3, 10, 8, 15, tzinfo=timezone.utc)
+    assert "<p>" not in data["description"]
+
+    bps_record = json.loads((FIXTURES_DIR / "connectors/bps.json").read_text())[0]["body"]["data"][1][0]
+    data = BpsConnector(api_key="test-key").normalize(bps_record)
+    assert data["url"] is None  # Excel only, no CSV
+    assert data["original_source"] == "bps.go.id"
+    # Nothing to write from BPS, so it is only synced when named
+    assert "bps" not in [connector.name for connector in get_connectors()]
+    assert [connector.name for connector in get_connectors(["bps"])] == ["bps"]
+
+    pangan_records = json.loads((FIXTURES_DIR / "connectors/badan_pangan.json").read_text())[0]["body"]["data"]
+    connector = BadanPanganConnector()
+    assert connector.csv_url(pangan_records[0]) == "https://satudata.badanpangan.go.id/download/document/dataset/44/1728615152.csv/csv"
+    assert connector.csv_url(pangan_records[1]) is None  # PDF publication
+
+
+@pytest.mark.asyncio
+async def test_run_ingestion_syncs_all_connectors(db_session, stub_connectors, session_factory, fake_embeddings):
+    """Every portal is fetched in parallel into the shared pipeline, with its own run and watermark."""
+    from app.models.db import DatasetCatalog, IngestionRun
+    from app.services.ingestion import get_watermark
+    from app.services.ingestion_pipeline import run_ingestion
+
+    connectors, _ = stub_connectors
+    stats = await run_ingestion(connectors, session_factory=session_factory, embed_workers=2, batch_size=3)
+
+    assert {source: (s.inserted, s.skipped_no_url) for source, s in stats.items()} == {
+        "opendata.jabarprov.go.id": (4, 1),
+        "opendata.bandung.go.id": (1, 0),
+        "bps.go.id": (0, 2),
+        "satudata.badanpangan.go.id": (1, 1),
+    }
+
+    slugs = set((await db_session.execute(select(DatasetCatalog.slug))).scalars())
+    assert "bandung_jumlah-capaian-penanganan-sampah-di-kota-bandung" in slugs
+    assert "badanpangan_817" in slugs
+    assert len(slugs) == 6
+
+    runs = (await db_session.execute(select(IngestionRun.source, IngestionRun.status))).all()
+    assert sorted(runs) == sorted((source, "completed") for source in stats)
+    assert await get_watermark(db_session, "opendata.jabarprov.go.id") == datetime(2025, 3, 10, 8, 15, tzinfo=timezone.utc)
+
+    # The second sync stops at the Jabar watermark and re-embeds nothing
+    fake_embeddings.clear()
+    stats = await run_ingestion(connectors, session_factory=session_factory, embed_workers=2, batch_size=3)
+
+    assert fake_embeddings == []
+    assert stats["opendata.jabarprov.go.id"].pages == 1
+    assert stats["opendata.jabarprov.go.id"].fetched == 1
+    # BPS lists are not sorted by update date: every page is read, older tables are filtered out
+    assert stats["bps.go.id"].fetched == 1
+    assert stats["bps.go.id"].skipped_no_url == 1
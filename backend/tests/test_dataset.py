@@ -0,0 +1,245 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from app.utils.uuid_helper import uuid7
+
+
+async def _add_datasets(db_session, count, source_at=None, slug_prefix="dataset"):
+    """Insert `count` catalog rows, all sharing `source_at` when given."""
+    from app.models.db import DatasetCatalog
+
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        db_session.add(DatasetCatalog(
+            id=uuid7(),
+            title=f"Dataset {i}",
+            description=f"Deskripsi dataset {i}",
+            url=f"https://example.com/{i}.csv",
+            direct_source="opendata.jabarprov.go.id",
+            original_source="opendata.jabarprov.go.id",
+            source_at=source_at or base + timedelta(days=i),
+            slug=f"{slug_prefix}_{i}",
+        ))
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_list_datasets_pages_with_cursor(test_client, db_session):
+    """Walking the cursor visits every dataset exactly once, newest first."""
+    await _add_datasets(db_session, 7)
+
+    seen = []
+    after = None
+    while True:
+        params = {"limit": 3}
+        if after:
+            params["after"] = after
+        response = await test_client.get("/dataset", params=params)
+        assert response.status_code == 200
+        body = response.json()
+        seen.extend(item["title"] for item in body["data"])
+        after = body["metadata"]["after"]
+        if not after:
+            break
+
+    assert seen == [f"Dataset {i}" for i in range(6, -1, -1)]
+
+
+@pytest.mark.asyncio
+async def test_list_datasets_cursor_breaks_ties_on_id(test_client, db_session):
+    """Rows with the same source_at are still paged without gaps or repeats."""
+    await _add_datasets(db_session, 5, source_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    first = (await test_client.get("/dataset", params={"limit": 2})).json()
+    second = (await test_client.get("/dataset", params={"limit": 10, "after": first["metadata"]["after"]})).json()
+
+    ids = [item["id"] for item in first["data"] + second["data"]]
+    assert len(ids) == 5
+    assert len(set(ids)) == 5
+
+
+@pytest.mark.asyncio
+async def test_list_datasets_rejects_tampered_cursor(test_client, db_session):
+    await _add_datasets(db_session, 3)
+
+    first = (await test_client.get("/dataset", params={"limit": 1})).json()
+    payload, signature = first["metadata"]["after"].split(".")
+
+    response = await test_client.get("/dataset", params={"after": payload + "." + signature[::-1]})
+    assert response.status_code == 400
+
+    response = await test_client.get("/dataset", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_datasets_ranks_and_highlights(test_client, db_session):
+    """Keyword search matches word prefixes, prefers title hits and returns snippets."""
+    from app.models.db import DatasetCatalog
+
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        ("Jumlah Penduduk Jawa Barat", "Data kependudukan per kabupaten", "penduduk"),
+        ("Capaian Penanganan Sampah", "Jumlah sampah yang ditangani per bulan", "sampah_title"),
+        ("Anggaran Daerah", "Termasuk <b>anggaran</b> pengelolaan sampah & limbah kota", "sampah_desc"),
+    ]
+    for i, (title, description, slug) in enumerate(rows):
+        db_session.add(DatasetCatalog(
+            id=uuid7(),
+            title=title,
+            description=description,
+            url=f"https://example.com/{slug}.csv",
+            direct_source="opendata.jabarprov.go.id",
+            original_source="opendata.jabarprov.go.id",
+            source_at=base + timedelta(days=i),
+            slug=slug,
+        ))
+    await db_session.commit()
+
+    response = await test_client.get("/dataset", params={"search": "samp"})
+    assert response.status_code == 200
+    data = response.json()["data"]
+
+    assert [item["slug"] for item in data] == ["sampah_title", "sampah_desc"]
+    assert "<mark>" in data[0]["snippet"]
+    # Markup of the description itself is escaped, only the highlights are tags
+    assert data[1]["snippet"] == "Termasuk &lt;b&gt;anggaran&lt;/b&gt; pengelolaan <mark>sampah</mark> &amp; limbah kota"
+
+
+@pytest.mark.asyncio
+async def test_search_datasets_pages_ranked_results(test_client, db_session):
+    await _add_datasets(db_session, 5)
+
+    first = (await test_client.get("/dataset", params={"search": "deskripsi", "limit": 2})).json()
+    assert len(first["data"]) == 2
+
+    after = first["metadata"]["after"]
+    second = (await test_client.get("/dataset", params={"search": "deskripsi", "limit": 10, "after": after})).json()
+    ids = [item["id"] for item in first["data"] + second["data"]]
+    assert len(set(ids)) == 5
+
+    # A ranked cursor cannot be reused for the plain listing
+    response = await test_client.get("/dataset", params={"after": after})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_dataset_facets_and_filters(test_client, db_session):
+    """Facet counts come from the summary table and refresh incrementally."""
+    from app.models.db import DatasetCatalog
+    from app.services.catalog_facets import refresh_catalog_facets, collect_facet_values
+
+    rows = [
+        ("bps.go.id", "opendata.jabarprov.go.id", datetime(2023, 5, 1, tzinfo=timezone.utc)),
+        ("bps.go.id", "opendata.jabarprov.go.id", datetime(2024, 5, 1, tzinfo=timezone.utc)),
+        ("opendata.jabarprov.go.id", "opendata.jabarprov.go.id", datetime(2024, 6, 1, tzinfo=timezone.utc)),
+    ]
+    for i, (original_source, direct_source, source_at) in enumerate(rows):
+        db_session.add(DatasetCatalog(
+            id=uuid7(),
+            title=f"Dataset {i}",
+            description="Deskripsi",
+            url=f"https://example.com/{i}.csv",
+            direct_source=direct_source,
+            original_source=original_source,
+            source_at=source_at,
+            slug=f"dataset_{i}",
+        ))
+    await db_session.commit()
+    await refresh_catalog_facets(db_session)
+
+    facets = (await test_client.get("/dataset/facets")).json()["data"]
+    assert facets["original_source"] == [
+        {"value": "bps.go.id", "count": 2},
+        {"value": "opendata.jabarprov.go.id", "count": 1},
+    ]
+    assert facets["direct_source"] == [{"value": "opendata.jabarprov.go.id", "count": 3}]
+    assert facets["year"] == [{"value": "2024", "count": 2}, {"value": "2023", "count": 1}]
+
+    # Incremental refresh only recounts the touched values
+    new_row = {
+        "original_source": "bps.go.id",
+        "direct_source": "opendata.jabarprov.go.id",
+        "source_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+    }
+    db_session.add(DatasetCatalog(
+        id=uuid7(), title="Dataset baru", description="Deskripsi", url="https://example.com/new.csv",
+        slug="dataset_new", **new_row,
+    ))
+    await db_session.commit()
+    await refresh_catalog_facets(db_session, collect_facet_values([new_row]))
+
+    facets = (await test_client.get("/dataset/facets")).json()["data"]
+    assert facets["original_source"][0] == {"value": "bps.go.id", "count": 3}
+    assert facets["year"][0] == {"value": "2025", "count": 1}
+
+    response = await test_client.get("/dataset", params={"original_source": "bps.go.id", "year": 2024})
+    assert [item["title"] for item in response.json()["data"]] == ["Dataset 1"]
+
+
+@pytest.mark.asyncio
+async def test_list_datasets_cached_until_catalog_version_bump(test_client, db_session):
+    """Cached listings are served with ETags until ingestion bumps the catalog version."""
+    from app.services.catalog_cache import bump_catalog_version, reset_catalog_cache
+
+    await _add_datasets(db_session, 2)
+    first = await test_client.get("/dataset")
+    etag = first.headers["etag"]
+    assert "max-age" in first.headers["cache-control"]
+    assert len(first.json()["data"]) == 2
+
+    # Conditional request for an unchanged catalog
+    response = await test_client.get("/dataset", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Without a version bump, new rows are not visible yet
+    await _add_datasets(db_session, 1, source_at=datetime(2030, 1, 1, tzinfo=timezone.utc), slug_prefix="new")
+    assert len((await test_client.get("/dataset")).json()["data"]) == 2
+
+    await bump_catalog_version(db_session)
+    reset_catalog_cache()  # skip the version TTL
+
+    response = await test_client.get("/dataset", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()["data"]) == 3
+
+
+def test_response_cache_is_bounded_by_bytes():
+    """The least recently used responses are dropped once the cache holds too many bytes."""
+    from app.services.catalog_cache import ResponseCache
+
+    cache = ResponseCache(max_entries=100, max_bytes=1000, sizeof=len)
+    for key in "abcd":
+        cache.set(key, 1, b"x" * 299)
+    # a, the least recently used, made room for d
+    assert cache.get("a", 1) is None and cache.get("b", 1) is not None
+    assert cache.size <= 1000 and len(cache) == 3
+
+    # Replacing an entry does not count it twice, a value over the budget is not cached
+    cache.set("b", 1, b"y" * 299)
+    assert cache.size == 900
+    assert cache.set("big", 1, b"z" * 2000) == b"z" * 2000
+    assert cache.get("big", 1) is None and len(cache) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_dataset_redirect_is_cacheable(test_client, db_session):
+    from app.models.db import DatasetCatalog
+
+    db_session.add(DatasetCatalog(
+        id=uuid7(), title="CORS dataset", description="Deskripsi", url="https://example.com/cors.csv",
+        direct_source="bps.go.id", original_source="bps.go.id",
+        source_at=datetime(2024, 1, 1, tzinfo=timezone.utc), slug="cors_dataset", is_cors_allowed=True,
+    ))
+    await db_session.commit()
+
+    response = await test_client.get("/dataset/cors_dataset")
+    assert response.status_code == 307
+    assert response.headers["location"] == "https://example.com/cors.csv"
+
+    response = await test_client.get("/dataset/cors_dataset", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+    response = await test_client.get("/dataset/missing_dataset")
+    assert response.status_code == 404
+
@@ -0,0 +1,603 @@
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from app.utils.uuid_helper import uuid7
+
+LLM_RESPONSE = "Menjumlahkan sampah per tahun\n==============\nSELECT tahun, SUM(jumlah_sampah) FROM sampah GROUP BY tahun;"
+
+
+class FakeLLM:
+    """Stands in for ChatLiteLLM: streams its response (LLM_RESPONSE by default) in small chunks"""
+
+    def __init__(self, response=LLM_RESPONSE):
+        self.response = response
+        self.calls = 0
+
+    async def astream(self, messages):
+        self.calls += 1
+        for start in range(0, len(self.response), 16):
+            yield SimpleNamespace(content=self.response[start:start + 16], usage_metadata=None)
+
+
+@pytest_asyncio.fixture
+async def generation(db_session, test_client, monkeypatch):
+    """A chat session and one dataset, with embeddings and the LLM faked."""
+    from app.models.db import DatasetCatalog
+    import app.services.llm as llm
+    import app.services.rag_dataset as rag_dataset
+    from app.services.llm_router import LLMRouter
+    import app.services.rag_sql as rag_sql
+
+    async def fake_embedding(text, model=None):
+        return [0.1] * 768
+
+    monkeypatch.setattr(rag_dataset, "get_embedding", fake_embedding)
+    monkeypatch.setattr(rag_sql, "get_embedding", fake_embedding)
+    monkeypatch.setattr(llm, "router", LLMRouter([("fake", FakeLLM())]))
+
+    db_session.add(DatasetCatalog(
+        id=uuid7(), title="Jumlah sampah", description="Jumlah sampah per tahun",
+        url="https://example.com/sampah.csv", direct_source="opendata.bandung.go.id",
+        original_source="opendata.bandung.go.id", source_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        slug="bandung_sampah", embedding=[0.1] * 768,
+    ))
+    await db_session.commit()
+
+    response = await test_client.post("/start-session")
+    return SimpleNamespace(session_id=response.json()["session_id"], client=test_client)
+
+
+def _events(body):
+    """(event, payload) of every server-sent event in a response body, comments skipped"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if not line.startswith(":"))
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def _events_with_ids(body):
+    """(id, event, payload) of every server-sent event in a response body"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if not line.startswith(":"))
+        if fields:
+            events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def _server_timing(response):
+    return {entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")}
+
+
+@pytest.mark.asyncio
+async def test_generate_sql_reports_stage_timings(generation):
+    from prometheus_client import REGISTRY
+
+    pool_waits = REGISTRY.get_sample_value("db_pool_wait_seconds_count")
+    response = await generation.client.post(
+        "/generate-sql", json={"session_id": generation.session_id, "question": "Total sampah per tahun?"}
+    )
+    assert response.status_code == 200
+    assert response.json()["sql"] == LLM_RESPONSE
+    assert {"session", "history", "embedding", "vector_search", "save_message", "llm", "total"} <= _server_timing(response)
+
+    metrics = (await generation.client.get("/metrics")).text
+    assert 'generate_sql_stage_seconds_count{endpoint="generate_sql",stage="llm"}' in metrics
+    # One connection wait per transaction of the request
+    assert REGISTRY.get_sample_value("db_pool_wait_seconds_count") > pool_waits
+
+
+@pytest.mark.asyncio
+async def test_generate_sql_stream_reports_stage_timings(generation):
+    response = await generation.client.post(
+        "/generate-sql-stream", json={"session_id": generation.session_id, "question": "Total sampah per tahun?"}
+    )
+    assert response.status_code == 200
+    events = _events(response.text)
+    assert [event for event, _ in events][0] == "meta" and events[-1][0] == "done"
+    assert events[0][1]["datasets_used"][0]["slug"] == "bandung_sampah"
+    # Deltas are split on the separator server-side and add up to the final answer
+    explanation, sql = LLM_RESPONSE.split("\n==============\n")
+    assert "".join(data["text"] for event, data in events if event == "explanation").strip() == explanation
+    assert "".join(data["text"] for event, data in events if event == "sql").strip() == sql
+    assert events[-1][1]["explanation"] == explanation and events[-1][1]["sql"] == sql
+    # Stages before the first byte are in the header, the LLM only in the metrics
+    assert {"session", "history", "embedding", "vector_search", "save_message"} <= _server_timing(response)
+
+    metrics = (await generation.client.get("/metrics")).text
+    assert 'generate_sql_stage_seconds_count{endpoint="generate_sql_stream",stage="llm"}' in metrics
+    assert "llm_time_to_first_token_seconds_count" in metrics
+    assert "llm_stream_tokens_per_second_count" in metrics
+
+
+@pytest.mark.asyncio
+async def test_cascade_escalates_only_invalid_drafts(generation, monkeypatch):
+    """A fast model's draft is used when it passes the checks, the strong model answers otherwise."""
+    from prometheus_client import REGISTRY
+    import app.services.llm as llm
+    from app.services.llm_router import LLMRouter
+
+    valid = (
+        "Menjumlahkan sampah per tahun\n==============\n"
+        "CREATE TABLE IF NOT EXISTS sampah AS SELECT * FROM read_csv('http://localhost:8000/dataset/bandung_sampah');\n"
+        "SELECT tahun, SUM(jumlah_sampah) FROM sampah GROUP BY tahun;"
+    )
+    strong = FakeLLM()
+    monkeypatch.setattr(llm, "router", LLMRouter([("strong", strong)]))
+
+    def drafts(outcome):
+        return REGISTRY.get_sample_value("llm_cascade_drafts_total", {"outcome": outcome}) or 0
+
+    for draft, outcome, expected, strong_calls in [
+        (valid, "accepted", valid, 0),
+        ("SELECT tahun FROM sampah;", "no_separator", LLM_RESPONSE, 1),
+    ]:
+        monkeypatch.setattr(llm, "cascade_router", LLMRouter([("fast", FakeLLM(draft))]))
+        before = drafts(outcome)
+        response = await generation.client.post(
+            "/generate-sql", json={"session_id": generation.session_id, "question": "Total sampah per tahun?"}
+        )
+        assert response.json()["sql"] == expected
+        assert strong.calls == strong_calls
+        assert drafts(outcome) == before + 1
+
+
+class SlowStreamLLM(FakeLLM):
+    """Streams LLM_RESPONSE slowly and remembers whether its stream was closed"""
+
+    def __init__(self):
+        super().__init__()
+        self.closed = False
+
+    async def astream(self, messages):
+        self.calls += 1
+        try:
+            for start in range(0, len(LLM_RESPONSE), 16):
+                yield SimpleNamespace(content=LLM_RESPONSE[start:start + 16], usage_metadata=None)
+                await asyncio.sleep(0.05)
+        finally:
+            self.closed = True
+
+
+async def _generations_finished():
+    from app.services.generations import generations
+
+    running = [generation.task for generation in generations.values() if not generation.task.done()]
+    await asyncio.gather(*running, return_exceptions=True)
+
+
+async def _disconnect_after_first_text(path, body):
+    """Call the app directly, closing the connection once the first text event arrives"""
+    from main import app
+
+    first_chunk = asyncio.Event()
+    request_sent = False
+    chunks = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+        await first_chunk.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append(message["body"].decode())
+            if "event: explanation" in chunks[-1]:
+                first_chunk.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"test")],
+        "server": ("test", 80), "client": ("test", 1234), "root_path": "",
+    }
+    await app(scope, receive, send)
+    return chunks
+
+
+@pytest.mark.asyncio
+async def test_stream_disconnect_cancels_generation(generation, db_session, monkeypatch):
+    """A client that disconnects and does not come back stops the LLM stream; the partial answer is kept, flagged as truncated."""
+    from prometheus_client import REGISTRY
+    from sqlalchemy import select
+    from app.models.db import ChatMessage
+    import app.services.generations as generations
+    import app.services.llm as llm
+    from app.services.llm_router import LLMRouter
+
+    slow_llm = SlowStreamLLM()
+    monkeypatch.setattr(llm, "router", LLMRouter([("fake", slow_llm)]))
+    monkeypatch.setattr(generations, "GENERATION_RESUME_GRACE", 0)
+    cancelled = REGISTRY.get_sample_value("llm_generations_cancelled_total", {"endpoint": "generate_sql_stream"}) or 0
+
+    chunks = await _disconnect_after_first_text(
+        "/generate-sql-stream", {"session_id": generation.session_id, "question": "Total sampah per tahun?"}
+    )
+    assert chunks and not any("event: done" in chunk for chunk in chunks)
+    await _generations_finished()
+    assert slow_llm.closed
+    assert REGISTRY.get_sample_value("llm_generations_cancelled_total", {"endpoint": "generate_sql_stream"}) == cancelled + 1
+
+    result = await db_session.execute(
+        select(ChatMessage.role, ChatMessage.content, ChatMessage.truncated).order_by(ChatMessage.created_at)
+    )
+    (_, question, _), (role, content, truncated) = result.all()
+    assert role == "assistant" and truncated
+    assert content and LLM_RESPONSE.startswith(content) and content != LLM_RESPONSE
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_from_last_event_id(generation, db_session, monkeypatch):
+    """A client reconnecting with Last-Event-ID gets the missed events of the running generation, not a new one."""
+    from sqlalchemy import select
+    from app.models.db import ChatMessage
+    import app.services.llm as llm
+    from app.services.llm_router import LLMRouter
+
+    slow_llm = SlowStreamLLM()
+    monkeypatch.setattr(llm, "router", LLMRouter([("fake", slow_llm)]))
+    body = {"session_id": generation.session_id, "question": "Total sampah per tahun?"}
+
+    first = _events_with_ids("".join(await _disconnect_after_first_text("/generate-sql-stream", body)))
+    last_event_id = first[-1][0]
+    response = await generation.client.post("/generate-sql-stream", json=body, headers={"Last-Event-ID": last_event_id})
+    assert response.status_code == 200
+    resumed = _events_with_ids(response.text)
+    await _generations_finished()
+
+    # Carries on right after the last event received, and ends with the whole answer
+    generation_id, seq = last_event_id.rsplit(":", 1)
+    assert resumed[0][0] == f"{generation_id}:{int(seq) + 1}"
+    assert resumed[-1][1] == "done"
+    text = "".join(data["text"] for _, event, data in first + resumed if event in ("explanation", "sql"))
+    assert text.split() == LLM_RESPONSE.replace("==============", "").split()
+
+    # One LLM call and one assistant message, complete
+    result = await db_session.execute(select(ChatMessage.role, ChatMessage.truncated).order_by(ChatMessage.created_at))
+    assert result.all() == [("user", False), ("assistant", False)]
+
+    # Unknown or expired generations cannot be resumed
+    response = await generation.client.post(
+        "/generate-sql-stream", json=body, headers={"Last-Event-ID": "0190d5d0-0000-7000-8000-000000000000:3"}
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_generation_rejected_while_session_busy(generation):
+    """A second generation for a session that already has one running gets a fast 429."""
+    from uuid import UUID
+    from app.services.admission import llm_admission
+
+    admission = await llm_admission.admit(UUID(generation.session_id))
+    try:
+        for path in ("/generate-sql", "/generate-sql-stream"):
+            response = await generation.client.post(
+                path, json={"session_id": generation.session_id, "question": "Total sampah per tahun?"}
+            )
+            assert response.status_code == 429
+            assert int(response.headers["retry-after"]) >= 1
+    finally:
+        admission.release()
+
+    response = await generation.client.post(
+        "/generate-sql", json={"session_id": generation.session_id, "question": "Total sampah per tahun?"}
+    )
+    assert response.status_code == 200
+    assert llm_admission.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_invalid_sql_gets_one_repair_round(generation, monkeypatch):
+    """With validation on, an answer failing the checks is sent back to the LLM with the error once."""
+    from prometheus_client import REGISTRY
+    import app.services.llm as llm
+    from app.services.llm_router import LLMRouter
+
+    repaired = (
+        "Menjumlahkan sampah per tahun\n==============\n"
+        "CREATE TABLE IF NOT EXISTS sampah AS SELECT * FROM read_csv('http://localhost:8000/dataset/bandung_sampah');\n"
+        "SELECT tahun, SUM(jumlah_sampah) FROM sampah GROUP BY tahun;"
+    )
+
+    class RepairingLLM(FakeLLM):
+        def __init__(self):
+            super().__init__()
+            self.prompts = []
+
+        async def astream(self, messages):
+            self.prompts.append(messages[-1].content)
+            self.response = LLM_RESPONSE if len(self.prompts) == 1 else repaired
+            async for chunk in super().astream(messages):
+                yield chunk
+
+    model = RepairingLLM()
+    monkeypatch.setattr(llm, "router", LLMRouter([("fake", model)]))
+    monkeypatch.setattr(llm, "SQL_VALIDATION", "parse")
+    repairs = REGISTRY.get_sample_value(
+        "generated_sql_validations_total", {"reason": "unknown_table", "outcome": "repaired"}
+    ) or 0
+
+    response = await generation.client.post(
+        "/generate-sql-stream", json={"session_id": generation.session_id, "question": "Total sampah per tahun?"}
+    )
+    assert response.status_code == 200
+    assert len(model.prompts) == 2 and "sampah is queried but never created" in model.prompts[1]
+    assert "read_csv" in response.text
+    assert REGISTRY.get_sample_value(
+        "generated_sql_validations_total", {"reason": "unknown_table", "outcome": "repaired"}
+    ) == repairs + 1
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_deduplicates_generations(generation, db_session, monkeypatch):
+    """Requests repeating an Idempotency-Key share one generation, whether they overlap it or come after it."""
+    from sqlalchemy import select
+    from app.models.db import ChatMessage
+    import app.services.llm as llm
+    from app.services.llm_router import LLMRouter
+
+    for path, key in (("/generate-sql", "double-click"), ("/generate-sql-stream", "double-click-stream")):
+        slow_llm = SlowStreamLLM()
+        monkeypatch.setattr(llm, "router", LLMRouter([("fake", slow_llm)]))
+        body = {"session_id": generation.session_id, "question": f"Total sampah per tahun? {path}"}
+
+        def send(question=body["question"]):
+            return generation.client.post(path, json={**body, "question": question}, headers={"Idempotency-Key": key})
+
+        # The overlapping duplicate is not turned away as the session being busy
+        first, duplicate = await asyncio.gather(send(), send())
+        await _generations_finished()
+        retry = await send()
+        responses = [first, duplicate, retry]
+        assert [response.status_code for response in responses] == [200, 200, 200]
+        assert sorted(response.headers.get("idempotent-replayed", "") for response in responses) == ["", "true", "true"]
+        assert first.text == duplicate.text
+        if path == "/generate-sql":
+            assert retry.text == first.text
+        else:
+            # A finished generation keeps only meta and the final event, which has the whole answer
+            first_events = _events(first.text)
+            assert _events(retry.text) == [first_events[0], first_events[-1]]
+        assert slow_llm.calls == 1
+
+        # A key belongs to one question
+        response = await send("Rata-rata sampah per tahun?")
+        assert response.status_code == 422
+
+    result = await db_session.execute(select(ChatMessage.role).order_by(ChatMessage.created_at))
+    assert result.scalars().all() == ["user", "assistant"] * 2
+
+
+@pytest.mark.asyncio
+async def test_failed_generation_is_not_replayed(generation, monkeypatch):
+    """A generation that failed is not kept for its Idempotency-Key, the retry generates again."""
+    import app.services.llm as llm
+    from app.services.llm_router import LLMRouter
+
+    broken = SimpleNamespace(astream=lambda messages: FakeLLM(response="").astream(messages))
+    monkeypatch.setattr(llm, "router", LLMRouter([("broken", broken)]))
+    body = {"session_id": generation.session_id, "question": "Total sampah per tahun?"}
+    headers = {"Idempotency-Key": "retry-after-error"}
+
+    response = await generation.client.post("/generate-sql", json=body, headers=headers)
+    assert response.status_code == 500
+
+    monkeypatch.setattr(llm, "router", LLMRouter([("fake", FakeLLM())]))
+    response = await generation.client.post("/generate-sql", json=body, headers=headers)
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+    assert response.json()["sql"].startswith("Menjumlahkan sampah")
+
+
+@pytest.mark.asyncio
+async def test_generate_sql_batch_streams_ndjson(generation, db_session, monkeypatch):
+    """A batch is retrieved in one go, answered with bounded concurrency and streamed back line by line, without a session."""
+    from sqlalchemy import func, select
+    from app.models.db import ChatMessage, DatasetCatalog
+    import app.services.batch_generation as batch_generation
+    import app.services.llm as llm
+    from app.services.llm_router import LLMRouter
+
+    class CountingLLM(FakeLLM):
+        def __init__(self):
+            super().__init__()
+            self.running = self.peak = 0
+
+        async def astream(self, messages):
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            try:
+                await asyncio.sleep(0.05)
+                async for chunk in super().astream(messages):
+                    yield chunk
+            finally:
+                self.running -= 1
+
+    embedded = []
+
+    async def fake_embeddings(texts, model=None):
+        embedded.append(list(texts))
+        return [None if "gagal" in text else [0.1] * 768 for text in texts]
+
+    model = CountingLLM()
+    monkeypatch.setattr(llm, "router", LLMRouter([("fake", model)]))
+    monkeypatch.setattr(batch_generation, "get_embeddings", fake_embeddings)
+    db_session.add(DatasetCatalog(
+        id=uuid7(), title="Jumlah penduduk", description="Jumlah penduduk per kecamatan",
+        url="https://example.com/penduduk.csv", direct_source="opendata.bandung.go.id",
+        original_source="opendata.bandung.go.id", source_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        slug="bandung_penduduk", embedding=[-0.1] * 768,
+    ))
+    await db_session.commit()
+    questions = [f"Total sampah tahun {year}?" for year in range(2019, 2025)] + ["Pertanyaan gagal"]
+
+    response = await generation.client.post("/generate-sql/batch", json={"questions": questions})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+
+    # One embedding call for the whole batch, every question answered once
+    assert embedded == [questions]
+    assert sorted(result["index"] for result in results) == list(range(len(questions)))
+    explanation, sql = LLM_RESPONSE.split("\n==============\n")
+    for result in results:
+        assert result["question"] == questions[result["index"]]
+        if result["question"] == "Pertanyaan gagal":
+            assert result["error"] and result["sql"] is None
+        else:
+            assert result["error"] is None
+            assert (result["explanation"], result["sql"]) == (explanation, sql)
+            # Nearest dataset first
+            assert [dataset["slug"] for dataset in result["datasets_used"]] == ["bandung_sampah", "bandung_penduduk"]
+    assert model.calls == len(questions) - 1
+    assert 1 < model.peak <= batch_generation.GENERATE_BATCH_CONCURRENCY
+
+    # Nothing is saved to chat history
+    assert await db_session.scalar(select(func.count()).select_from(ChatMessage)) == 0
+
+    response = await generation.client.post("/generate-sql/batch", json={"questions": []})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_generate_sql_batch_goes_through_admission(generation, monkeypatch):
+    """Batch LLM calls share the generation slots, and a full queue rejects the batch up front."""
+    import app.routes.generate_sql as generate_sql_route
+    import app.services.batch_generation as batch_generation
+    import app.services.llm as llm
+    from app.services.admission import AdmissionController
+    from app.services.llm_router import LLMRouter
+
+    class SlowLLM(FakeLLM):
+        def __init__(self):
+            super().__init__()
+            self.running = self.peak = 0
+
+        async def astream(self, messages):
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            try:
+                await asyncio.sleep(0.02)
+                async for chunk in super().astream(messages):
+                    yield chunk
+            finally:
+                self.running -= 1
+
+    async def fake_embeddings(texts, model=None):
+        return [[0.1] * 768 for _ in texts]
+
+    model = SlowLLM()
+    admission = AdmissionController(max_concurrency=2, max_queue=8, queue_timeout=5)
+    monkeypatch.setattr(llm, "router", LLMRouter([("fake", model)]))
+    monkeypatch.setattr(batch_generation, "get_embeddings", fake_embeddings)
+    monkeypatch.setattr(batch_generation, "llm_admission", admission)
+    monkeypatch.setattr(generate_sql_route, "llm_admission", admission)
+
+    questions = [f"Total sampah tahun {year}?" for year in range(2019, 2025)]
+    response = await generation.client.post("/generate-sql/batch", json={"questions": questions})
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert all(result["error"] is None for result in results) and len(results) == len(questions)
+    assert model.peak == 2
+    assert admission.in_flight == 0
+
+    # Slots taken and the queue full: rejected like a single generation
+    held = [await admission.admit() for _ in range(2)]
+    admission.max_queue = 0
+    response = await generation.client.post("/generate-sql/batch", json={"questions": questions})
+    assert response.status_code == 503 and response.headers["retry-after"]
+    for slot in held:
+        slot.release()
+
+
+@pytest.mark.asyncio
+async def test_follow_up_reuses_conversation_datasets(generation, db_session, monkeypatch):
+    """Refinements reuse the datasets of the previous answer without embedding; new questions search again."""
+    from sqlalchemy import select
+    from app.models.db import ChatMessage, DatasetCatalog
+    import app.services.rag_dataset as rag_dataset
+    from app.services.rag_session import is_refinement
+
+    embedded = []
+
+    async def fake_embedding(text, model=None):
+        embedded.append(text)
+        return [0.1] * 768
+
+    monkeypatch.setattr(rag_dataset, "get_embedding", fake_embedding)
+
+    async def ask(question):
+        response = await generation.client.post(
+            "/generate-sql", json={"session_id": generation.session_id, "question": question}
+        )
+        assert response.status_code == 200
+        return response
+
+    first = await ask("Total sampah per tahun?")
+    dataset_ids = [dataset["id"] for dataset in first.json()["datasets_used"]]
+    assert embedded == ["Total sampah per tahun?"]
+    saved = await db_session.scalar(select(ChatMessage.dataset_ids).where(ChatMessage.role == "assistant"))
+    assert [str(dataset_id) for dataset_id in saved] == dataset_ids
+
+    # A refinement is answered with the same datasets, without embedding or vector search
+    db_session.add(DatasetCatalog(
+        id=uuid7(), title="Jumlah sampah 2", description="Jumlah sampah per kecamatan",
+        url="https://example.com/sampah2.csv", direct_source="opendata.bandung.go.id",
+        original_source="opendata.bandung.go.id", source_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        slug="bandung_sampah_kecamatan", embedding=[0.1] * 768,
+    ))
+    await db_session.commit()
+    refinement = await ask("Sekarang hanya tahun 2020, urutkan dari yang terbesar")
+    assert embedded == ["Total sampah per tahun?"]
+    assert [dataset["id"] for dataset in refinement.json()["datasets_used"]] == dataset_ids
+    assert refinement.json()["reference_queries_used"] == []
+    assert not {"embedding", "vector_search"} & _server_timing(refinement)
+
+    # A question about something else is searched again
+    other = await ask("Berapa jumlah penduduk per kecamatan?")
+    assert embedded[-1] == "Berapa jumlah penduduk per kecamatan?"
+    assert "vector_search" in _server_timing(other)
+
+    assert not is_refinement("Berapa jumlah penduduk per kecamatan di Bandung pada tahun 2020 dan 2021 serta 2022?", [], [])
+    assert not is_refinement("Bagaimana dengan penduduk?", [], [])
+
+
+@pytest.mark.asyncio
+async def test_boosted_datasets_outrank_slightly_closer_ones(generation, db_session, monkeypatch):
+    """Datasets already used in the conversation win over new ones that are only a little closer."""
+    from app.models.db import DatasetCatalog
+    import app.services.rag_dataset as rag_dataset
+
+    def vector(second):
+        return [1.0, second] + [0.0] * 766
+
+    async def fake_embedding(text, model=None):
+        return vector(0.4)
+
+    monkeypatch.setattr(rag_dataset, "get_embedding", fake_embedding)
+    sampah, penduduk = uuid7(), uuid7()
+    for dataset_id, slug, embedding in ((sampah, "sampah_baru", vector(0.0)), (penduduk, "penduduk", vector(0.3))):
+        db_session.add(DatasetCatalog(
+            id=dataset_id, title=slug, description=slug, url=f"https://example.com/{slug}.csv",
+            direct_source="opendata.bandung.go.id", original_source="opendata.bandung.go.id",
+            source_at=datetime(2024, 1, 1, tzinfo=timezone.utc), slug=slug, embedding=embedding,
+        ))
+    await db_session.commit()
+
+    nearest = await rag_dataset.get_relevant_datasets(db_session, "Jumlah penduduk?", limit=1)
+    assert [dataset.id for dataset in nearest] == [penduduk]
+    boosted = await rag_dataset.get_relevant_datasets(
+        db_session, "Jumlah penduduk?", limit=1, boost_ids=[sampah], boost=0.1
+    )
+    assert [dataset.id for dataset in boosted] == [sampah]
+    assert [dataset.id for dataset in await rag_dataset.get_datasets_by_id(db_session, [penduduk, uuid7(), sampah])] == [
+        penduduk, sampah
+    ]
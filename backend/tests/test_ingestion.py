@@ -0,0 +1,158 @@
+import pytest
+from datetime import datetime, timezone
+from app.utils.uuid_helper import uuid7
+
+
+@pytest.mark.asyncio
+async def test_upsert_datasets_inserts_then_updates(db_session):
+    from sqlalchemy import select
+    from app.models.db import DatasetCatalog
+    from app.services.ingestion import upsert_datasets, get_watermark, set_watermark
+
+    row = {
+        "id": uuid7(),
+        "title": "Versi lama",
+        "description": "Deskripsi",
+        "url": "https://example.com/a.csv",
+        "info_url": None,
+        "original_source": "opendata.jabarprov.go.id",
+        "direct_source": "opendata.jabarprov.go.id",
+        "slug": "jabarprov_a",
+        "is_cors_allowed": False,
+        "source_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "prompt_card": "Deskripsi",
+        "embedding": None,
+    }
+    written = await upsert_datasets(db_session, [row])
+    assert written == {"inserted": {"jabarprov_a"}, "updated": set()}
+
+    written = await upsert_datasets(db_session, [{**row, "id": uuid7(), "title": "Versi baru"}])
+    assert written == {"inserted": set(), "updated": {"jabarprov_a"}}
+
+    result = await db_session.execute(select(DatasetCatalog.id, DatasetCatalog.title))
+    assert result.all() == [(row["id"], "Versi baru")]
+
+    # Watermarks only move forward
+    assert await get_watermark(db_session, "opendata.jabarprov.go.id") is None
+    await set_watermark(db_session, "opendata.jabarprov.go.id", datetime(2024, 5, 1, tzinfo=timezone.utc))
+    await set_watermark(db_session, "opendata.jabarprov.go.id", datetime(2024, 3, 1, tzinfo=timezone.utc))
+    assert await get_watermark(db_session, "opendata.jabarprov.go.id") == datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_upsert_without_embedding_keeps_stored_embedding(db_session):
+    """Rows whose content hash is unchanged are written without re-embedding."""
+    from sqlalchemy import select
+    from app.models.db import DatasetCatalog
+    from app.services.ingestion import upsert_datasets, get_content_hashes
+    from app.utils.embedding import embedding_content_hash
+
+    content_hash = embedding_content_hash("Judul Deskripsi")
+    row = {
+        "id": uuid7(),
+        "title": "Judul",
+        "description": "Deskripsi",
+        "url": "https://example.com/a.csv",
+        "info_url": None,
+        "original_source": "opendata.jabarprov.go.id",
+        "direct_source": "opendata.jabarprov.go.id",
+        "slug": "jabarprov_a",
+        "is_cors_allowed": False,
+        "source_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "prompt_card": "Deskripsi",
+        "content_hash": content_hash,
+    }
+    await upsert_datasets(db_session, [{**row, "embedding": [0.5] * 768}])
+    assert await get_content_hashes(db_session, ["jabarprov_a", "unknown"]) == {"jabarprov_a": content_hash}
+
+    written = await upsert_datasets(db_session, [{**row, "id": uuid7(), "url": "https://example.com/b.csv"}])
+    assert written["updated"] == {"jabarprov_a"}
+
+    stored = (await db_session.execute(select(DatasetCatalog))).scalar_one()
+    assert stored.url == "https://example.com/b.csv"
+    assert list(await db_session.scalar(select(DatasetCatalog.embedding))) == [0.5] * 768
+
+    # A different embedding model invalidates the hash
+    assert embedding_content_hash("Judul Deskripsi") == content_hash
+    import app.utils.embedding as embedding_module
+    original_model = embedding_module.embedding_model
+    embedding_module.embedding_model = "models/text-embedding-004"
+    try:
+        assert embedding_content_hash("Judul Deskripsi") != content_hash
+    finally:
+        embedding_module.embedding_model = original_model
+
+
+@pytest.mark.asyncio
+async def test_ingestion_run_checkpoint_is_resumable(db_session):
+    from datetime import timedelta
+    from sqlalchemy import update, func
+    from app.models.db import IngestionRun
+    from app.services.ingestion import (
+        start_ingestion_run, get_resumable_run, update_ingestion_run, touch_ingestion_runs,
+    )
+
+    assert await get_resumable_run(db_session, "opendata.jabarprov.go.id") is None
+
+    run = await start_ingestion_run(db_session, "opendata.jabarprov.go.id", None)
+    await update_ingestion_run(db_session, run.id, next_page=12, counts={"inserted": 1200})
+
+    # A run still sending heartbeats belongs to a live process and is left alone
+    await touch_ingestion_runs(db_session, [run.id])
+    assert await get_resumable_run(db_session, "opendata.jabarprov.go.id") is None
+
+    # A run still marked running without a recent heartbeat (the process died) is picked up again
+    await db_session.execute(
+        update(IngestionRun).where(IngestionRun.id == run.id).values(updated_at=func.now() - timedelta(hours=1))
+    )
+    await db_session.commit()
+    resumable = await get_resumable_run(db_session, "opendata.jabarprov.go.id")
+    await db_session.refresh(resumable)
+    assert resumable.id == run.id
+    assert resumable.next_page == 12
+    assert resumable.counts == {"inserted": 1200}
+
+    # So is a failed one, however recent
+    await update_ingestion_run(db_session, run.id, status="failed")
+    assert (await get_resumable_run(db_session, "opendata.jabarprov.go.id")).id == run.id
+
+    await update_ingestion_run(db_session, run.id, status="completed")
+    assert await get_resumable_run(db_session, "opendata.jabarprov.go.id") is None
+
+
+@pytest.mark.asyncio
+async def test_facet_refresh_recounts_values_updated_rows_left(db_session):
+    """An updated row moves between facet buckets; the incremental refresh recounts both."""
+    import asyncio
+    from app.services.catalog_facets import collect_facet_values, get_catalog_facets, refresh_catalog_facets
+    from app.services.ingestion import upsert_datasets
+    from app.services.ingestion_pipeline import IngestStats, PageCheckpoint, SourceRun, write_batches
+
+    source = "opendata.jabarprov.go.id"
+    row = {
+        "id": uuid7(), "title": "Produksi padi", "description": "Produksi padi", "url": "https://example.com/a.csv",
+        "info_url": None, "original_source": "diskominfo.jabarprov.go.id", "direct_source": source,
+        "slug": "jabarprov_padi", "is_cors_allowed": False, "source_at": datetime(2023, 6, 1, tzinfo=timezone.utc),
+        "prompt_card": "Produksi padi", "embedding": None,
+    }
+    await upsert_datasets(db_session, [row])
+    await refresh_catalog_facets(db_session)
+
+    # The portal republishes the dataset under another agency, a year later
+    updated = {**row, "id": uuid7(), "original_source": "dtphbun.jabarprov.go.id",
+               "source_at": datetime(2024, 2, 1, tzinfo=timezone.utc)}
+    source_run = SourceRun(
+        connector=None, run_id=uuid7(), watermark=None, stats=IngestStats(), checkpoint=PageCheckpoint()
+    )
+    writes = asyncio.Queue()
+    writes.put_nowait(([updated], [(source, 0)]))
+    writes.put_nowait(None)
+    await write_batches(db_session, writes, {source: source_run}, embed_workers=1)
+    assert source_run.stats.updated == 1
+
+    await refresh_catalog_facets(
+        db_session, collect_facet_values(source_run.written_datasets + source_run.replaced_datasets)
+    )
+    facets = await get_catalog_facets(db_session)
+    assert [(item.value, item.count) for item in facets["year"]] == [("2024", 1)]
+    assert [(item.value, item.count) for item in facets["original_source"]] == [("dtphbun.jabarprov.go.id", 1)]
@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+
+
+class ScriptedModel:
+    """Chat model stand-in: waits `ttft` seconds, then streams `text` or raises `error`"""
+
+    def __init__(self, text="SELECT 1;", ttft=0.0, error=None):
+        self.text = text
+        self.ttft = ttft
+        self.error = error
+        self.calls = 0
+        self.closed = 0
+
+    async def astream(self, messages):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.ttft)
+            if self.error:
+                raise self.error
+            for word in self.text.split(" "):
+                yield SimpleNamespace(content=word + " ", usage_metadata=None)
+        finally:
+            self.closed += 1
+
+
+async def _complete(router):
+    models, text = set(), ""
+    async for model, chunk in router.stream([]):
+        models.add(model)
+        text += chunk.content
+    return models, text.strip()
+
+
+@pytest.mark.asyncio
+async def test_router_falls_back_on_error_and_slow_first_token():
+    from app.services.llm_router import LLMRouter, LLMUnavailableError
+
+    broken = ScriptedModel(error=RuntimeError("provider down"))
+    slow = ScriptedModel(ttft=5)
+    healthy = ScriptedModel(text="SELECT 2;")
+    router = LLMRouter([("broken", broken), ("slow", slow), ("healthy", healthy)], ttft_timeout=0.1)
+
+    assert await _complete(router) == ({"healthy"}, "SELECT 2;")
+    assert slow.closed == 1
+
+    router = LLMRouter([("broken", ScriptedModel(error=RuntimeError("down")))], ttft_timeout=0.1)
+    with pytest.raises(LLMUnavailableError):
+        await _complete(router)
+
+
+@pytest.mark.asyncio
+async def test_router_hedges_and_cancels_the_loser():
+    from app.services.llm_router import LLMRouter
+
+    primary = ScriptedModel(text="late", ttft=0.5)
+    backup = ScriptedModel(text="early")
+    router = LLMRouter([("primary", primary), ("backup", backup)], ttft_timeout=2, hedge_delay=0.05)
+
+    assert await _complete(router) == ({"backup"}, "early")
+    assert primary.calls == 1 and primary.closed == 1
+
+    # Without hedging the primary is simply waited for
+    primary = ScriptedModel(text="late", ttft=0.1)
+    router = LLMRouter([("primary", primary), ("backup", ScriptedModel())], ttft_timeout=2)
+    assert await _complete(router) == ({"primary"}, "late")
+
+
+@pytest.mark.asyncio
+async def test_router_circuit_breaker_skips_failing_model_until_cooldown():
+    from app.services.llm_router import LLMRouter
+
+    flaky = ScriptedModel(error=RuntimeError("overloaded"))
+    backup = ScriptedModel(text="backup")
+    router = LLMRouter(
+        [("flaky", flaky), ("backup", backup)], ttft_timeout=1, circuit_failures=2, circuit_cooldown=0.2
+    )
+
+    for _ in range(3):
+        assert await _complete(router) == ({"backup"}, "backup")
+    # Two failures open the circuit, the third call skips the model
+    assert flaky.calls == 2 and router.breakers["flaky"].is_open
+
+    # After the cooldown one trial call goes through, and success closes the circuit
+    await asyncio.sleep(0.25)
+    flaky.error = None
+    flaky.text = "recovered"
+    assert await _complete(router) == ({"flaky"}, "recovered")
+    assert not router.breakers["flaky"].is_open
+
+
+@pytest.mark.asyncio
+async def test_router_claims_half_open_trial_only_for_started_models():
+    """A fallback whose cooldown expired while the primary answered is still tried later."""
+    from app.services.llm_router import LLMRouter
+
+    primary = ScriptedModel(text="primary")
+    fallback = ScriptedModel(text="fallback")
+    router = LLMRouter(
+        [("primary", primary), ("fallback", fallback)], ttft_timeout=1, circuit_failures=1, circuit_cooldown=0.05
+    )
+    router.breakers["fallback"].failure()
+    await asyncio.sleep(0.1)
+
+    assert await _complete(router) == ({"primary"}, "primary")
+    assert fallback.calls == 0 and router.breakers["fallback"].allow()
+
+    primary.error = RuntimeError("down")
+    assert await _complete(router) == ({"fallback"}, "fallback")
+    assert not router.breakers["fallback"].is_open
@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime, timezone
+
+from app.models.schema import DatasetReference
+from app.services.llm import _create_prompt
+from app.utils.prompt_card import build_prompt_card
+
+BPS_DESCRIPTION = """
+<p>Dataset ini berisi data jumlah sampah di Kota Bandung dari tahun 2017 s.d. 2024.</p>
+<p>Penjelasan mengenai variabel di dalam dataset ini:</p>
+<p>kode_provinsi: menyatakan kode Provinsi Jawa Barat sesuai ketentuan BPS merujuk pada aturan Peraturan Badan Pusat Statistik Nomor 3 Tahun 2019 dengan tipe data numerik.</p>
+<p>nama_provinsi: menyatakan lingkup data berasal dari wilayah Provinsi Jawa Barat sesuai ketentuan BPS merujuk pada aturan Peraturan Badan Pusat Statistik Nomor 3 Tahun 2019 dengan tipe data teks.</p>
+<p>jumlah_sampah: menyatakan jumlah sampah dengan tipe data numerik.</p>
+<p>jumlah_sampah: menyatakan jumlah sampah dengan tipe data numerik.</p>
+"""
+
+
+def test_prompt_card_strips_boilerplate_and_duplicates():
+    card = build_prompt_card(BPS_DESCRIPTION)
+
+    assert "Peraturan Badan Pusat Statistik" not in card
+    assert "<p>" not in card
+    assert card.startswith("Dataset ini berisi data jumlah sampah")
+    assert "kode_provinsi (numerik): kode Provinsi Jawa Barat" in card
+    assert card.count("jumlah_sampah") == 1
+
+
+def test_prompt_card_is_length_capped():
+    card = build_prompt_card("kata " * 1000, max_chars=100)
+
+    assert len(card) <= 100
+    assert card.endswith("...")
+
+
+def test_create_prompt_uses_prompt_card():
+    dataset = DatasetReference(
+        id=uuid.uuid4(),
+        title="Jumlah Sampah",
+        description=BPS_DESCRIPTION,
+        url="https://example.com/sampah.csv",
+        direct_source="opendata.jabarprov.go.id",
+        original_source="opendata.jabarprov.go.id",
+        source_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        is_cors_allowed=False,
+        slug="jabarprov_jumlah_sampah",
+        prompt_card="ringkasan sampah",
+    )
+
+    prompt = _create_prompt("berapa jumlah sampah?", [], [dataset], [])
+
+    assert "- Jumlah Sampah: ringkasan sampah" in prompt
+    assert "Peraturan Badan Pusat Statistik" not in prompt
+    assert "prompt_card" not in dataset.model_dump()
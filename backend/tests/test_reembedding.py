@@ -0,0 +1,137 @@
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import select, update, text
+from app.utils.uuid_helper import uuid7
+
+OLD_MODEL = "models/embedding-001"
+NEW_MODEL = "models/text-embedding-004"
+TOPICS = ["sampah", "penduduk", "padi"]
+
+
+def _topic_vector(text, dimensions):
+    """Deterministic embedding: one axis per topic word"""
+    vector = [0.01] * dimensions
+    for i, topic in enumerate(TOPICS):
+        if topic in text.lower():
+            vector[i] = 1.0
+    return vector
+
+
+@pytest.mark.asyncio
+async def test_reembedding_backfills_and_switches_retrieval(db_session, session_factory, monkeypatch):
+    """A new model is backfilled into the spare slot, indexed and switched to without a rebuild."""
+    from app.models.db import DatasetCatalog, ReferenceQuery, EmbeddingModel
+    import app.services.reembedding as reembedding
+    import app.services.rag_dataset as rag_dataset
+    from app.services.embedding_models import get_active_embedding
+    from app.utils.embedding import embedding_content_hash
+
+    db_session.add(EmbeddingModel(name=OLD_MODEL, dimensions=768, slot="embedding", status="active"))
+    for topic in TOPICS:
+        title, description = f"Data {topic}", f"Jumlah {topic} per kabupaten"
+        db_session.add(DatasetCatalog(
+            id=uuid7(), title=title, description=description, url=f"https://example.com/{topic}.csv",
+            direct_source="opendata.jabarprov.go.id", original_source="opendata.jabarprov.go.id",
+            source_at=datetime(2024, 1, 1, tzinfo=timezone.utc), slug=f"dataset_{topic}",
+            embedding=[0.5] * 768, content_hash=embedding_content_hash(f"{title} {description}", OLD_MODEL),
+        ))
+    db_session.add(ReferenceQuery(
+        id=uuid7(), title="Total sampah", description="Jumlah sampah per tahun",
+        sql_query="SELECT tahun, SUM(jumlah_sampah) FROM sampah GROUP BY tahun", embedding=[0.5] * 768,
+    ))
+    await db_session.commit()
+
+    embedded_with = []
+
+    async def get_embeddings(texts, model=None):
+        embedded_with.append(model)
+        return [_topic_vector(text, 8) for text in texts]
+
+    monkeypatch.setattr(reembedding, "get_embeddings", get_embeddings)
+
+    active = await get_active_embedding(db_session)
+    slot = await reembedding.prepare_shadow_slot(db_session, NEW_MODEL, 8)
+    assert slot.column == "embedding_alt"
+
+    for table in reembedding.EMBEDDED_TABLES:
+        await reembedding.backfill_table(session_factory, table, slot, active, batch_size=2)
+    assert set(embedded_with) == {NEW_MODEL}
+
+    engine = session_factory.kw["bind"]
+    await reembedding.build_ann_indexes(engine, slot)
+    indexes = (await db_session.execute(
+        text("SELECT indexname FROM pg_indexes WHERE indexname LIKE '%embedding_alt_hnsw'")
+    )).scalars().all()
+    assert sorted(indexes) == ["ix_dataset_catalog_embedding_alt_hnsw", "ix_reference_queries_embedding_alt_hnsw"]
+
+    # Ingestion re-embeds a changed dataset with the active model and clears its shadow hash
+    await db_session.execute(
+        update(DatasetCatalog)
+        .where(DatasetCatalog.slug == "dataset_padi")
+        .values(title="Produksi padi", content_hash="changed", content_hash_alt=None)
+    )
+    await db_session.commit()
+    await reembedding.mark_ready(db_session, NEW_MODEL)
+
+    with pytest.raises(reembedding.ReembeddingError):
+        await reembedding.switch_active_model(db_session, NEW_MODEL)
+
+    await reembedding.backfill_table(session_factory, DatasetCatalog, slot, active)
+    assert await reembedding.switch_active_model(db_session, NEW_MODEL) == OLD_MODEL
+
+    # Retrieval now embeds questions with the new model and searches the new slot
+    questions = []
+
+    async def get_embedding(question, model=None):
+        questions.append(model)
+        return _topic_vector(question, 8)
+
+    monkeypatch.setattr(rag_dataset, "get_embedding", get_embedding)
+    datasets = await rag_dataset.get_relevant_datasets(db_session, "berapa produksi padi?", limit=1)
+    assert questions == [NEW_MODEL]
+    assert [dataset.slug for dataset in datasets] == ["dataset_padi"]
+
+    statuses = dict((await db_session.execute(select(EmbeddingModel.name, EmbeddingModel.status))).all())
+    assert statuses == {OLD_MODEL: "retired", NEW_MODEL: "active"}
+
+
+@pytest.mark.asyncio
+async def test_catalog_queries_survive_slot_swap_on_same_connection(db_session, monkeypatch):
+    """Recreating a slot's vector column with new dimensions does not break statements already prepared on a connection."""
+    from app.models.db import DatasetCatalog, ReferenceQuery, EmbeddingModel
+    import app.services.rag_dataset as rag_dataset
+    import app.services.rag_sql as rag_sql
+    from app.routes.dataset import query_dataset_page
+    from app.services.embedding_models import reset_embedding_cache
+    from app.services.reembedding import prepare_shadow_slot
+
+    async def fake_embedding(text, model=None):
+        return [0.5] * 768
+
+    monkeypatch.setattr(rag_dataset, "get_embedding", fake_embedding)
+    monkeypatch.setattr(rag_sql, "get_embedding", fake_embedding)
+    # The active model lives in the second slot, so the next model recreates the first one
+    db_session.add(EmbeddingModel(name=NEW_MODEL, dimensions=768, slot="embedding_alt", status="active"))
+    db_session.add(DatasetCatalog(
+        id=uuid7(), title="Data sampah", description="Jumlah sampah", url="https://example.com/sampah.csv",
+        direct_source="opendata.jabarprov.go.id", original_source="opendata.jabarprov.go.id",
+        source_at=datetime(2024, 1, 1, tzinfo=timezone.utc), slug="dataset_sampah",
+        embedding=[0.5] * 768, embedding_alt=[0.5] * 768,
+    ))
+    db_session.add(ReferenceQuery(
+        id=uuid7(), title="Total sampah", description="Jumlah sampah per tahun",
+        sql_query="SELECT 1", embedding=[0.5] * 768, embedding_alt=[0.5] * 768,
+    ))
+    await db_session.commit()
+    reset_embedding_cache()
+
+    async def hot_paths():
+        assert [dataset.slug for dataset in await rag_dataset.get_relevant_datasets(db_session, "sampah")] == ["dataset_sampah"]
+        assert len(await rag_sql.get_relevant_queries(db_session, "sampah")) == 1
+        assert len((await query_dataset_page(db_session, 10)).data) == 1
+        await db_session.commit()
+
+    # The test engine has a single pooled connection, so both rounds prepare on the same one
+    await hot_paths()
+    await prepare_shadow_slot(db_session, "models/next-embedding", 1024)
+    await hot_paths()
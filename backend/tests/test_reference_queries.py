@@ -0,0 +1,77 @@
+import json
+import pytest
+
+
+def test_sql_hash_ignores_formatting_but_not_literals():
+    from app.utils.sql_hash import normalize_sql, sql_hash
+
+    assert normalize_sql(
+        "SELECT  a.x, -- comment\n COUNT(*) FROM t WHERE name = 'Kota  Bandung' /* c */ ;"
+    ) == "select a.x,count(*)from t where name='Kota  Bandung'"
+    assert sql_hash("select tahun,\n  sum(x) from t;") == sql_hash("SELECT tahun, SUM(x)\nFROM t")
+    assert sql_hash("SELECT * FROM t WHERE k = 'Bandung'") != sql_hash("SELECT * FROM t WHERE k = 'bandung'")
+
+
+def test_load_reference_examples_reads_yaml_and_jsonl(tmp_path):
+    from app.services.reference_queries import load_reference_examples, ReferenceQueryFileError
+
+    example = {"title": "Total sampah", "description": "Per tahun", "sql_query": "SELECT 1"}
+    yaml_file = tmp_path / "examples.yaml"
+    yaml_file.write_text(
+        "examples:\n"
+        "  - title: Total sampah\n"
+        "    description: Per tahun\n"
+        "    sql_query: SELECT 1\n"
+    )
+    jsonl_file = tmp_path / "examples.jsonl"
+    jsonl_file.write_text(json.dumps(example) + "\n\n")
+
+    assert load_reference_examples(str(yaml_file)) == [example]
+    assert load_reference_examples(str(jsonl_file)) == [example]
+
+    jsonl_file.write_text(json.dumps({"title": "Tanpa query", "description": "x"}) + "\n")
+    with pytest.raises(ReferenceQueryFileError, match="sql_query"):
+        load_reference_examples(str(jsonl_file))
+
+
+@pytest.mark.asyncio
+async def test_reloading_reference_queries_is_idempotent(db_session, monkeypatch):
+    """Reloading the same examples embeds nothing again and leaves one row per query."""
+    from sqlalchemy import select
+    from app.models.db import ReferenceQuery
+    import app.services.reference_queries as reference_queries
+    from app.services.embedding_models import DEFAULT_SLOT
+
+    embedded = []
+
+    async def fake_embeddings(texts, model=None):
+        # The embedding API is called outside any transaction
+        assert not db_session.in_transaction()
+        embedded.extend(texts)
+        return [[0.1] * 768 for _ in texts]
+
+    monkeypatch.setattr(reference_queries, "get_embeddings", fake_embeddings)
+
+    examples = [
+        {"title": "Total sampah", "description": "Per tahun", "sql_query": "SELECT tahun, SUM(x) FROM sampah GROUP BY tahun;"},
+        # Same query, formatted differently
+        {"title": "Total sampah", "description": "Per tahun", "sql_query": "select tahun, sum(x)\nfrom sampah\ngroup by tahun"},
+        {"title": "IPM", "description": "IPM tertinggi", "sql_query": "SELECT * FROM ipm ORDER BY nilai DESC LIMIT 1"},
+    ]
+    counts = await reference_queries.upsert_reference_queries(db_session, examples, DEFAULT_SLOT, batch_size=1)
+    assert counts == {
+        "loaded": 3, "duplicates": 1, "embedded": 2, "skipped": 0, "failed": 0, "inserted": 2, "updated": 0,
+    }
+    assert len(embedded) == 2
+
+    counts = await reference_queries.upsert_reference_queries(db_session, examples, DEFAULT_SLOT)
+    assert counts["skipped"] == 2 and counts["embedded"] == 0
+    assert len(embedded) == 2
+
+    # A changed description re-embeds and updates the existing row
+    examples[2]["description"] = "Provinsi dengan IPM tertinggi"
+    counts = await reference_queries.upsert_reference_queries(db_session, examples, DEFAULT_SLOT)
+    assert (counts["embedded"], counts["inserted"], counts["updated"]) == (1, 0, 1)
+
+    result = await db_session.execute(select(ReferenceQuery.title, ReferenceQuery.description).order_by(ReferenceQuery.title))
+    assert result.all() == [("IPM", "Provinsi dengan IPM tertinggi"), ("Total sampah", "Per tahun")]
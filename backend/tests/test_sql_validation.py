@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+import uuid
+from datetime import datetime, timezone
+from app.models.schema import DatasetReference, MessageModel
+from stub_server import StubServer
+
+ANSWER = """Menjumlahkan sampah per tahun
+==============
+-- Load the data
+CREATE TABLE IF NOT EXISTS sampah AS SELECT * FROM read_csv('http://localhost:8000/dataset/bandung_sampah');
+WITH per_tahun AS (SELECT tahun, jumlah_sampah FROM sampah)
+SELECT tahun, SUM(jumlah_sampah) FROM per_tahun GROUP BY tahun;"""
+
+
+def _dataset(slug, url="https://example.com/data.csv"):
+    return DatasetReference(
+        id=uuid.uuid4(), title=slug, description="", url=url,
+        direct_source="example", original_source="example", source_at=datetime.now(timezone.utc),
+        is_cors_allowed=False, slug=slug,
+    )
+
+
+def _assistant(content):
+    return MessageModel(id=uuid.uuid4(), role="assistant", content=content, created_at=datetime.now(timezone.utc))
+
+
+def test_check_generated_sql():
+    from app.services.sql_validation import check_generated_sql, split_response
+
+    datasets = [_dataset("bandung_sampah")]
+    assert check_generated_sql(ANSWER, datasets) is None
+    assert split_response(ANSWER)[0] == "Menjumlahkan sampah per tahun"
+
+    def reason(text, history=None):
+        return check_generated_sql(text, datasets, history).reason
+
+    assert reason(ANSWER.replace("==============", "")) == "no_separator"
+    assert reason(ANSWER.replace("GROUP BY tahun", "GROUP tahun")) == "parse_error"
+    assert reason(ANSWER.replace("bandung_sampah", "bandung_sampah_2099")) == "unknown_dataset"
+    assert reason(ANSWER.replace("FROM sampah)", "FROM sampah_bandung)")) == "unknown_table"
+
+    # Tables and datasets loaded earlier in the conversation can be used again
+    follow_up = "Rata-rata\n==============\nSELECT AVG(jumlah_sampah) FROM sampah;"
+    assert reason(follow_up) == "unknown_table"
+    assert check_generated_sql(follow_up, [], [_assistant(ANSWER)]) is None
+
+
+def test_answer_splitter_finds_separator_across_chunks():
+    from app.services.sql_validation import AnswerSplitter
+
+    splitter = AnswerSplitter()
+    deltas = []
+    for start in range(0, len(ANSWER), 5):
+        deltas += splitter.feed(ANSWER[start:start + 5])
+    deltas += splitter.finish()
+
+    explanation, sql = ANSWER.split("==============")
+    assert "".join(text for part, text in deltas if part == "explanation") == explanation
+    assert "".join(text for part, text in deltas if part == "sql") == sql
+    assert not any("=" * 5 in text for _, text in deltas)
+    assert (splitter.explanation, splitter.sql) == (explanation, sql)
+
+
+@pytest.mark.asyncio
+async def test_explain_generated_sql_against_typed_empty_tables():
+    from app.services.sql_validation import explain_generated_sql, split_response
+
+    csv = "tahun,kecamatan,jumlah_sampah\n2020,Coblong,10.5\n2021,Coblong,11.25\n"
+    with StubServer([{"path": "/sampah.csv", "body": csv}]) as server:
+        datasets = [_dataset("bandung_sampah", f"{server.url}/sampah.csv")]
+
+        def sql(text):
+            return split_response(text)[1]
+
+        assert await explain_generated_sql(sql(ANSWER), datasets) is None
+
+        problem = await explain_generated_sql(sql(ANSWER.replace("SUM(jumlah_sampah)", "SUM(jumlah)")), datasets)
+        assert problem.reason == "explain_error" and "jumlah_sampah" in problem.message
+        problem = await explain_generated_sql(sql(ANSWER.replace("SUM(jumlah_sampah)", "SUM(kecamatan)")), datasets)
+        assert problem.reason == "explain_error"
+
+        # Tables loaded earlier in the conversation are recreated for follow-ups
+        history = [_assistant(ANSWER)]
+        follow_up = "SELECT kecamatan, AVG(jumlah_sampah) FROM sampah GROUP BY kecamatan;"
+        assert await explain_generated_sql(follow_up, datasets, history) is None
+        problem = await explain_generated_sql(follow_up.replace("AVG(jumlah_sampah)", "AVG(berat)"), datasets, history)
+        assert problem.reason == "explain_error"
+
+        # The sampled schema is cached
+        assert server.requests == ["/sampah.csv"]
+
+    # Without a readable schema the SQL is not judged, whatever the failure
+    assert await explain_generated_sql(sql(ANSWER), [_dataset("bandung_sampah", "http://127.0.0.1:9/sampah.csv")]) is None
+    assert await explain_generated_sql(sql(ANSWER), [_dataset("bandung_sampah", "http://[invalid/sampah.csv")]) is None
+
+
+@pytest.mark.asyncio
+async def test_unreadable_dataset_schema_is_not_fetched_again_right_away(monkeypatch):
+    import app.services.sql_validation as sql_validation
+
+    with StubServer([{"path": "/rusak.csv", "status": 500}]) as server:
+        dataset = _dataset("bandung_rusak", f"{server.url}/rusak.csv")
+        assert await sql_validation.get_dataset_schema(dataset) is None
+        assert await sql_validation.get_dataset_schema(dataset) is None
+        assert server.requests == ["/rusak.csv"]
+
+        # Tried again once the miss expired
+        monkeypatch.setattr(sql_validation, "SQL_SCHEMA_MISS_TTL", 0)
+        sql_validation.dataset_schema_misses.clear()
+        assert await sql_validation.get_dataset_schema(dataset) is None
+        await asyncio.sleep(0.01)
+        assert await sql_validation.get_dataset_schema(dataset) is None
+        assert server.requests == ["/rusak.csv"] * 3
@@ -0,0 +1,22 @@
+import asyncio
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_coalesce_text_merges_deltas_and_sends_heartbeats():
+    from app.utils.sse import coalesce_text
+
+    async def deltas():
+        for text in "SELECT":
+            yield "sql", text
+        yield "explanation", "late "
+        await asyncio.sleep(0.1)
+        yield "explanation", "answer"
+
+    events = [
+        event async for event in coalesce_text(deltas(), flush_interval=0.02, flush_chars=4, heartbeat_interval=0.05)
+    ]
+    # Merged up to the size limit, split on kind changes, a heartbeat (None) while idle
+    assert events[:3] == [("sql", "SELE"), ("sql", "CT"), ("explanation", "late ")]
+    assert None in events[3:-1]
+    assert events[-1] == ("explanation", "answer")
@@ -72,13 +72,19 @@ export async function startSession(title?: string): Promise<StartSessionResponse
 
 /**
  * Generate SQL from natural language
+ * Requests sent again with the same idempotency key get the first answer instead of a new generation
  */
-export async function generateSQL(sessionId: string, question: string): Promise<GenerateSQLResponse> {
+export async function generateSQL(
+  sessionId: string,
+  question: string,
+  idempotencyKey?: string,
+): Promise<GenerateSQLResponse> {
   try {
     const response = await fetch(`${API_BASE_URL}/generate-sql`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        ...(idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {}),
       },
       body: JSON.stringify({
         session_id: sessionId,
@@ -110,8 +116,15 @@ export async function generateSQL(sessionId: string, question: string): Promise<
 /**
  * Stream SQL generation from natural language
  * Returns a ReadableStream that emits explanation and SQL as they're generated
+ * Pass the id of the last event received to resume a dropped stream instead of generating again,
+ * and an idempotency key to attach requests sent again to the first one's generation
  */
-export async function streamGenerateSQL(sessionId: string, question: string): Promise<ReadableStream<Uint8Array>> {
+export async function streamGenerateSQL(
+  sessionId: string,
+  question: string,
+  lastEventId?: string,
+  idempotencyKey?: string,
+): Promise<ReadableStream<Uint8Array>> {
   try {
     const response = await fetch(`${API_BASE_URL}/generate-sql-stream`, {
       method: "POST",
@@ -120,6 +133,8 @@ export async function streamGenerateSQL(sessionId: string, question: string): Pr
         Accept: "text/event-stream", // Explicitly request SSE format
         "Cache-Control": "no-cache",
         Connection: "keep-alive",
+        ...(lastEventId ? { "Last-Event-ID": lastEventId } : {}),
+        ...(idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {}),
       },
       body: JSON.stringify({
         session_id: sessionId,
@@ -4,6 +4,10 @@ import { debugLogSSE } from "./debug-utils"
 // Store the session ID
 let currentSessionId: string | null = null
 
+// Idempotency key of the question being answered: submitting it again (double clicks,
+// retries, remounts) reuses the key until it is answered or another question is asked
+let pendingSubmission: { question: string; key: string } | null = null
+
 /**
  * Set the current session ID
  */
@@ -29,6 +33,26 @@ export async function ensureSession(): Promise<string> {
   return currentSessionId
 }
 
+/**
+ * Idempotency key of a question submission, the same for repeated submissions of the
+ * question until it is answered
+ */
+function submissionKey(question: string): string {
+  if (pendingSubmission?.question !== question) {
+    pendingSubmission = { question, key: crypto.randomUUID() }
+  }
+  return pendingSubmission.key
+}
+
+/**
+ * Forget the key of an answered submission, so asking the question again generates anew
+ */
+function clearSubmissionKey(key: string) {
+  if (pendingSubmission?.key === key) {
+    pendingSubmission = null
+  }
+}
+
 /**
  * Parse the streaming response from the API
  * The format is:
@@ -99,32 +123,49 @@ export function parseStreamingResponse(text: string): { explanation: string; sql
   return { explanation, sql }
 }
 
+type StreamEvent = { id?: string; event: string; data: any }
+
+// Reconnects allowed when a stream drops before it is complete
+const MAX_STREAM_RESUMES = 3
+
 /**
- * Process SSE data by properly handling the event format
- * SSE format:
- * data: line1\n\n
- * data: line2\n\n
+ * Parse the complete server-sent events at the start of the buffer
+ * SSE format (one JSON payload per event, comments start with ":"):
+ * event: sql\n
+ * data: {"text": "SELECT ..."}\n
  * \n (empty line marks end of event)
+ * Returns the events and the incomplete rest of the buffer
  */
-function processSSEData(data: string): string {
+function parseSSEEvents(buffer: string): { events: StreamEvent[]; rest: string } {
   // For debugging
   if (process.env.NODE_ENV === "development") {
-    debugLogSSE(data, "Raw SSE Data")
+    debugLogSSE(buffer, "Raw SSE Data")
   }
 
-  // Split by double newlines to separate events
-  const processed = data
-    .replaceAll(/\n\ndata: +/g, '') // split based on SSE format
-    .replace(/^data: /, '') // cleanup additional data in the beginning
-    .trim()
-    .replace(/\[DONE\]$/, '') // cleanup closing marker in the end
-
-  // For debugging
-  if (process.env.NODE_ENV === "development") {
-    debugLogSSE(processed, "Processed SSE Data")
+  const blocks = buffer.split("\n\n")
+  const rest = blocks.pop() ?? ""
+  const events: StreamEvent[] = []
+
+  for (const block of blocks) {
+    let id: string | undefined
+    let event = "message"
+    let data = ""
+    for (const line of block.split("\n")) {
+      if (line.startsWith("id:")) {
+        id = line.slice("id:".length).trim()
+      } else if (line.startsWith("event:")) {
+        event = line.slice("event:".length).trim()
+      } else if (line.startsWith("data:")) {
+        data += line.slice("data:".length).trim()
+      }
+      // Anything else, such as ": keep-alive" heartbeat comments, is ignored
+    }
+    if (data) {
+      events.push({ id, event, data: JSON.parse(data) })
+    }
   }
 
-  return processed
+  return { events, rest }
 }
 
 /**
@@ -156,31 +197,64 @@ export async function streamTranslateToSql(
     // Dynamically import the API client
     const { streamGenerateSQL } = await import("./api-client")
 
-    // Get the stream
-    const stream = await streamGenerateSQL(sessionId, naturalLanguageQuery)
-    const reader = stream.getReader()
+    // Get the stream; the idempotency key keeps repeated submissions of this question from generating again
+    const idempotencyKey = submissionKey(naturalLanguageQuery)
+    let reader = (await streamGenerateSQL(sessionId, naturalLanguageQuery, undefined, idempotencyKey)).getReader()
+    let explanation = ""
+    let sql = ""
+    let lastEventId: string | undefined
+    let isComplete = false
+    let resumes = 0
+
+    // Read the stream until it ends; a dropped connection is resumed from the last event received
+    const read = async (): Promise<ReadableStreamReadResult<Uint8Array>> => {
+      const canResume = () => !isCancelled && !isComplete && !!lastEventId && resumes < MAX_STREAM_RESUMES
+      try {
+        const result = await reader.read()
+        if (!result.done || !canResume()) return result
+      } catch (error) {
+        if (!canResume()) throw error
+      }
+      resumes += 1
+      buffer = ""
+      reader = (await streamGenerateSQL(sessionId, naturalLanguageQuery, lastEventId, idempotencyKey)).getReader()
+      return read()
+    }
 
-    // Process the stream
+    // Process the stream: explanation and sql events carry text deltas, done the final answer
     const processStream = async () => {
       while (!isCancelled) {
-        const { done, value } = await reader.read()
+        const { done, value } = await read()
 
         if (done) {
           // Stream is complete, send final update
-          const processedBuffer = processSSEData(buffer)
-          const { explanation, sql } = parseStreamingResponse(processedBuffer)
-          onUpdate({ explanation, sql, isComplete: true })
+          clearSubmissionKey(idempotencyKey)
+          onUpdate({ explanation: explanation.trim(), sql: sql.trim(), isComplete: true })
           break
         }
 
         // Decode the chunk and add to buffer
-        const chunk = decoder.decode(value, { stream: true })
-        buffer += chunk
-
-        // Process SSE data, then parse and send update
-        const processedBuffer = processSSEData(buffer)
-        const { explanation, sql } = parseStreamingResponse(processedBuffer)
-        onUpdate({ explanation, sql, isComplete: false })
+        buffer += decoder.decode(value, { stream: true })
+        const { events, rest } = parseSSEEvents(buffer)
+        buffer = rest
+        if (events.length === 0) continue
+
+        for (const { id, event, data } of events) {
+          if (id) lastEventId = id
+          if (event === "explanation") {
+            explanation += data.text
+          } else if (event === "sql") {
+            sql += data.text
+          } else if (event === "done") {
+            explanation = data.explanation
+            sql = data.sql
+            isComplete = true
+          } else if (event === "error") {
+            clearSubmissionKey(idempotencyKey)
+            throw new Error(data.detail)
+          }
+        }
+        onUpdate({ explanation: explanation.trim(), sql: sql.trim(), isComplete: false })
       }
     }
 
@@ -238,7 +312,10 @@ export async function translateToSql(naturalLanguageQuery: string): Promise<{
     const { generateSQL } = await import("./api-client")
 
     // Call the API to generate SQL
-    const result = await generateSQL(sessionId, naturalLanguageQuery)
+    const idempotencyKey = submissionKey(naturalLanguageQuery)
+    const result = await generateSQL(sessionId, naturalLanguageQuery, idempotencyKey).finally(() =>
+      clearSubmissionKey(idempotencyKey),
+    )
 
     // Extract dataset name from the first dataset if available
     const datasetName = result.datasets_used.length > 0 ? result.datasets_used[0].title : "Query Result"